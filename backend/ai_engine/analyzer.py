@@ -1,13 +1,17 @@
 import json
 import os
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence, Union
 from .models import AnalysisResult, Issue
+from .rules_engine import RuleSet
+from .profiling import stage
 
 class ActionAnalyzer:
     def __init__(self):
         self.rules = self._load_json("rules/issue_rules.json")
         self.thresholds = self._load_json("thresholds/level_thresholds.json")
         self.scoring_config = self._load_json("config/action_scoring_config.json")
+        # Compiled once; a bad config raises RuleConfigError here rather than skipping rules at analysis time
+        self.rule_set = RuleSet.compile(self.rules, self.thresholds, self.scoring_config)
         
         # Bilingual Templates
         self.suggestion_templates = {
@@ -79,58 +83,42 @@ class ActionAnalyzer:
             print(f"Warning: Config file not found at {file_path}")
             return {}
 
-    def analyze(self, action_type: str, metrics: Dict[str, float], level_assumption: str = "beginner", keyframe_base64: Optional[str] = None, action_sequence: List[str] = []) -> AnalysisResult:
-        if action_type not in self.rules:
+    def analyze(self, action_type: str, metrics: Dict[str, float], level_assumption: str = "beginner", keyframe_base64: Optional[str] = None, action_sequence: List[str] = [], use_llm: bool = True) -> AnalysisResult:
+        if action_type not in self.rule_set:
             return self._create_empty_result(action_type, level_assumption)
 
-        # 1. Identify Issues
-        issues = self._identify_issues(action_type, metrics, level_assumption)
-
-        # 2. Calculate Score
-        score = self._calculate_score(action_type, metrics)
+        # 1. Identify Issues and 2. Calculate Score
+        with stage("rules"):
+            action_rules = self.rule_set[action_type]
+            matrix = action_rules.matrix([metrics])
+            issues = [self._issue(tag) for tag in action_rules.issue_tags(matrix, level_assumption)[0]]
+            score = action_rules.scores(matrix)[0]
 
         # 3. Generate Feedback (Try LLM first, fallback to rules)
         positive_feedback = None
         next_training_focus = None
         generation_source = "rules"
         
-        try:
-            from .llm_client import gemini_coach
-            if gemini_coach.enabled:
-                llm_result = gemini_coach.generate_feedback(action_type, int(score), metrics, issues, keyframe_base64, action_sequence)
-                if llm_result:
-                    positive_feedback = llm_result.get('positive_feedback')
-                    next_training_focus = llm_result.get('next_training_focus')
-                    generation_source = "gemini"
-        except ImportError:
-            pass # LLM client not available or dependency missing
+        if use_llm:
+            try:
+                # Imported on demand so rules-only analysis never loads the LLM client
+                from .llm_client import gemini_coach
+                if gemini_coach.enabled:
+                    with stage("llm"):
+                        llm_result = gemini_coach.generate_feedback(action_type, int(score), metrics, issues, keyframe_base64, action_sequence)
+                    if llm_result:
+                        positive_feedback = llm_result.get('positive_feedback')
+                        next_training_focus = llm_result.get('next_training_focus')
+                        generation_source = "gemini"
+            except ImportError:
+                pass # LLM client not available or dependency missing
 
         # Fallback Logic (if LLM disabled or failed)
         if not positive_feedback:
             generation_source = "rules"
-            if not issues:
-                 positive_feedback = {
-                     "zh": "表现完美！动作非常标准。",
-                     "en": "Perfect performance! Very standard action."
-                 }
-            elif score > 75:
-                 positive_feedback = {
-                     "zh": "整体动作流畅，核心发力感不错！",
-                     "en": "Overall motion is smooth, good core power usage!"
-                 }
-            else:
-                 positive_feedback = {
-                     "zh": "基本动作框架已有，细节还需打磨。",
-                     "en": "Basic framework is present, details need refinement."
-                 }
-
+            positive_feedback = self._rule_positive_feedback(issues, score)
         if not next_training_focus:
-            next_training_focus = [issue.suggestion for issue in issues[:2]]
-            if not next_training_focus:
-                 next_training_focus = [
-                     {"zh": "保持当前状态", "en": "Maintain current form"},
-                     {"zh": "尝试提高动作一致性", "en": "Try to improve consistency"}
-                 ]
+            next_training_focus = self._rule_training_focus(issues)
 
         return AnalysisResult(
             action=action_type,
@@ -143,79 +131,72 @@ class ActionAnalyzer:
             generation_source=generation_source
         )
 
-    def _identify_issues(self, action: str, metrics: Dict[str, float], level: str) -> List[Issue]:
-        issues = []
-        action_rules = self.rules.get(action, {})
-        level_thresholds = self.thresholds.get(action, {})
+    def analyze_batch(self, action_type: str, metrics_list: Sequence[Dict[str, float]],
+                      level_assumption: Union[str, Sequence[str]] = "beginner") -> List[AnalysisResult]:
+        """
+        Rules-only analysis of many metric dicts of one action in a single pass
+        (for bulk re-scoring); `level_assumption` is one level or one per entry.
+        Same results as calling analyze(..., use_llm=False) on each.
+        """
+        levels = [level_assumption] * len(metrics_list) if isinstance(level_assumption, str) else list(level_assumption)
+        if action_type not in self.rule_set:
+            return [self._create_empty_result(action_type, level) for level in levels]
+        action_rules = self.rule_set[action_type]
+        matrix = action_rules.matrix(metrics_list)
+        scores = action_rules.scores(matrix)
+        results = []
+        for metrics, level, tags, score in zip(metrics_list, levels, action_rules.issue_tags(matrix, levels), scores.tolist()):
+            issues = [self._issue(tag) for tag in tags]
+            results.append(AnalysisResult(
+                action=action_type,
+                level_assumption=level,
+                score=int(score),
+                metrics=metrics,
+                issues=issues,
+                positive_feedback=self._rule_positive_feedback(issues, score),
+                next_training_focus=self._rule_training_focus(issues),
+                generation_source="rules"
+            ))
+        return results
 
-        # Sort rules by priority if possible? They are in dict, so unordered strictly speaking but usually insertion order.
-        # issue_rules.json has "priority" field.
-        sorted_rules = sorted(action_rules.items(), key=lambda x: x[1].get("priority", 99))
-
-        for rule_name, rule_data in sorted_rules:
-            metric_name = rule_data["metric"]
-            condition = rule_data["condition"] # e.g. "< beginner"
-            
-            if metric_name not in metrics:
-                continue
-            
-            val = metrics[metric_name]
-            
-            parts = condition.split()
-            if len(parts) != 2:
-                continue
-                
-            operator, threshold_level = parts
-            
-            # Get threshold value
-            threshold_dict = level_thresholds.get(metric_name)
-            if not threshold_dict:
-                continue
-                
-            threshold_val = threshold_dict.get(threshold_level)
-            if threshold_val is None:
-                continue
+    def _issue(self, rule_name: str) -> Issue:
+        template = self.suggestion_templates.get(rule_name, {
+            "tip": {"zh": f"注意改善 {rule_name}", "en": f"Improve {rule_name}"},
+            "suggestion": {"zh": "请参考标准动作进行练习", "en": "Please practice with standard form"}
+        })
+        return Issue(
+            tag=rule_name,
+            level="warning", 
+            coach_tip=template["tip"], 
+            suggestion=template["suggestion"]
+        )
 
-            is_issue = False
-            if operator == "<":
-                if val < threshold_val:
-                    is_issue = True
-            elif operator == ">":
-                if val > threshold_val:
-                    is_issue = True
-            
-            if is_issue:
-                template = self.suggestion_templates.get(rule_name, {
-                    "tip": {"zh": f"注意改善 {rule_name}", "en": f"Improve {rule_name}"},
-                    "suggestion": {"zh": "请参考标准动作进行练习", "en": "Please practice with standard form"}
-                })
-                
-                issues.append(Issue(
-                    tag=rule_name,
-                    level="warning", 
-                    coach_tip=template["tip"], 
-                    suggestion=template["suggestion"]
-                ))
-        
-        return issues
+    @staticmethod
+    def _rule_positive_feedback(issues: List[Issue], score: float) -> Dict[str, str]:
+        if not issues:
+            return {
+                "zh": "表现完美！动作非常标准。",
+                "en": "Perfect performance! Very standard action."
+            }
+        if score > 75:
+            return {
+                "zh": "整体动作流畅，核心发力感不错！",
+                "en": "Overall motion is smooth, good core power usage!"
+            }
+        return {
+            "zh": "基本动作框架已有，细节还需打磨。",
+            "en": "Basic framework is present, details need refinement."
+        }
 
-    def _calculate_score(self, action: str, metrics: Dict[str, float]) -> float:
-        config = self.scoring_config.get(action, {}).get("metrics", {})
-        total_score = 0.0
-        total_weight = 0.0
-        
-        for metric, weight in config.items():
-            val = metrics.get(metric, 0.5) 
-            # Assume metric value 0.0-1.0 maps directly to score?
-            # Or should we clamp it? 
-            # For MVP let's map 0.0-1.0 directly to 0-100.
-            total_score += val * 100 * weight
-            total_weight += weight
-            
-        if total_weight == 0:
-            return 0.0
-            
-        return round(total_score / total_weight)
+    @staticmethod
+    def _rule_training_focus(issues: List[Issue]) -> List[Dict[str, str]]:
+        next_training_focus = [issue.suggestion for issue in issues[:2]]
+        if not next_training_focus:
+            next_training_focus = [
+                {"zh": "保持当前状态", "en": "Maintain current form"},
+                {"zh": "尝试提高动作一致性", "en": "Try to improve consistency"}
+            ]
+        return next_training_focus
 
     def _create_empty_result(self, action, level) -> AnalysisResult:
         return AnalysisResult(
@@ -0,0 +1,97 @@
+import os
+import base64
+import hashlib
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Longest side of generated thumbnails (pixels)
+THUMBNAIL_MAX_SIDE = 320
+# Served as /api/blobs/<blob_id>
+BLOB_URL_PREFIX = "/api/blobs/"
+
+
+def is_blob_id(blob_id: str) -> bool:
+    return len(blob_id) == 64 and all(c in "0123456789abcdef" for c in blob_id)
+
+
+class BlobStore:
+    """
+    Content-addressed store for result images (JPEG).
+
+    A blob's id is the SHA-256 of its bytes, so identical images are stored once,
+    writes are idempotent and a blob never changes once written (safe to cache
+    forever). Files are sharded by the first two hex characters of the id.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, blob_id: str) -> str:
+        if not is_blob_id(blob_id):
+            raise ValueError(f"Invalid blob id: {blob_id!r}")
+        return os.path.join(self.root, blob_id[:2], f"{blob_id}.jpg")
+
+    def exists(self, blob_id: str) -> bool:
+        return os.path.exists(self.path(blob_id))
+
+    def put(self, data: bytes) -> str:
+        blob_id = hashlib.sha256(data).hexdigest()
+        path = self.path(blob_id)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Unique temp name: several workers may write the same blob concurrently
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return blob_id
+
+    def get(self, blob_id: str) -> Optional[bytes]:
+        try:
+            with open(self.path(blob_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put_image(self, data_uri: str) -> Dict[str, str]:
+        """
+        Store a base64 JPEG data URI and its thumbnail.
+        Returns an image reference: {blob_id, url, thumbnail_url}.
+        """
+        data = base64.b64decode(data_uri.split(",", 1)[1] if "," in data_uri else data_uri)
+        blob_id = self.put(data)
+        thumbnail = self._thumbnail(data)
+        thumbnail_id = self.put(thumbnail) if thumbnail else blob_id
+        return {
+            "blob_id": blob_id,
+            "url": BLOB_URL_PREFIX + blob_id,
+            "thumbnail_url": BLOB_URL_PREFIX + thumbnail_id,
+        }
+
+    def data_uri(self, image_ref: Dict[str, str]) -> Optional[str]:
+        """Inline an image reference again (e.g. to send the image to the LLM)."""
+        data = self.get(image_ref["blob_id"])
+        if data is None:
+            return None
+        return "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+
+    def _thumbnail(self, data: bytes) -> Optional[bytes]:
+        import cv2
+        import numpy as np
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            logger.warning("Could not decode image for thumbnail")
+            return None
+        h, w = image.shape[:2]
+        if max(h, w) <= THUMBNAIL_MAX_SIDE:
+            return None  # Already small: the image is its own thumbnail
+        scale = THUMBNAIL_MAX_SIDE / max(h, w)
+        image = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        return buffer.tobytes() if ok else None
+
+
+# Shared store; BLOB_DIR is relative to the working directory like uploads/
+blob_store = BlobStore(os.getenv("BLOB_DIR", "blobs"))
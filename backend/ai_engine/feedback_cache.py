@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from .profiling import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Bump when the feedback prompt changes so old answers are not served for it
+PROMPT_VERSION = "1"
+
+# A hit refreshes the entry's LRU position at most this often, so lookups stay reads
+TOUCH_INTERVAL_SECONDS = 3600
+
+# Latency and tokens of the original call are stored per entry, so every hit records what it saved
+LOOKUPS = REGISTRY.counter("shuttlecoach_feedback_cache_lookups_total", "Feedback cache lookups by result", ["result"])
+TOKENS = REGISTRY.counter("shuttlecoach_feedback_cache_tokens_total",
+                          "LLM feedback tokens spent on misses and saved by hits", ["kind"])
+SAVED_SECONDS = REGISTRY.counter("shuttlecoach_feedback_cache_saved_seconds_total", "LLM latency saved by feedback cache hits")
+CALLS = REGISTRY.counter("shuttlecoach_feedback_calls_total", "LLM feedback calls stored in the cache, by whether images were sent",
+                         ["images"])
+
+# When to attach the keyframe/sequence JPEGs to a feedback request:
+#   always - every call (original behaviour)
+#   issues - only when rules found issues: a clean swing gets text-only praise,
+#            and the images only matter for diagnosing what went wrong
+#   never  - metrics and issue tags only
+IMAGE_POLICIES = ("always", "issues", "never")
+
+
+def images_needed(policy: str, issue_tags: List[str]) -> bool:
+    if policy == "always":
+        return True
+    if policy == "issues":
+        return bool(issue_tags)
+    return False
+
+
+class FeedbackCache:
+    """
+    Cache of LLM feedback keyed by what the answer depends on: action, issue
+    tag set and the metric vector quantized to `bucket` (so metrics within a
+    few hundredths share an entry), plus model, prompt version and whether
+    images were sent.
+
+    Entries live in the feedback_cache table of the main database (`database`,
+    the shared one by default). They expire after `ttl_seconds`; beyond
+    `max_entries` the least recently used ones are evicted. Hits, misses and
+    savings are process counters (see /metrics), not database rows.
+    """
+
+    def __init__(self, database=None, bucket: float = 0.05, ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 10000):
+        self._database = database
+        self.bucket = bucket
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    @property
+    def database(self):
+        if self._database is None:
+            # Opened on first use, not when the LLM client is imported
+            from backend.database import db
+            self._database = db
+        return self._database
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, model: str, action: str, issue_tags: Iterable[str], metrics: Dict[str, float], with_images: bool) -> str:
+        quantized = {name: int(round(float(value) / self.bucket)) for name, value in sorted(metrics.items())}
+        material = json.dumps([PROMPT_VERSION, model, action, sorted(set(issue_tags)), quantized,
+                               self.bucket, bool(with_images)], separators=(",", ":"))
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached feedback, or None (expired entries count as misses)."""
+        now = time.time()
+        cached = self.database.get_cached_feedback(key, now - self.ttl_seconds, now - TOUCH_INTERVAL_SECONDS)
+        if cached is None:
+            LOOKUPS.inc("miss")
+            return None
+        feedback, latency_ms, tokens = cached
+        LOOKUPS.inc("hit")
+        TOKENS.inc("saved", amount=tokens)
+        SAVED_SECONDS.inc(amount=latency_ms / 1000)
+        return feedback
+
+    def put(self, key: str, action: str, feedback: Dict[str, Any], with_images: bool, latency_ms: float, tokens: int):
+        self.database.put_cached_feedback(key, action, feedback, with_images, latency_ms, tokens,
+                                          time.time() - self.ttl_seconds, self.max_entries)
+        TOKENS.inc("spent", amount=tokens)
+        CALLS.inc("yes" if with_images else "no")
+
+    def stats(self) -> Dict[str, Any]:
+        """Entries stored, and lookups and savings since this process started."""
+        hits, misses = LOOKUPS.value("hit"), LOOKUPS.value("miss")
+        lookups = hits + misses
+        return {
+            "entries": self.database.count_cached_feedback(),
+            "lookups": int(lookups),
+            "hits": int(hits),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "tokens_spent": int(TOKENS.value("spent")),
+            "tokens_saved": int(TOKENS.value("saved")),
+            "latency_saved_sec": round(SAVED_SECONDS.value(), 1),
+            "llm_calls_with_images": int(CALLS.value("yes")),
+            "llm_calls_without_images": int(CALLS.value("no")),
+        }
+
+
+# Shared cache, stored in the main database
+feedback_cache = FeedbackCache(
+    bucket=float(os.getenv("FEEDBACK_CACHE_BUCKET", "0.05")),
+    ttl_seconds=float(os.getenv("FEEDBACK_CACHE_TTL_HOURS", "168")) * 3600,
+    max_entries=int(os.getenv("FEEDBACK_CACHE_MAX_ENTRIES", "10000")),
+)
@@ -0,0 +1,192 @@
+"""
+Decode and preprocess video frames ahead of pose inference.
+
+FrameReader yields the sampled frames of a capture as (frame index, kept
+frame, inference frame), both made from the decoded frame by `prepare` (in
+VideoProcessor: the decoded BGR frame itself, for the snapshots, and the
+resized RGB frame). With a frame budget it runs two threads:
+
+    decode thread -> queue -> preprocess thread -> queue -> caller (inference, landmarks)
+
+VideoCapture.read/grab, cv2.resize and cv2.cvtColor release the GIL, as does
+pose inference, so decoding the next frames overlaps inference of the current
+ones. The budget bounds the frames alive at once: the decoder takes one slot
+per sampled frame before reading it, and the caller returns slots with
+release() once it is done with those frames (after inference and the
+snapshots). Frames in flight therefore take at most budget x (kept frame +
+inference frame), whatever the relative speed of the stages; a caller may
+hold on to a few kept frames past release() (SnapshotCollector does).
+
+PIPELINE_FRAME_BUDGET=0 decodes and preprocesses on the calling thread
+instead (the serial behaviour).
+"""
+import os
+import queue
+import threading
+import contextvars
+import logging
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .profiling import stage
+
+logger = logging.getLogger(__name__)
+
+# Frames decoded ahead of inference per video; 0 = no pipeline threads (the default on a single core)
+FRAME_BUDGET = int(os.getenv("PIPELINE_FRAME_BUDGET", "16" if (os.cpu_count() or 1) > 1 else "0"))
+# Seconds between checks of the stop flag while a thread waits
+_POLL = 0.1
+
+_END = object()
+
+Frame = Tuple[int, np.ndarray, np.ndarray]
+
+
+class FrameReader:
+    """
+    Sampled frames of an opened capture: every `stride`-th frame (by absolute
+    index), from `first` through `last` (None = until the end of the video).
+    Off-stride frames are only grabbed, never decoded or converted.
+    `prepare` maps a decoded BGR frame to (kept frame, inference frame).
+    Use as a context manager so the threads stop when the caller does.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, stride: int, prepare: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]],
+                 first: int = 0, last: Optional[int] = None, budget: int = FRAME_BUDGET):
+        self.cap = cap
+        self.stride = stride
+        self.prepare = prepare
+        self.last = last
+        self.budget = max(0, budget)
+        # Next frame index to decode, and frames decoded or grabbed so far
+        self.frame_idx = first
+        self.frames_decoded = 0
+        self._threads: List[threading.Thread] = []
+        self._error: Optional[BaseException] = None
+        if self.budget:
+            self._slots = threading.Semaphore(self.budget)
+            self._decoded: queue.Queue = queue.Queue(maxsize=self.budget)
+            self._prepared: queue.Queue = queue.Queue(maxsize=self.budget)
+            self._stop = threading.Event()
+
+    def __enter__(self) -> "FrameReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self) -> Iterator[Frame]:
+        if not self.budget:
+            yield from self._serial()
+            return
+        self._start()
+        while True:
+            item = self._get(self._prepared)
+            if item is _END:
+                break
+            yield item
+        if self._error is not None:
+            raise self._error
+
+    def release(self, frames: int = 1):
+        """Return the budget slots of `frames` yielded frames the caller no longer holds."""
+        if self.budget and frames:
+            self._slots.release(frames)
+
+    def close(self):
+        """Stop the threads (also when the caller stopped iterating early)."""
+        if not self._threads:
+            return
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _read(self) -> Optional[Tuple[int, np.ndarray]]:
+        """Advance to the next sampled frame and decode it; None at the end."""
+        while self.last is None or self.frame_idx <= self.last:
+            frame_idx = self.frame_idx
+            if frame_idx % self.stride:
+                with stage("decode"):
+                    grabbed = self.cap.grab()
+                if not grabbed:
+                    return None
+                self.frame_idx += 1
+                self.frames_decoded += 1
+                continue
+            with stage("decode"):
+                success, image = self.cap.read()
+            if not success:
+                return None
+            self.frame_idx += 1
+            self.frames_decoded += 1
+            return frame_idx, image
+        return None
+
+    def _serial(self) -> Iterator[Frame]:
+        while True:
+            item = self._read()
+            if item is None:
+                return
+            with stage("preprocess"):
+                kept, inference_image = self.prepare(item[1])
+            yield item[0], kept, inference_image
+
+    # --- Threads ---
+
+    def _start(self):
+        for target, name in ((self._decode_loop, "decode"), (self._prepare_loop, "preprocess")):
+            # Each thread runs in a copy of the caller's context: stage timers and trace IDs carry over
+            context = contextvars.copy_context()
+            thread = threading.Thread(target=context.run, args=(target,), name=f"frames-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _decode_loop(self):
+        try:
+            while not self._stop.is_set():
+                if not self._slots.acquire(timeout=_POLL):
+                    continue
+                item = self._read()
+                if item is None:
+                    break
+                self._put(self._decoded, item)
+        except BaseException as e:
+            logger.error(f"Frame decoding failed: {e}")
+            self._error = e
+        finally:
+            self._put(self._decoded, _END)
+
+    def _prepare_loop(self):
+        try:
+            while True:
+                item = self._get(self._decoded)
+                if item is _END:
+                    break
+                frame_idx, image = item
+                with stage("preprocess"):
+                    kept, inference_image = self.prepare(image)
+                self._put(self._prepared, (frame_idx, kept, inference_image))
+        except BaseException as e:
+            logger.error(f"Frame preprocessing failed: {e}")
+            self._error = e
+        finally:
+            self._put(self._prepared, _END)
+
+    def _put(self, q: queue.Queue, item):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while True:
+            try:
+                return q.get(timeout=_POLL)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _END
@@ -0,0 +1,95 @@
+import numpy as np
+from .landmarks import LandmarkTrack
+
+# Minimum nose-to-ankle span (normalized) for a frame to count towards body height.
+# Whole-clip detection tolerates crouched/partial frames, the hit window is stricter.
+CLIP_MIN_BODY_HEIGHT = 0.05
+WINDOW_MIN_BODY_HEIGHT = 0.1
+DEFAULT_BODY_HEIGHT = 0.5
+
+
+class Kinematics:
+    """
+    Kinematic signals derived once from a LandmarkTrack.
+
+    Every per-frame quantity the metrics need (wrist steps, speeds and
+    accelerations, body height, shoulder width, ...) is computed here as a
+    NumPy array so metric functions only slice and reduce.
+    Step arrays have len(track) - 1 rows: row i is the motion from row i to i + 1.
+    Speeds are per source frame (step / frame gap), so they stay comparable when
+    the track is sampled sparsely or detections drop out; window bounds are
+    likewise given in source frames and resolved to rows with `rows_around`.
+    """
+
+    def __init__(self, track: LandmarkTrack):
+        self.track = track
+        self.n_frames = len(track)
+        self.frame_indices = track.frame_indices
+        # Source frames between consecutive rows (1 for a dense track)
+        self.frame_gaps = np.maximum(np.diff(self.frame_indices), 1).astype(np.float64)
+
+        nose = track.xy('nose').astype(np.float64)
+        self.nose_x = nose[:, 0]
+        self.nose_y = nose[:, 1]
+
+        wrist = track.xy('right_wrist').astype(np.float64)
+        self.wrist = wrist
+        self.wrist_y = wrist[:, 1]
+        # Higher of the two wrists (smaller y)
+        self.higher_wrist_y = np.minimum(self.wrist_y, track.y('left_wrist'))
+
+        # Right wrist motion between rows, and per source frame
+        self.wrist_steps = np.diff(wrist, axis=0)
+        self.wrist_step_dist = np.hypot(self.wrist_steps[:, 0], self.wrist_steps[:, 1])
+        self.wrist_speed = self.wrist_step_dist / self.frame_gaps
+        self.wrist_down_speed = self.wrist_steps[:, 1] / self.frame_gaps
+        self.wrist_accel = np.diff(self.wrist_speed)
+
+        ankle_y = (track.y('right_ankle').astype(np.float64) + track.y('left_ankle')) / 2
+        self.body_height = np.abs(ankle_y - self.nose_y)
+
+        shoulders = track.xy('right_shoulder').astype(np.float64) - track.xy('left_shoulder')
+        self.shoulder_width = np.hypot(shoulders[:, 0], shoulders[:, 1])
+
+        upper_arm = track.xy('right_elbow').astype(np.float64) - track.xy('right_shoulder')
+        self.elbow_shoulder_dist = np.hypot(upper_arm[:, 0], upper_arm[:, 1])
+
+        # Clip-level normalization, shared by action detection
+        self.clip_body_height = self.avg_body_height(0, self.n_frames - 1, CLIP_MIN_BODY_HEIGHT)
+        self.normalized_reach = (self.nose_y - self.higher_wrist_y) / self.clip_body_height
+        self.normalized_speed = self.wrist_speed / self.clip_body_height
+        self.normalized_downward = self.wrist_down_speed / self.clip_body_height
+
+    def __len__(self) -> int:
+        return self.n_frames
+
+    def avg_body_height(self, start: int, end: int, min_height: float = WINDOW_MIN_BODY_HEIGHT) -> float:
+        """Mean body height over rows start..end (inclusive), ignoring implausibly small spans."""
+        heights = self.body_height[start:end + 1]
+        heights = heights[heights > min_height]
+        return float(heights.mean()) if heights.size else DEFAULT_BODY_HEIGHT
+
+    def rows_around(self, row: int, before: int, after: int):
+        """Rows whose source frame lies within [frame - before, frame + after] of `row` (start, end exclusive)."""
+        frame = self.frame_indices[row]
+        start = int(np.searchsorted(self.frame_indices, frame - before, side='left'))
+        end = int(np.searchsorted(self.frame_indices, frame + after, side='right'))
+        return start, end
+
+    def frame_distance(self, row_a: int, row_b: int) -> int:
+        """Number of source frames between two rows."""
+        return int(abs(self.frame_indices[row_a] - self.frame_indices[row_b]))
+
+    def path_length(self, start: int, end: int) -> float:
+        """Distance travelled by the right wrist between rows start and end."""
+        return float(self.wrist_step_dist[start:end].sum())
+
+    def max_speed(self, start: int, end: int) -> float:
+        """Largest per-frame wrist speed between rows start and end (0 if none)."""
+        speeds = self.wrist_speed[start:end]
+        return max(0.0, float(speeds.max())) if speeds.size else 0.0
+
+    def max_downward_step(self, start: int, end: int) -> float:
+        """Largest per-frame downward wrist speed between rows start and end (0 if none)."""
+        steps = self.wrist_down_speed[start:end]
+        return max(0.0, float(steps.max())) if steps.size else 0.0
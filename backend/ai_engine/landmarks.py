@@ -0,0 +1,131 @@
+import numpy as np
+from typing import Dict, Tuple
+
+# Joints tracked by the metric engine, in column order of LandmarkTrack.data
+JOINTS = (
+    'nose',
+    'right_wrist', 'left_wrist',
+    'right_shoulder', 'left_shoulder',
+    'right_hip', 'left_hip',
+    'right_ankle', 'left_ankle',
+    'right_elbow', 'left_elbow',
+)
+JOINT_INDEX = {name: i for i, name in enumerate(JOINTS)}
+
+# Index of each joint in the 33-point BlazePose topology used by MediaPipe
+BLAZEPOSE_INDEX = {
+    'nose': 0,
+    'left_shoulder': 11, 'right_shoulder': 12,
+    'left_elbow': 13, 'right_elbow': 14,
+    'left_wrist': 15, 'right_wrist': 16,
+    'left_hip': 23, 'right_hip': 24,
+    'left_ankle': 27, 'right_ankle': 28,
+}
+_BLAZEPOSE_COLUMNS = [BLAZEPOSE_INDEX[name] for name in JOINTS]
+
+# Channels per joint: normalized x, y, z and visibility
+CHANNELS = 4
+
+
+def blazepose_row(landmarks) -> np.ndarray:
+    """(len(JOINTS), CHANNELS) float32 row from a MediaPipe landmark list (33 BlazePose points)."""
+    row = np.empty((len(JOINTS), CHANNELS), dtype=np.float32)
+    for j, src in enumerate(_BLAZEPOSE_COLUMNS):
+        lm = landmarks[src]
+        row[j] = (lm.x, lm.y, lm.z, lm.visibility)
+    return row
+
+
+class LandmarkTrack:
+    """
+    Compact, array-backed pose track.
+
+    `data` is a (frames, joints, 4) float32 array holding x/y/z/visibility for
+    every joint in JOINTS, and `frame_indices` holds the source video frame of
+    each row (frames without a detection are simply absent).
+    The buffer grows geometrically, so appending is amortized O(1) and no
+    per-frame Python objects are kept alive.
+    """
+
+    def __init__(self, capacity: int = 256):
+        capacity = max(1, int(capacity))
+        self._data = np.empty((capacity, len(JOINTS), CHANNELS), dtype=np.float32)
+        self._frames = np.empty(capacity, dtype=np.int64)
+        self._size = 0
+
+    @classmethod
+    def from_arrays(cls, data: np.ndarray, frame_indices: np.ndarray) -> "LandmarkTrack":
+        """Wrap existing arrays without copying (used for slices and stored tracks)."""
+        track = cls.__new__(cls)
+        track._data = data
+        track._frames = frame_indices
+        track._size = len(frame_indices)
+        return track
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, item: slice) -> "LandmarkTrack":
+        if not isinstance(item, slice):
+            raise TypeError("LandmarkTrack only supports slicing; use frame_landmarks() for single rows")
+        return LandmarkTrack.from_arrays(self.data[item], self.frame_indices[item])
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    @property
+    def frame_indices(self) -> np.ndarray:
+        return self._frames[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._data.nbytes + self._frames.nbytes)
+
+    def _next_row(self, frame_idx: int) -> np.ndarray:
+        if self._size == len(self._frames):
+            self._grow()
+        self._frames[self._size] = frame_idx
+        row = self._data[self._size]
+        self._size += 1
+        return row
+
+    def _grow(self):
+        capacity = len(self._frames) * 2
+        data = np.empty((capacity, len(JOINTS), CHANNELS), dtype=np.float32)
+        frames = np.empty(capacity, dtype=np.int64)
+        data[:self._size] = self._data[:self._size]
+        frames[:self._size] = self._frames[:self._size]
+        self._data, self._frames = data, frames
+
+    def append(self, frame_idx: int, joints: np.ndarray):
+        """Append one frame given as a (joints, 4) array in JOINTS order."""
+        self._next_row(frame_idx)[:] = joints
+
+    def extend(self, other: "LandmarkTrack"):
+        """Append all rows of another track (e.g. a slice) in one copy."""
+        n = len(other)
+        while self._size + n > len(self._frames):
+            self._grow()
+        self._data[self._size:self._size + n] = other.data
+        self._frames[self._size:self._size + n] = other.frame_indices
+        self._size += n
+
+    def joint(self, name: str) -> np.ndarray:
+        """(frames, 4) view of a single joint."""
+        return self.data[:, JOINT_INDEX[name]]
+
+    def x(self, name: str) -> np.ndarray:
+        return self.data[:, JOINT_INDEX[name], 0]
+
+    def y(self, name: str) -> np.ndarray:
+        return self.data[:, JOINT_INDEX[name], 1]
+
+    def xy(self, name: str) -> np.ndarray:
+        """(frames, 2) view of a joint's normalized image coordinates."""
+        return self.data[:, JOINT_INDEX[name], :2]
+
+    def frame_landmarks(self, idx: int) -> Dict[str, Tuple[float, float]]:
+        """Normalized (x, y) per joint for one row, e.g. for drawing overlays."""
+        row = self.data[idx]
+        return {name: (float(row[j, 0]), float(row[j, 1])) for j, name in enumerate(JOINTS)}
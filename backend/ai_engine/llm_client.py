@@ -1,45 +1,120 @@
 import os
 import json
+import asyncio
 import logging
-import base64
-import google.generativeai as genai
-from typing import Dict, Any, Optional, List
+import threading
+import time
+from concurrent.futures import Future
+from typing import AsyncIterator, Dict, Any, Optional, List
 from dotenv import load_dotenv
+from .llm_transport import AsyncGeminiClient, CircuitBreaker, LLMUnavailable
+from .feedback_cache import IMAGE_POLICIES, feedback_cache, images_needed
+from .profiling import REGISTRY, current_trace_id, trace
 
 # Load environment variables from .env file
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")
+# Deadlines (seconds) per call, including retries; past them the rule-based feedback is used
+LLM_FEEDBACK_TIMEOUT = float(os.getenv("LLM_FEEDBACK_TIMEOUT", "20"))
+LLM_CHAT_TIMEOUT = float(os.getenv("LLM_CHAT_TIMEOUT", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+# When feedback requests carry the keyframe images: always | issues | never
+LLM_IMAGE_POLICY = os.getenv("LLM_IMAGE_POLICY", "issues")
+if LLM_IMAGE_POLICY not in IMAGE_POLICIES:
+    logger.warning(f"Unknown LLM_IMAGE_POLICY '{LLM_IMAGE_POLICY}', using 'issues'")
+    LLM_IMAGE_POLICY = "issues"
+
 class GeminiCoach:
+    """
+    Gemini-backed feedback and chat.
+
+    All requests run on one private event loop thread, so the concurrency limit
+    and circuit breaker are shared by every caller in the process: async callers
+    (`*_async`, e.g. API handlers) await without blocking their loop, sync
+    callers (analysis workers) block only up to the call's deadline.
+    """
+
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
-        self.enabled = False
-        self.model = None
-        
+        self.enabled = bool(self.api_key)
         self.proxy = os.getenv("GEMINI_PROXY")
+        self.breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET)
+        self.client = AsyncGeminiClient(
+            self.api_key or "", GEMINI_MODEL, GEMINI_BASE_URL,
+            max_concurrency=LLM_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES,
+            breaker=self.breaker, proxy=self.proxy,
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
 
-        if self.api_key:
-            try:
-                # Configure proxy if available
-                if self.proxy:
-                    os.environ["http_proxy"] = self.proxy
-                    os.environ["https_proxy"] = self.proxy
-                    logger.info(f"Using Gemini Proxy: {self.proxy}")
-
-                # Configure GenAI - prefer REST for better proxy compatibility
-                genai.configure(api_key=self.api_key, transport="rest")
-                
-                # Use gemini-3-flash-preview as requested
-                self.model = genai.GenerativeModel('gemini-3-flash-preview') 
-                self.enabled = True
-                logger.info("Gemini AI Coach enabled.")
-            except Exception as e:
-                logger.error(f"Failed to initialize Gemini: {e}")
+        if self.enabled:
+            if self.proxy:
+                logger.info(f"Using Gemini Proxy: {self.proxy}")
+            logger.info(f"Gemini AI Coach enabled ({GEMINI_MODEL}).")
+
+    def _submit(self, coro) -> Future:
+        """Schedule a coroutine on the client's loop, starting the loop thread on first use."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(self._traced(coro, current_trace_id()), self._loop)
+
+    @staticmethod
+    async def _traced(coro, trace_id: Optional[str]):
+        """Run `coro` under the caller's trace ID (the loop thread has its own context)."""
+        with trace(trace_id):
+            return await coro
+
+    def close(self):
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
 
     def generate_feedback(self, action_type: str, score: int, metrics: Dict, issues: List, keyframe_base64: Optional[str], action_sequence: List[str] = []) -> Optional[Dict]:
+        """Blocking variant for worker processes; returns None on any failure."""
+        if not self.enabled:
+            return None
+        return self._submit(self._generate_feedback(action_type, score, metrics, issues, keyframe_base64, action_sequence)).result()
+
+    async def generate_feedback_async(self, action_type: str, score: int, metrics: Dict, issues: List, keyframe_base64: Optional[str], action_sequence: List[str] = []) -> Optional[Dict]:
         if not self.enabled:
             return None
+        return await asyncio.wrap_future(self._submit(self._generate_feedback(action_type, score, metrics, issues, keyframe_base64, action_sequence)))
+
+    def chat_with_coach(self, context: Dict[str, Any], user_msg: str, history: List[Dict[str, str]], language: str = "zh") -> str:
+        if not self.enabled:
+            return "AI Coach is currently unavailable."
+        return self._submit(self._chat(context, user_msg, history, language)).result()
+
+    async def chat_with_coach_async(self, context: Dict[str, Any], user_msg: str, history: List[Dict[str, str]], language: str = "zh") -> str:
+        if not self.enabled:
+            return "AI Coach is currently unavailable."
+        return await asyncio.wrap_future(self._submit(self._chat(context, user_msg, history, language)))
+
+    async def _generate_feedback(self, action_type: str, score: int, metrics: Dict, issues: List, keyframe_base64: Optional[str], action_sequence: List[str]) -> Optional[Dict]:
+        issue_tags = [i.tag if hasattr(i, 'tag') else (i.get('tag') if isinstance(i, dict) else str(i)) for i in issues]
+        with_images = images_needed(LLM_IMAGE_POLICY, issue_tags)
+        cache_key = None
+        if feedback_cache.enabled:
+            numeric = {k: v for k, v in metrics.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+            cache_key = feedback_cache.key(GEMINI_MODEL, action_type, issue_tags, numeric, with_images)
+            try:
+                cached = await asyncio.to_thread(feedback_cache.get, cache_key)
+                if cached is not None:
+                    return cached
+            except Exception as e:
+                logger.warning(f"Feedback cache lookup failed: {e}")
 
         try:
             # 1. Prepare Text Prompt
@@ -80,10 +155,12 @@ class GeminiCoach:
             }}
             """
             
-            content = [prompt]
+            parts = [{"text": prompt}]
             
-            # 2. Prepare Images (Sequence preferred, fallback to keyframe)
+            # 2. Prepare Images (Sequence preferred, fallback to keyframe), unless the policy skips them
             images_to_process = action_sequence if action_sequence else ([keyframe_base64] if keyframe_base64 else [])
+            if not with_images:
+                images_to_process = []
             
             for b64_img in images_to_process:
                 if not b64_img: continue
@@ -94,24 +171,18 @@ class GeminiCoach:
                     else:
                         b64_data = b64_img
                     
-                    image_data = base64.b64decode(b64_data)
-                    
-                    # Pass as blob
-                    image_blob = {
-                        "mime_type": "image/jpeg",
-                        "data": image_data
-                    }
-                    content.append(image_blob)
+                    # Pass inline (the REST API takes base64 as is)
+                    parts.append({"inline_data": {"mime_type": "image/jpeg", "data": b64_data}})
                 except Exception as img_err:
                     logger.warning(f"Failed to process image for Gemini: {img_err}")
 
             # 3. Call API
-            # generation_config={"response_mime_type": "application/json"} is supported in newer SDKs
-            response = self.model.generate_content(content)
+            started = time.perf_counter()
+            text, usage = await self.client.generate_with_usage([{"role": "user", "parts": parts}], LLM_FEEDBACK_TIMEOUT,
+                                                                generation_config={"responseMimeType": "application/json"})
+            latency_ms = (time.perf_counter() - started) * 1000
             
             # 4. Parse Response
-            text = response.text.strip()
-            
             # Clean markdown code blocks
             if text.startswith("```json"):
                 text = text[7:]
@@ -120,35 +191,45 @@ class GeminiCoach:
             if text.endswith("```"):
                 text = text[:-3]
                 
-            return json.loads(text.strip())
+            feedback = json.loads(text.strip())
 
         except Exception as e:
-            logger.error(f"Gemini generation failed: {e}")
+            # LLMError (deadline, retries exhausted, circuit open) or an unparseable answer
+            logger.error(f"Gemini generation failed, using rule-based feedback: {e}")
             return None
 
-    def chat_with_coach(self, context: Dict[str, Any], user_msg: str, history: List[Dict[str, str]], language: str = "zh") -> str:
-        if not self.enabled:
-            return "AI Coach is currently unavailable."
-            
-        try:
-            # 1. Build System Context
-            action = context.get('action', 'Unknown')
-            score = context.get('score', 0)
-            issues = context.get('issues', [])
-            
-            # Convert issues to text summary based on language
-            issues_text = ""
-            for idx, issue in enumerate(issues):
-                tag = issue.get('tag', 'Issue') if isinstance(issue, dict) else issue.tag
-                # Extract tip based on language preference
-                if isinstance(issue, dict):
-                    tip = issue.get('coach_tip', {}).get(language, issue.get('coach_tip', {}).get('zh', ''))
-                else:
-                    tip = issue.coach_tip.get(language, issue.coach_tip.get('zh', ''))
-                issues_text += f"{idx+1}. {tag}: {tip}\n"
+        if cache_key is not None:
+            try:
+                await asyncio.to_thread(feedback_cache.put, cache_key, action_type, feedback, bool(images_to_process),
+                                        latency_ms, int(usage.get("totalTokenCount", 0)))
+            except Exception as e:
+                logger.warning(f"Feedback cache store failed: {e}")
+        return feedback
+
+    def build_chat_context(self, context: Dict[str, Any], language: str = "zh") -> List[Dict[str, Any]]:
+        """
+        Opening turns of a chat about one analysis (system prompt and the coach's
+        acknowledgement, in Gemini contents format). Chat sessions build this once
+        and prepend it to every message.
+        """
+        # 1. Build System Context
+        action = context.get('action', 'Unknown')
+        score = context.get('score', 0)
+        issues = context.get('issues', [])
+        
+        # Convert issues to text summary based on language
+        issues_text = ""
+        for idx, issue in enumerate(issues):
+            tag = issue.get('tag', 'Issue') if isinstance(issue, dict) else issue.tag
+            # Extract tip based on language preference
+            if isinstance(issue, dict):
+                tip = issue.get('coach_tip', {}).get(language, issue.get('coach_tip', {}).get('zh', ''))
+            else:
+                tip = issue.coach_tip.get(language, issue.coach_tip.get('zh', ''))
+            issues_text += f"{idx+1}. {tag}: {tip}\n"
 
-            if language == "en":
-                system_prompt = f"""
+        if language == "en":
+            system_prompt = f"""
 You are a professional badminton coach. You have just analyzed this student's action video.
 Analysis Results:
 - Action Type: {action}
@@ -161,9 +242,9 @@ Maintain a professional and encouraging tone. If the student asks non-badminton
 Keep your answers concise.
 IMPORTANT: You MUST reply in English.
 """
-                welcome_msg = "Understood. I am your AI Badminton Coach. How can I help you today?"
-            else:
-                system_prompt = f"""
+            welcome_msg = "Understood. I am your AI Badminton Coach. How can I help you today?"
+        else:
+            system_prompt = f"""
 你是一位专业的羽毛球教练。你刚刚分析了这位学员的动作视频。
 分析结果如下：
 - 动作类型：{action}
@@ -176,34 +257,92 @@ IMPORTANT: You MUST reply in English.
 回答请简练，不要长篇大论。
 重要：请务必使用中文回答。
 """
-                welcome_msg = "收到，我是您的羽毛球 AI 教练。请问有什么可以帮您？"
+            welcome_msg = "收到，我是您的羽毛球 AI 教练。请问有什么可以帮您？"
+
+        # Prepend context
+        return [
+            {"role": "user", "parts": [{"text": system_prompt + "\n\n(Context provided. Please acknowledge.)"}]},
+            {"role": "model", "parts": [{"text": welcome_msg}]},
+        ]
+
+    @staticmethod
+    def chat_error_message(language: str) -> str:
+        if language == "en":
+            return "Sorry, the coach is a bit busy right now. Please try again later."
+        return "抱歉，教练现在有点忙，请稍后再试。"
+
+    async def stream_chat_async(self, contents: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        """
+        Stream the reply to prebuilt `contents` (ending with the user's message).
+        Chunks are produced on the client's loop and handed over to the caller's;
+        raises LLMError if the call fails. Closing the iterator cancels the request.
+        """
+        if not self.enabled:
+            raise LLMUnavailable("AI Coach is disabled")
+        caller = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump():
+            try:
+                async for text in self.client.stream(contents, LLM_CHAT_TIMEOUT):
+                    caller.call_soon_threadsafe(queue.put_nowait, text)
+                caller.call_soon_threadsafe(queue.put_nowait, None)
+            except Exception as e:
+                caller.call_soon_threadsafe(queue.put_nowait, e)
+
+        future = self._submit(pump())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    async def summarize_chat_async(self, summary: Optional[str], turns: List[Dict[str, str]], language: str) -> Optional[str]:
+        """Fold `turns` into the running conversation summary; None if the LLM is unavailable."""
+        if not self.enabled:
+            return None
+        transcript = "\n".join(f"{'Student' if t['role'] == 'user' else 'Coach'}: {t['content']}" for t in turns)
+        prompt = f"""
+Summarize this badminton coaching conversation for the coach's own notes, in at most 120 words,
+in {'English' if language == 'en' else 'Chinese'}. Keep the student's goals, questions, and the advice already given.
+
+Earlier summary: {summary or '(none)'}
+
+Conversation:
+{transcript}
+"""
+        try:
+            coro = self.client.generate([{"role": "user", "parts": [{"text": prompt}]}], LLM_CHAT_TIMEOUT)
+            return await asyncio.wrap_future(self._submit(coro))
+        except Exception as e:
+            logger.warning(f"Chat summary failed: {e}")
+            return None
+
+    async def _chat(self, context: Dict[str, Any], user_msg: str, history: List[Dict[str, str]], language: str) -> str:
+        try:
+            gemini_history = self.build_chat_context(context, language)
             
             # 2. Build Chat History for API
-            gemini_history = []
-            
-            # Prepend context
-            gemini_history.append({"role": "user", "parts": [system_prompt + "\n\n(Context provided. Please acknowledge.)"]})
-            gemini_history.append({"role": "model", "parts": [welcome_msg]})
-            
             for msg in history:
                 role = "user" if msg['role'] == 'user' else "model"
                 content = msg['content']
-                gemini_history.append({"role": role, "parts": [content]})
+                gemini_history.append({"role": role, "parts": [{"text": content}]})
             
-            # 3. Start Chat
-            chat = self.model.start_chat(history=gemini_history)
-            
-            # 4. Send Message
-            response = chat.send_message(user_msg)
-            return response.text.strip()
+            # 3. Send the history plus the new message in one stateless request
+            gemini_history.append({"role": "user", "parts": [{"text": user_msg}]})
+            return await self.client.generate(gemini_history, LLM_CHAT_TIMEOUT)
             
         except Exception as e:
             logger.error(f"Chat generation failed: {e}")
-            if language == "en":
-                e_msg = "Sorry, the coach is a bit busy right now. Please try again later."
-            else:
-                e_msg = "抱歉，教练现在有点忙，请稍后再试。"
-            return e_msg
+            return self.chat_error_message(language)
 
 # Singleton instance
 gemini_coach = GeminiCoach()
+
+REGISTRY.gauge("shuttlecoach_llm_circuit_open", "1 while the LLM circuit breaker rejects calls",
+               lambda: 1 if gemini_coach.breaker.state == "open" else 0)
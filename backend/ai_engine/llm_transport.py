@@ -0,0 +1,318 @@
+import json
+import time
+import random
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from .profiling import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Upstream answers worth retrying (rate limited, overloaded, transient server errors)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Retry backoff: full jitter over an exponentially growing cap
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 8.0
+
+# call: generate | stream; outcome: ok | error (bad request/answer) | unavailable (deadline, retries, circuit)
+LLM_SECONDS = REGISTRY.histogram("shuttlecoach_llm_seconds", "Duration of LLM calls, retries included",
+                                 ["call", "outcome"])
+# Every HTTP attempt by status code ("transport" when no response arrived)
+LLM_RESPONSES = REGISTRY.counter("shuttlecoach_llm_responses_total", "Upstream LLM responses by HTTP status", ["status"])
+
+
+class LLMError(Exception):
+    """The LLM call failed; callers fall back to rule-based feedback."""
+
+
+class LLMUnavailable(LLMError):
+    """Deadline exceeded, retries exhausted or the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the upstream is unhealthy.
+
+    Closed: calls pass; `failure_threshold` consecutive failures open the circuit.
+    Open: calls are rejected until `reset_timeout` has passed.
+    Half-open: a single probe call is let through; its outcome closes or re-opens the circuit.
+    A probe that ends without an outcome (cancelled) calls release(); one that
+    never reports is replaced by a new probe after another `reset_timeout`.
+    Not thread-safe: use it from one event loop.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._probing = False
+        self._probe_started = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open":
+            now = time.monotonic()
+            if not self._probing or now - self._probe_started >= self.reset_timeout:
+                self._probing = True
+                self._probe_started = now
+                return True
+        return False
+
+    def release(self):
+        """The probe call was abandoned without telling anything about upstream health."""
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._probing:
+                self.times_opened += 1
+                logger.warning(f"LLM circuit opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+class AsyncGeminiClient:
+    """
+    Non-blocking client for the Gemini `generateContent` REST endpoint.
+
+    Every call has a deadline covering the wait for a concurrency slot, all
+    attempts and the backoff between them. Transient errors are retried with
+    jittered exponential backoff while the deadline allows; timeouts and
+    exhausted retries count as failures for the circuit breaker.
+    Bound to the event loop it is first used on.
+    """
+
+    def __init__(self, api_key: str, model: str, base_url: str, max_concurrency: int = 4,
+                 max_retries: int = 2, breaker: Optional[CircuitBreaker] = None, proxy: Optional[str] = None):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self._max_concurrency = max_concurrency
+        self._proxy = proxy
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/v1beta/models/{self.model}:generateContent"
+
+    @property
+    def stream_url(self) -> str:
+        return f"{self.base_url}/v1beta/models/{self.model}:streamGenerateContent?alt=sse"
+
+    async def generate(self, contents: List[Dict[str, Any]], timeout: float,
+                       generation_config: Optional[Dict[str, Any]] = None) -> str:
+        """Send `contents` (Gemini REST format) and return the response text."""
+        text, _ = await self.generate_with_usage(contents, timeout, generation_config)
+        return text
+
+    async def generate_with_usage(self, contents: List[Dict[str, Any]], timeout: float,
+                                  generation_config: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, int]]:
+        """Like generate, plus the response's usageMetadata (promptTokenCount, totalTokenCount, ...)."""
+        started = time.perf_counter()
+        probe = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            LLM_SECONDS.observe(0.0, "generate", "unavailable")
+            raise LLMUnavailable("circuit open")
+        body: Dict[str, Any] = {"contents": contents}
+        if generation_config:
+            body["generationConfig"] = generation_config
+        outcome = "unavailable"
+        try:
+            answer = await asyncio.wait_for(self._generate_with_retries(body, time.monotonic() + timeout), timeout)
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise LLMUnavailable(f"deadline of {timeout:.1f}s exceeded")
+        except asyncio.CancelledError:
+            # e.g. the chat client disconnected; a probe must not keep the circuit half-open
+            if probe:
+                self.breaker.release()
+            raise
+        except LLMUnavailable:
+            self.breaker.record_failure()
+            raise
+        except LLMError:
+            # Our request or the answer was bad; says nothing about upstream health
+            outcome = "error"
+            self.breaker.record_success()
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - started, "generate", outcome)
+        self.breaker.record_success()
+        return answer
+
+    async def stream(self, contents: List[Dict[str, Any]], timeout: float,
+                     generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Like generate, but yields the answer text in chunks as they arrive
+        (`streamGenerateContent`, SSE). The deadline covers the whole stream;
+        transient errors are retried only until the first chunk.
+        """
+        started = time.perf_counter()
+        probe = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            LLM_SECONDS.observe(0.0, "stream", "unavailable")
+            raise LLMUnavailable("circuit open")
+        body: Dict[str, Any] = {"contents": contents}
+        if generation_config:
+            body["generationConfig"] = generation_config
+        outcome = "unavailable"
+        try:
+            async for text in self._stream_with_retries(body, time.monotonic() + timeout):
+                yield text
+            outcome = "ok"
+        except LLMUnavailable:
+            self.breaker.record_failure()
+            raise
+        except (LLMError, GeneratorExit) as e:
+            # A bad request, or the consumer stopped reading; upstream was fine
+            outcome = "ok" if isinstance(e, GeneratorExit) else "error"
+            self.breaker.record_success()
+            raise
+        except asyncio.CancelledError:
+            if probe:
+                self.breaker.release()
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - started, "stream", outcome)
+        self.breaker.record_success()
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def _ensure_http(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(proxy=self._proxy, timeout=None)
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+
+    async def _generate_with_retries(self, body: Dict[str, Any], deadline: float) -> Tuple[str, Dict[str, int]]:
+        self._ensure_http()
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                try:
+                    response = await self._http.post(self.url, json=body, headers={"x-goog-api-key": self.api_key})
+                    retry_after = response.headers.get("retry-after")
+                    error = f"HTTP {response.status_code}"
+                    LLM_RESPONSES.inc(str(response.status_code))
+                except httpx.TransportError as e:
+                    response, retry_after, error = None, None, f"{type(e).__name__}: {e}"
+                    LLM_RESPONSES.inc("transport")
+
+            if response is not None and response.status_code == 200:
+                return self._parse(response)
+            if response is not None and response.status_code not in RETRYABLE_STATUS:
+                raise LLMError(f"{error}: {response.text[:200]}")
+            attempt += 1
+            await self._backoff(attempt, error, retry_after, deadline)
+
+    async def _stream_with_retries(self, body: Dict[str, Any], deadline: float) -> AsyncIterator[str]:
+        self._ensure_http()
+        attempt = 0
+        while True:
+            started = False
+            # Unlike generate there is no outer wait_for around a generator: bound each wait here
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise LLMUnavailable("deadline exceeded waiting for a slot")
+            try:
+                async with self._http.stream("POST", self.stream_url, json=body, headers={"x-goog-api-key": self.api_key},
+                                             timeout=max(0.1, deadline - time.monotonic())) as response:
+                    LLM_RESPONSES.inc(str(response.status_code))
+                    if response.status_code == 200:
+                        async for text in self._iter_sse(response, deadline):
+                            started = True
+                            yield text
+                        return
+                    await response.aread()
+                    retry_after = response.headers.get("retry-after")
+                    error = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                if started:
+                    raise LLMUnavailable(f"stream interrupted: {type(e).__name__}: {e}")
+                response, retry_after, error = None, None, f"{type(e).__name__}: {e}"
+                LLM_RESPONSES.inc("transport")
+            finally:
+                self._semaphore.release()
+
+            if response is not None and response.status_code not in RETRYABLE_STATUS:
+                raise LLMError(f"{error}: {response.text[:200]}")
+            attempt += 1
+            await self._backoff(attempt, error, retry_after, deadline)
+
+    async def _backoff(self, attempt: int, error: str, retry_after: Optional[str], deadline: float):
+        """Sleep before retry `attempt`, or raise LLMUnavailable if retrying is pointless."""
+        if self.breaker.state == "open":
+            raise LLMUnavailable(f"{error}; circuit opened meanwhile")
+        if attempt > self.max_retries:
+            raise LLMUnavailable(f"{error} after {attempt} attempts")
+        backoff = random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2 ** attempt))
+        if retry_after and retry_after.isdigit():
+            backoff = max(backoff, float(retry_after))
+        if time.monotonic() + backoff >= deadline:
+            raise LLMUnavailable(f"{error}; no time left to retry")
+        logger.info(f"LLM call failed ({error}), retry {attempt} in {backoff:.2f}s")
+        await asyncio.sleep(backoff)
+
+    @staticmethod
+    async def _iter_sse(response: httpx.Response, deadline: float) -> AsyncIterator[str]:
+        """Text of each `data:` event; every read is bounded by the remaining deadline."""
+        lines = response.aiter_lines()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMUnavailable("deadline exceeded while streaming")
+            try:
+                line = await asyncio.wait_for(lines.__anext__(), remaining)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise LLMUnavailable("deadline exceeded while streaming")
+            if not line.startswith("data:"):
+                continue
+            try:
+                data = json.loads(line[5:])
+                # The last event may carry only usageMetadata
+                parts = data["candidates"][0]["content"]["parts"] if data.get("candidates") else []
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise LLMError(f"Unexpected stream event: {e}")
+            text = "".join(part.get("text", "") for part in parts)
+            if text:
+                yield text
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> Tuple[str, Dict[str, int]]:
+        try:
+            data = response.json()
+            parts = data["candidates"][0]["content"]["parts"]
+            return "".join(part.get("text", "") for part in parts).strip(), data.get("usageMetadata", {})
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            # e.g. a prompt blocked by safety filters has no candidates
+            raise LLMError(f"Unexpected response: {e}")
@@ -7,6 +7,27 @@ class Issue(BaseModel):
     coach_tip: Dict[str, str]
     suggestion: Dict[str, str]
 
+class ImageRef(BaseModel):
+    blob_id: str
+    url: str
+    thumbnail_url: str
+
+class StrokeResult(BaseModel):
+    index: int
+    action: str
+    frame: int # Source frame of the hit (peak wrist speed)
+    time_sec: float
+    score: int
+    metrics: Dict[str, float]
+    issues: List[str] # Issue tags; the full texts are on the top-level result
+
+class StrokeSummary(BaseModel):
+    count: int
+    score_mean: float
+    score_std: float
+    metrics: Dict[str, Dict[str, float]] # metric -> {"mean", "std"}
+    consistency: Optional[float] = None # 0-1, None for a single stroke
+
 class AnalysisResult(BaseModel):
     action: str
     level_assumption: str
@@ -15,6 +36,12 @@ class AnalysisResult(BaseModel):
     issues: List[Issue]
     positive_feedback: Dict[str, str]
     next_training_focus: List[Dict[str, str]]
+    # Images live in the blob store; the inline base64 fields are only filled when that fails
+    keyframe_image: Optional[ImageRef] = None
+    action_sequence_images: List[ImageRef] = [] # Prep -> Hit -> Follow-through
     keyframe_base64: Optional[str] = None
     action_sequence: List[str] = [] # List of base64 images (Prep -> Hit -> Follow-through)
     generation_source: str = "rules" # "rules" or "gemini"
+    # Every stroke found in the video (the top-level result is the strongest one)
+    strokes: List[StrokeResult] = []
+    stroke_summary: Dict[str, StrokeSummary] = {} # Keyed by action
@@ -0,0 +1,227 @@
+"""
+Region of interest around the analysed player, for pose inference.
+
+Wide court recordings give the pose model the whole frame although the
+player covers a small part of it, and another person on court can take over
+the detection mid-clip. PersonROI keeps a square box around the player:
+
+- Seeded from the first confident full-frame detection (mean visibility of
+  the JOINTS at least `min_visibility`).
+- Fitted to a confident detection as the landmarks' bounding box plus
+  `margin` of its size on each side (room for the racket arm).
+- Held fixed between re-seeds: a detection moves the box only when the
+  landmarks plus `hold` of their size no longer fit in it, or when the box
+  is more than `slack` times the fitted size. A pose model that tracks the
+  person across frames (MediaPipe) keeps its own region of interest and
+  smooths landmarks over time; a crop that re-centred on every frame would
+  move the image under it.
+- Frames are cropped to the box (and downscaled to `max_side`) before
+  inference; landmarks are mapped back to full-frame coordinates. A batch of
+  frames shares one crop, widened by how far the player can move over the
+  frames it spans (`max_speed` box sides per frame).
+- Crops are inferred by `estimator`, not the full-frame one, and a tracking
+  estimator is restarted whenever the crop region changes (see advance).
+- Detections are checked against the player: one whose centre is more than
+  `max_jump` box sides, plus `max_speed` per frame since the last detection,
+  away from the player's last position is someone else and is rejected.
+- When the crop yields no confident pose of the player, the track is lost and
+  the frame is re-run on a search region `search_scale` times the last box.
+  For `reacquire_frames` frames only that region is searched, so a player who
+  is briefly occluded is found again without another person on court taking
+  over; after that, the player's position is forgotten and full frames are
+  inferred until a detection reseeds the box.
+"""
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from .pose_backends import PoseEstimator
+
+# (x0, y0, x1, y1) in pixels of the inference frame
+Box = Tuple[int, int, int, int]
+
+ROI_MARGIN = 0.35
+ROI_MIN_VISIBILITY = 0.5
+# Landmarks plus this part of their size must stay inside the held box
+ROI_HOLD = 0.15
+# A held box more than this many times the fitted size is fitted again
+ROI_SLACK = 2.0
+ROI_SEARCH_SCALE = 2.0
+ROI_REACQUIRE_FRAMES = 30
+# Player displacement allowed between detections: a fixed part (pose jitter, a raised arm moving
+# the landmarks' centre) plus a part per frame in between (running at ~5 m/s at 30 fps), in box sides
+ROI_MAX_JUMP = 0.25
+ROI_MAX_SPEED = 0.06
+# Longest side of the cropped frames given to the pose model
+ROI_MAX_SIDE = 512
+# Smallest box side, as a fraction of the frame's shorter side
+ROI_MIN_SIDE = 0.2
+
+
+def _square(cx: float, cy: float, side: float, shape: Tuple[int, ...]) -> Box:
+    """Square box of `side` centred on (cx, cy), shifted (then clipped) to lie inside the frame."""
+    h, w = shape[:2]
+    side = min(side, max(w, h))
+    x0 = int(np.clip(cx - side / 2, 0, max(0, w - side)))
+    y0 = int(np.clip(cy - side / 2, 0, max(0, h - side)))
+    return x0, y0, int(min(w, x0 + side)), int(min(h, y0 + side))
+
+
+def _side(box: Box) -> int:
+    return max(box[2] - box[0], box[3] - box[1])
+
+
+class PersonROI:
+    """Tracked player box of one video pass (see module docstring)."""
+
+    def __init__(self, estimator: Optional[PoseEstimator] = None, margin: float = ROI_MARGIN,
+                 min_visibility: float = ROI_MIN_VISIBILITY, hold: float = ROI_HOLD, slack: float = ROI_SLACK,
+                 search_scale: float = ROI_SEARCH_SCALE, reacquire_frames: int = ROI_REACQUIRE_FRAMES,
+                 max_jump: float = ROI_MAX_JUMP, max_speed: float = ROI_MAX_SPEED, max_side: int = ROI_MAX_SIDE):
+        # Pose estimator of the crops (the processor passes one apart from its full-frame estimator)
+        self.estimator = estimator
+        self.margin = margin
+        self.min_visibility = min_visibility
+        self.hold = hold
+        self.slack = slack
+        self.search_scale = search_scale
+        self.reacquire_frames = reacquire_frames
+        self.max_jump = max_jump
+        self.max_speed = max_speed
+        self.max_side = max_side
+        # Box while tracking; search region (and frames inferred since the loss) while lost
+        self.box: Optional[Box] = None
+        self._search: Optional[Box] = None
+        self._lost_for = 0
+        # Last accepted detection: centre and box side in pixels, frame index; None = position unknown
+        self._center: Optional[Tuple[float, float]] = None
+        self._size = 0.0
+        self._seen_at = 0
+        self._shape: Tuple[int, ...] = (0, 0)
+        # Region the crop estimator last inferred
+        self._cropped: Optional[Box] = None
+        self.stats = {"roi_frames": 0, "roi_losses": 0, "roi_search_frames": 0, "roi_full_frames": 0,
+                      "roi_rejected": 0, "roi_reseeds": 0}
+
+    def region(self, span: int = 0) -> Optional[Box]:
+        """
+        Where to infer the next frames, `span` frames apart from first to last: the box (widened
+        for the player's movement over the span), the search region after a loss, or None for the full frame.
+        """
+        if self.box is not None:
+            if span <= 0:
+                return self.box
+            x0, y0, x1, y1 = self.box
+            grown = _side(self.box) * (1 + 2 * self.max_speed * span)
+            return _square((x0 + x1) / 2, (y0 + y1) / 2, grown, self._shape)
+        return self._search
+
+    def crop(self, image: np.ndarray, region: Optional[Box]) -> np.ndarray:
+        """The part of an inference frame inside `region` (the whole frame for None), at most max_side long."""
+        if region is None:
+            return image
+        x0, y0, x1, y1 = region
+        crop = image[y0:y1, x0:x1]
+        side = _side(region)
+        if side > self.max_side:
+            # Bilinear: the model resamples its input again anyway
+            scale = self.max_side / side
+            return cv2.resize(crop, (max(1, int((x1 - x0) * scale)), max(1, int((y1 - y0) * scale))),
+                              interpolation=cv2.INTER_LINEAR)
+        # MediaPipe needs contiguous frames; a slice of a larger frame is not
+        return np.ascontiguousarray(crop)
+
+    def to_frame(self, row: np.ndarray, region: Box, shape: Tuple[int, ...]) -> np.ndarray:
+        """Map landmarks normalized to the crop of `region` to the full frame of `shape`."""
+        h, w = shape[:2]
+        x0, y0, x1, y1 = region
+        mapped = row.copy()
+        mapped[:, 0] = (x0 + row[:, 0] * (x1 - x0)) / w
+        mapped[:, 1] = (y0 + row[:, 1] * (y1 - y0)) / h
+        # z shares the scale of x
+        mapped[:, 2] = row[:, 2] * (x1 - x0) / w
+        return mapped
+
+    def confident(self, row: Optional[np.ndarray]) -> bool:
+        return row is not None and float(row[:, 3].mean()) >= self.min_visibility
+
+    def plausible(self, row: np.ndarray, frame_idx: int, shape: Tuple[int, ...]) -> bool:
+        """Whether a detection in frame `frame_idx` can be the tracked player (always, while the position is unknown)."""
+        if self._center is None:
+            return True
+        xs, ys = self._points(row, shape)
+        gap = max(1, frame_idx - self._seen_at)
+        limit = self._size * (self.max_jump + self.max_speed * gap)
+        return float(np.hypot((xs.min() + xs.max()) / 2 - self._center[0],
+                              (ys.min() + ys.max()) / 2 - self._center[1])) <= limit
+
+    def reject(self, frames: int = 1):
+        """Count detections dropped as another person."""
+        self.stats["roi_rejected"] += frames
+
+    def lose(self, shape: Tuple[int, ...]):
+        """The box lost the player: search around it from now on."""
+        x0, y0, x1, y1 = self.box
+        self._search = _square((x0 + x1) / 2, (y0 + y1) / 2, _side(self.box) * self.search_scale, shape)
+        self._lost_for = 0
+        self.box = None
+        self.stats["roi_losses"] += 1
+
+    def advance(self, frames: int, region: Optional[Box]) -> bool:
+        """
+        Count `frames` about to be inferred on `region` (for the reacquire window and the stats).
+        Returns whether `region` is a crop other than the last one inferred, i.e. a tracking crop
+        estimator must start over.
+        """
+        restart = region is not None and region != self._cropped
+        if region is not None:
+            self._cropped = region
+        if self.box is not None:
+            self.stats["roi_frames"] += frames
+            return restart
+        self.stats["roi_search_frames" if region is not None else "roi_full_frames"] += frames
+        self._lost_for += frames
+        if self._lost_for >= self.reacquire_frames:
+            # Not found again in time: forget where the player was
+            self._search = None
+            self._center = None
+        return restart
+
+    def update(self, row: np.ndarray, frame_idx: int, shape: Tuple[int, ...]):
+        """Place the box for confident full-frame landmarks of the player in frame `frame_idx` (held if they still fit)."""
+        h, w = shape[:2]
+        xs, ys = self._points(row, shape)
+        extent = max(xs.max() - xs.min(), ys.max() - ys.min())
+        center = ((xs.min() + xs.max()) / 2, (ys.min() + ys.max()) / 2)
+        self._center, self._seen_at, self._shape = center, frame_idx, shape
+        self._search = None
+        self._lost_for = 0
+        side = max(extent * (1 + 2 * self.margin), ROI_MIN_SIDE * min(w, h))
+        if self.box is not None and self._holds(xs, ys, extent, side, shape):
+            return
+
+        box = _square(center[0], center[1], side, shape)
+        self._size = float(_side(box))
+        if self.box is not None:
+            self.stats["roi_reseeds"] += 1
+        # A box covering (nearly) the whole frame saves nothing: infer full frames
+        self.box = None if (box[2] - box[0]) * (box[3] - box[1]) >= 0.9 * w * h else box
+
+    def summary(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+    def _holds(self, xs: np.ndarray, ys: np.ndarray, extent: float, side: float, shape: Tuple[int, ...]) -> bool:
+        """Whether the held box still fits landmarks at xs, ys (plus `hold` of their extent, within the frame) and is not too large."""
+        h, w = shape[:2]
+        x0, y0, x1, y1 = self.box
+        pad = self.hold * extent
+        inside = (max(xs.min() - pad, 0) >= x0 and min(xs.max() + pad, w) <= x1
+                  and max(ys.min() - pad, 0) >= y0 and min(ys.max() + pad, h) <= y1)
+        return inside and _side(self.box) <= self.slack * side
+
+    def _points(self, row: np.ndarray, shape: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """Pixel x and y of the visible landmarks (all of them if fewer than two are visible)."""
+        h, w = shape[:2]
+        visible = row[:, 3] >= self.min_visibility
+        points = row[visible] if visible.sum() >= 2 else row
+        return points[:, 0] * w, points[:, 1] * h
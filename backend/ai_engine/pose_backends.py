@@ -0,0 +1,243 @@
+"""
+Pose estimators: turn RGB frames into rows of a LandmarkTrack.
+
+Every backend implements `process_batch(images)`, which takes a list of RGB
+frames and returns one entry per frame: None (no person) or a
+(len(JOINTS), 4) float32 array of normalized x, y, z and visibility in JOINTS
+order, the same structure the metric code reads from LandmarkTrack.
+
+Backends (the `pose_backend` of an AnalysisProfile):
+- mediapipe-0 / mediapipe-1 / mediapipe-2: MediaPipe Pose (BlazePose) at model
+  complexity 0 (lite), 1 (full, the original behaviour) or 2 (heavy). It
+  tracks the person across consecutive frames, so it runs frame by frame.
+- onnx: a COCO-17 keypoint model (e.g. an HRNet or ViTPose export with
+  (N, 17, h, w) heatmap output, or any model emitting (N, 17, 3) keypoints)
+  on ONNX Runtime's CPU provider. Frames are letterboxed into the model input
+  and inferred `ONNX_POSE_BATCH` at a time with `ONNX_POSE_THREADS` intra-op
+  threads. COCO has no depth, so z is 0.
+"""
+import os
+import logging
+from typing import Callable, Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from .landmarks import JOINTS, CHANNELS, blazepose_row
+
+logger = logging.getLogger(__name__)
+
+# Result of one frame: (len(JOINTS), CHANNELS) float32, or None without a person
+Landmarks = Optional[np.ndarray]
+
+# Index of each joint in the 17-point COCO keypoint topology
+COCO_INDEX = {
+    'nose': 0,
+    'left_shoulder': 5, 'right_shoulder': 6,
+    'left_elbow': 7, 'right_elbow': 8,
+    'left_wrist': 9, 'right_wrist': 10,
+    'left_hip': 11, 'right_hip': 12,
+    'left_ankle': 15, 'right_ankle': 16,
+}
+_COCO_COLUMNS = [COCO_INDEX[name] for name in JOINTS]
+
+# ImageNet normalization expected by the common COCO keypoint exports
+_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255
+_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255
+
+
+class PoseEstimator:
+    """Base class of the pose backends."""
+    name = "base"
+    # Frames per process_batch call the backend is most efficient with
+    batch_size = 1
+    # Whether results depend on the frames inferred before (the model tracks the person)
+    tracking = False
+
+    def process_batch(self, images: Sequence[np.ndarray]) -> List[Landmarks]:
+        raise NotImplementedError
+
+    def warmup(self):
+        """Run one blank frame so model loading is not paid by the first request."""
+        self.process_batch([np.zeros((256, 256, 3), dtype=np.uint8)])
+
+    def reset(self):
+        """Forget the frames inferred so far (a no-op for backends that do not track)."""
+
+    def close(self):
+        pass
+
+
+class MediaPipePose(PoseEstimator):
+    """MediaPipe Pose at a given model complexity, in video (tracking) mode."""
+    tracking = True
+
+    def __init__(self, complexity: int = 1, min_detection_confidence: float = 0.5, min_tracking_confidence: float = 0.5):
+        self.name = f"mediapipe-{complexity}"
+        self.complexity = complexity
+        self._settings = dict(min_detection_confidence=min_detection_confidence,
+                              min_tracking_confidence=min_tracking_confidence)
+        # Built on first use, like the rest of the model-backed code
+        self._pose = None
+
+    @property
+    def pose(self):
+        if self._pose is None:
+            import mediapipe as mp
+            if not hasattr(mp, "solutions"):
+                raise ImportError(f"mediapipe {getattr(mp, '__version__', '?')} lacks the solutions API used by {self.name}")
+            self._pose = mp.solutions.pose.Pose(static_image_mode=False, model_complexity=self.complexity,
+                                                **self._settings)
+        return self._pose
+
+    def process_batch(self, images: Sequence[np.ndarray]) -> List[Landmarks]:
+        return [self._process(image) for image in images]
+
+    def _process(self, image_rgb: np.ndarray) -> Landmarks:
+        results = self.pose.process(image_rgb)
+        if not results.pose_landmarks:
+            return None
+        return blazepose_row(results.pose_landmarks.landmark)
+
+    def reset(self):
+        # Restarts the graph run, dropping the tracked region and the landmark smoothing state
+        if self._pose is not None:
+            self._pose.reset()
+
+    def close(self):
+        if self._pose is not None:
+            self._pose.close()
+            self._pose = None
+
+
+class OnnxPose(PoseEstimator):
+    """COCO-17 keypoint model on ONNX Runtime (CPU), inferring frames in batches."""
+    name = "onnx"
+
+    def __init__(self, model_path: str, batch_size: int = 8, threads: int = 0, min_score: float = 0.3):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx pose backend needs onnxruntime (pip install onnxruntime)") from e
+        if not model_path or not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX pose model not found: {model_path!r} (set ONNX_POSE_MODEL)")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self._session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self._session.get_inputs()[0]
+        self._input_name = model_input.name
+        # NCHW; dynamic dimensions are strings or None
+        batch_dim, _, height, width = model_input.shape
+        self.input_size = (width if isinstance(width, int) else 192, height if isinstance(height, int) else 256)
+        # A model exported with a fixed batch dimension gets exactly that many frames
+        self._fixed_batch = batch_dim if isinstance(batch_dim, int) else None
+        self.batch_size = self._fixed_batch or max(1, batch_size)
+        self.min_score = min_score
+        logger.info(f"ONNX pose model {os.path.basename(model_path)}: input {self.input_size[0]}x{self.input_size[1]}, "
+                    f"batch {self.batch_size}, threads {threads or 'default'}")
+
+    @classmethod
+    def from_env(cls) -> "OnnxPose":
+        return cls(os.getenv("ONNX_POSE_MODEL", ""),
+                   batch_size=int(os.getenv("ONNX_POSE_BATCH", "8")),
+                   threads=int(os.getenv("ONNX_POSE_THREADS", "0")))
+
+    def _letterbox(self, image: np.ndarray):
+        """Fit the frame into the model input without distortion. Returns (input-sized RGB frame, scale, pad x, pad y)."""
+        in_w, in_h = self.input_size
+        h, w = image.shape[:2]
+        scale = min(in_w / w, in_h / h)
+        new_w, new_h = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+        pad_x, pad_y = (in_w - new_w) // 2, (in_h - new_h) // 2
+        canvas = np.zeros((in_h, in_w, 3), dtype=np.uint8)
+        canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        return canvas, scale, pad_x, pad_y
+
+    def process_batch(self, images: Sequence[np.ndarray]) -> List[Landmarks]:
+        results: List[Landmarks] = []
+        for start in range(0, len(images), self.batch_size):
+            results.extend(self._run(images[start:start + self.batch_size]))
+        return results
+
+    def _run(self, images: Sequence[np.ndarray]) -> List[Landmarks]:
+        in_w, in_h = self.input_size
+        n = len(images)
+        batch = np.zeros((self._fixed_batch or n, 3, in_h, in_w), dtype=np.float32)
+        transforms = []
+        for i, image in enumerate(images):
+            canvas, scale, pad_x, pad_y = self._letterbox(image)
+            batch[i] = ((canvas.astype(np.float32) - _MEAN) / _STD).transpose(2, 0, 1)
+            transforms.append((scale, pad_x, pad_y, image.shape[1], image.shape[0]))
+
+        output = self._session.run(None, {self._input_name: batch})[0][:n]
+        if output.ndim == 4:
+            keypoints = self._decode_heatmaps(output)
+        else:
+            # (N, 17, 3): x, y in input pixels and a score
+            keypoints = output[..., :3].astype(np.float32)
+
+        results: List[Landmarks] = []
+        for points, (scale, pad_x, pad_y, w, h) in zip(keypoints, transforms):
+            points = points[_COCO_COLUMNS]
+            scores = np.clip(points[:, 2], 0.0, 1.0)
+            if float(scores.mean()) < self.min_score:
+                results.append(None)
+                continue
+            row = np.zeros((len(JOINTS), CHANNELS), dtype=np.float32)
+            # Undo the letterbox, then normalize by the frame size like MediaPipe
+            row[:, 0] = (points[:, 0] - pad_x) / scale / w
+            row[:, 1] = (points[:, 1] - pad_y) / scale / h
+            row[:, 3] = scores
+            results.append(row)
+        return results
+
+    def _decode_heatmaps(self, heatmaps: np.ndarray) -> np.ndarray:
+        """Argmax of (N, K, h, w) heatmaps, shifted a quarter pixel towards the higher neighbour, in input pixels."""
+        n, k, hm_h, hm_w = heatmaps.shape
+        flat = heatmaps.reshape(n, k, -1)
+        peak = flat.argmax(axis=2)
+        score = np.take_along_axis(flat, peak[..., None], axis=2)[..., 0]
+        y, x = np.divmod(peak, hm_w)
+        xf, yf = x.astype(np.float32), y.astype(np.float32)
+
+        ni, ki = np.indices((n, k))
+        inner_x = (x > 0) & (x < hm_w - 1)
+        inner_y = (y > 0) & (y < hm_h - 1)
+        xl, xr = np.clip(x - 1, 0, hm_w - 1), np.clip(x + 1, 0, hm_w - 1)
+        yu, yd = np.clip(y - 1, 0, hm_h - 1), np.clip(y + 1, 0, hm_h - 1)
+        xf += np.where(inner_x, 0.25 * np.sign(heatmaps[ni, ki, y, xr] - heatmaps[ni, ki, y, xl]), 0.0)
+        yf += np.where(inner_y, 0.25 * np.sign(heatmaps[ni, ki, yd, x] - heatmaps[ni, ki, yu, x]), 0.0)
+
+        in_w, in_h = self.input_size
+        out = np.empty((n, k, 3), dtype=np.float32)
+        out[..., 0] = (xf + 0.5) * in_w / hm_w
+        out[..., 1] = (yf + 0.5) * in_h / hm_h
+        out[..., 2] = score
+        return out
+
+
+POSE_BACKENDS: Dict[str, Callable[[], PoseEstimator]] = {
+    "mediapipe-0": lambda: MediaPipePose(complexity=0),
+    "mediapipe-1": lambda: MediaPipePose(complexity=1),
+    "mediapipe-2": lambda: MediaPipePose(complexity=2),
+    "onnx": OnnxPose.from_env,
+}
+
+
+def create_estimator(name: str) -> PoseEstimator:
+    """Build the pose backend registered under `name`."""
+    if name not in POSE_BACKENDS:
+        raise ValueError(f"Unknown pose backend: {name}")
+    return POSE_BACKENDS[name]()
+
+
+def backend_fingerprint(name: str) -> str:
+    """What besides the backend name determines its landmarks (the model file of the onnx backend)."""
+    if name != "onnx":
+        return name
+    path = os.getenv("ONNX_POSE_MODEL", "")
+    size = os.path.getsize(path) if path and os.path.exists(path) else 0
+    return f"{name}:{os.path.basename(path)}:{size}"
@@ -1,165 +1,413 @@
 import cv2
 import base64
-import mediapipe as mp
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 import numpy as np
 import logging
+import time
+from .landmarks import LandmarkTrack, JOINT_INDEX
+from .kinematics import Kinematics
+from .snapshots import SEQUENCE_MARGIN_FRAMES, SnapshotCollector
+from .profiles import AnalysisProfile, get_profile
+from .pose_backends import PoseEstimator, create_estimator
+from .frame_pipeline import FRAME_BUDGET, Frame, FrameReader
+from .person_roi import PersonROI
+from .profiling import stage
+from .strokes import HIT_WINDOW_FRAMES, detect_strokes, contact_height_variance
 
 logger = logging.getLogger(__name__)
 
+# progress(stage, fraction of that stage or None, details)
+ProgressCallback = Callable[[str, Optional[float], Dict[str, int]], None]
+# Source frames between progress reports while decoding
+PROGRESS_EVERY = 15
+
 class VideoProcessor:
-    def __init__(self):
-        self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-
-    def process_video(self, video_path: str) -> Dict[str, any]:
+    def __init__(self, profile="full", estimator: Optional[PoseEstimator] = None):
+        self.profile = get_profile(profile)
+        # Used for every profile when set (e.g. a stand-in model in benchmarks)
+        self.estimator = estimator
+        # Pose backend name -> estimator, built on first use: re-analysis of stored tracks never needs a model
+        self._estimators: Dict[str, PoseEstimator] = {}
+        # Second instance of each tracking backend, for player crops (see person_roi)
+        self._crop_estimators: Dict[str, PoseEstimator] = {}
+        # Frames decoded ahead of inference (see frame_pipeline); 0 = decode on the calling thread
+        self.frame_budget = FRAME_BUDGET
+
+    def estimator_for(self, profile: AnalysisProfile) -> PoseEstimator:
+        """The pose estimator of a profile's backend (one per backend, kept for the tracker state)."""
+        if self.estimator is not None:
+            return self.estimator
+        estimator = self._estimators.get(profile.pose_backend)
+        if estimator is None:
+            estimator = self._estimators[profile.pose_backend] = create_estimator(profile.pose_backend)
+        return estimator
+
+    def person_roi(self, profile: AnalysisProfile) -> Optional[PersonROI]:
+        """A player region for one pass with `profile`, or None when the profile infers full frames."""
+        if not profile.person_roi:
+            return None
+        estimator = self.estimator_for(profile)
+        if self.estimator is None and estimator.tracking:
+            # Crops and full frames must not share one tracker's state
+            estimator = self._crop_estimators.get(profile.pose_backend)
+            if estimator is None:
+                estimator = self._crop_estimators[profile.pose_backend] = create_estimator(profile.pose_backend)
+        return PersonROI(estimator)
+
+    def warmup(self):
+        """Run one blank frame through the default profile's pose models so loading them is not paid by the first request."""
+        estimator = self.estimator_for(self.profile)
+        estimator.warmup()
+        roi = self.person_roi(self.profile)
+        if roi is not None and roi.estimator is not estimator:
+            roi.estimator.warmup()
+
+    def process_video(self, video_path: str, profile=None, progress: Optional[ProgressCallback] = None) -> Dict[str, any]:
         """
-        Process the video and extract real biomechanical metrics using MediaPipe.
+        Process the video and extract real biomechanical metrics with the profile's pose backend.
         Returns a dictionary containing metrics and detected action type.
+        `profile` (name or AnalysisProfile) overrides the processor's default sampling profile.
+        `progress` is called with stage updates ('pose', 'refine', 'scoring').
         """
+        profile = get_profile(profile) if profile else self.profile
+        started = time.perf_counter()
+
         cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Cannot open video: {video_path}")
+        try:
+            if not cap.isOpened():
+                raise ValueError(f"Cannot open video: {video_path}")
 
-        landmarks_history = []
-        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-        
-        while cap.isOpened():
-            success, image = cap.read()
-            if not success:
-                break
-            
-            # Convert to RGB for MediaPipe
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            results = self.pose.process(image_rgb)
-            
-            if results.pose_landmarks:
-                # Store key landmarks for this frame
-                landmarks = results.pose_landmarks.landmark
-                frame_data = {
-                    'nose': landmarks[self.mp_pose.PoseLandmark.NOSE],
-                    'right_wrist': landmarks[self.mp_pose.PoseLandmark.RIGHT_WRIST],
-                    'left_wrist': landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST],
-                    'right_shoulder': landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER],
-                    'left_shoulder': landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER],
-                    'right_hip': landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP],
-                    'left_hip': landmarks[self.mp_pose.PoseLandmark.LEFT_HIP],
-                    'right_ankle': landmarks[self.mp_pose.PoseLandmark.RIGHT_ANKLE],
-                    'left_ankle': landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE],
-                    'right_elbow': landmarks[self.mp_pose.PoseLandmark.RIGHT_ELBOW],
-                    'left_elbow': landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW],
-                }
-                landmarks_history.append(frame_data)
-                
-        cap.release()
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            stride = profile.stride_for(fps)
+            estimator = self.estimator_for(profile)
+            track = LandmarkTrack(capacity=(frame_count // stride + 1) if frame_count else 256)
+            # Retain the snapshot frames while decoding instead of seeking back later
+            snapshots = SnapshotCollector()
+
+            roi = self.person_roi(profile)
+
+            with self._reader(cap, stride, profile, estimator) as reader:
+                frames_inferred = self._extract(reader, track, snapshots, estimator, roi, progress, frame_count)
+        finally:
+            # After the reader's threads have stopped
+            cap.release()
+        frames_decoded = frame_idx = reader.frames_decoded
+
+        # Coarse sampling: re-run the swing neighbourhood at the full frame rate
+        if stride > 1 and profile.refine and len(track) > 1:
+            if progress:
+                progress("refine", None, {"frames_decoded": frames_decoded, "frames_inferred": frames_inferred})
+            track, snapshots, refined = self._refine_swing(video_path, track, fps, stride, profile)
+            frames_decoded += refined
+            frames_inferred += refined
+
+        elapsed = time.perf_counter() - started
+        stats = {
+            "profile": profile.name,
+            "stride": stride,
+            "frames_decoded": frames_decoded,
+            "frames_inferred": frames_inferred,
+            "elapsed_sec": round(elapsed, 3),
+            # Source video frames covered per wall-clock second
+            "throughput_fps": round(frame_idx / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        if roi is not None:
+            # Coarse pass: frames inferred on the player crop, the search region or full frames; losses; other people dropped
+            stats.update(roi.summary())
+        logger.info(f"Pose extraction [{profile.name}]: {frame_idx} frames in {elapsed:.2f}s "
+                    f"({stats['throughput_fps']} fps, {frames_inferred} inferred, stride {stride})")
         
-        if not landmarks_history:
+        if len(track) == 0:
             return {
                 "detected_action": "unknown",
-                "metrics": {}
+                "metrics": {},
+                "strokes": [],
+                "stats": stats,
+                "track": track,
+                "fps": fps
             }
 
-        # 1. Detect Action Type
-        detected_action = self._detect_action_type(landmarks_history)
+        # 1-3. Action type, hit window and metrics from the landmark track
+        if progress:
+            progress("scoring", None, {"frames_decoded": frames_decoded, "frames_inferred": frames_inferred})
+        with stage("metrics"):
+            analysis = self.analyze_track(track, fps)
+        kin = analysis["kinematics"]
+        
+        # 4. Generate Action Sequence (Prep -> Hit -> Follow-through)
+        start_idx, end_idx, peak_idx = analysis["hit_window"]
+        
+        # A bit (5 frames) before the hit window starts / after it ends; SnapshotCollector retains the same rows
+        prep_idx = kin.rows_around(start_idx, SEQUENCE_MARGIN_FRAMES, 0)[0]
+        follow_idx = kin.rows_around(end_idx, 0, SEQUENCE_MARGIN_FRAMES)[1] - 1
+        
+        # Render the 3 frames from the frames retained during decoding
+        captured = snapshots.frames()
+        rendered = {}
+        with stage("keyframes"):
+            for idx in (prep_idx, peak_idx, follow_idx):
+                if idx not in rendered:
+                    rendered[idx] = self._snapshot(video_path, track, idx, captured.get(idx))
+        action_sequence = [rendered[idx] for idx in (prep_idx, peak_idx, follow_idx) if rendered[idx]]
+
+        # 5. Keyframe Snapshot is the hit frame
+        keyframe_data = rendered[peak_idx]
+
+        return {
+            "detected_action": analysis["detected_action"],
+            "metrics": analysis["metrics"],
+            "strokes": analysis["strokes"],
+            "keyframe": keyframe_data,
+            "action_sequence": action_sequence,
+            "stats": stats,
+            "track": track,
+            "fps": fps
+        }
+
+    def analyze_track(self, track: LandmarkTrack, fps: float) -> Dict[str, any]:
+        """
+        Metric stage only: detect the action, the hit window and the metrics of a
+        landmark track. Needs no video or Pose model, so stored tracks can be re-scored.
+        Every stroke in the track is also segmented and measured (`strokes`); the
+        top-level result is the strongest stroke.
+        """
+        # Derive velocities, body heights, etc. once for every metric below
+        kin = Kinematics(track)
+
+        # 1. Segment the strokes (the strongest one is the single-shot hit window)
+        strokes = detect_strokes(kin, fps)
+        for stroke in strokes:
+            stroke["detected_action"], stroke["metrics"] = self.measure_stroke(kin, stroke, fps)
+            stroke["frame"] = int(kin.frame_indices[stroke["hit_window"][2]])
+        self._apply_stroke_set_metrics(strokes)
 
         # 2. Identify Key Phase (Hit Window)
         # Returns start_index, end_index, peak_velocity_index
-        hit_window = self._detect_hit_phase(landmarks_history)
-        
-        # 3. Calculate Real Metrics
-        metrics = self._calculate_real_metrics(landmarks_history, detected_action, hit_window, fps)
-        
-        # 4. Generate Keyframe Snapshot
-        peak_idx = hit_window[2]
-        keyframe_data = self._generate_keyframe(video_path, peak_idx, landmarks_history[peak_idx])
+        hit_window = self._detect_hit_phase(kin)
 
-        # 5. Generate Action Sequence (Prep -> Hit -> Follow-through)
-        start_idx = hit_window[0]
-        end_idx = hit_window[1]
-        
-        # Ensure indices are within bounds and valid
-        prep_idx = max(0, start_idx - 5) # A bit before the hit window starts
-        follow_idx = min(len(landmarks_history)-1, end_idx + 5) # A bit after hit window ends
-        
-        # Extract 3 frames
-        sequence_indices = [prep_idx, peak_idx, follow_idx]
-        action_sequence = []
-        
-        for idx in sequence_indices:
-            frame_img = self._generate_keyframe(video_path, idx, landmarks_history[idx])
-            if frame_img:
-                action_sequence.append(frame_img)
+        primary = next((s for s in strokes if s["hit_window"][2] == hit_window[2]), None)
+        if len(strokes) > 1 and primary:
+            # Whole-clip features would mix the strokes: use the strongest stroke's own
+            detected_action = primary["detected_action"]
+            metrics = dict(primary["metrics"])
+        else:
+            # 3. Detect Action Type and Calculate Real Metrics on the whole clip
+            detected_action = self._detect_action_type(kin)
+            metrics = self._calculate_real_metrics(kin, detected_action, hit_window, fps)
 
         return {
             "detected_action": detected_action,
             "metrics": metrics,
-            "keyframe": keyframe_data,
-            "action_sequence": action_sequence
+            "hit_window": hit_window,
+            "strokes": strokes,
+            "kinematics": kin
         }
 
-    def _detect_action_type(self, history: List[Dict]) -> str:
+    def measure_stroke(self, kin: Kinematics, stroke: Dict[str, Tuple[int, ...]], fps: float) -> Tuple[str, Dict[str, float]]:
+        """Action type (classified on the stroke's segment) and metrics (on its hit window) of a stroke from detect_strokes."""
+        seg_start, seg_end = stroke["segment"]
+        action = self._detect_action_type(kin, seg_start, seg_end)
+        return action, self._calculate_real_metrics(kin, action, stroke["hit_window"], fps)
+
+    def infer_frame(self, track: LandmarkTrack, frame_idx: int, image: np.ndarray, profile=None,
+                    roi: Optional[PersonROI] = None) -> bool:
         """
-        Heuristic-based action detection.
+        Run pose inference on one BGR frame (e.g. from a live source) and append any detection to `track`.
+        `profile` defaults to the processor's; `roi` keeps inference on one player (see person_roi).
+        Returns whether a pose was found.
+        """
+        profile = get_profile(profile) if profile else self.profile
+        with stage("preprocess"):
+            image_rgb = self._prepare(image, profile)
+        return self._infer_batch(track, None, [(frame_idx, image, image_rgb)], self.estimator_for(profile), roi) == 1
+
+    def _apply_stroke_set_metrics(self, strokes: List[Dict[str, any]]):
+        """Metrics of a set of strokes: contact_height_variance across the lifts of a video."""
+        lifts = [s for s in strokes if s["detected_action"] == "lift"]
+        if len(lifts) < 2:
+            return  # Not measurable from a single shot: keep the neutral default
+        variance = contact_height_variance([s["metrics"]["contact_height"] for s in lifts])
+        for stroke in lifts:
+            stroke["metrics"]["contact_height_variance"] = variance
+
+    def _reader(self, cap: cv2.VideoCapture, stride: int, profile: AnalysisProfile, estimator: PoseEstimator,
+                first: int = 0, last: Optional[int] = None) -> FrameReader:
+        # The budget must hold a whole inference batch
+        budget = max(self.frame_budget, estimator.batch_size) if self.frame_budget > 0 else 0
+        # The decoded frame is kept by reference for the snapshots; SnapshotCollector shrinks the few it retains
+        return FrameReader(cap, stride, lambda image: (image, self._prepare(image, profile)),
+                           first=first, last=last, budget=budget)
+
+    def _extract(self, reader: FrameReader, track: LandmarkTrack, snapshots: SnapshotCollector, estimator: PoseEstimator,
+                 roi: Optional[PersonROI] = None, progress: Optional[ProgressCallback] = None, frame_count: int = 0) -> int:
+        """Infer the reader's frames in batches of the estimator's batch_size. Returns the number of frames inferred."""
+        frames_inferred = 0
+        next_report = 0
+        # Frames waiting for the next inference batch
+        pending: List[Frame] = []
+        for frame in reader:
+            frame_idx = frame[0]
+            if progress and frame_idx >= next_report:
+                progress("pose", frame_idx / frame_count if frame_count else None,
+                         {"frames_decoded": frame_idx, "frames_inferred": frames_inferred, "frames_total": frame_count})
+                next_report = frame_idx + PROGRESS_EVERY
+            pending.append(frame)
+            frames_inferred += 1
+            if len(pending) >= estimator.batch_size:
+                self._infer_batch(track, snapshots, pending, estimator, roi)
+                reader.release(len(pending))
+                pending = []
+        if pending:
+            self._infer_batch(track, snapshots, pending, estimator, roi)
+            reader.release(len(pending))
+        return frames_inferred
+
+    def _infer_batch(self, track: LandmarkTrack, snapshots: Optional[SnapshotCollector], frames: List[Frame],
+                     estimator: PoseEstimator, roi: Optional[PersonROI] = None) -> int:
+        """Run pose inference on (frame index, decoded BGR frame, RGB inference frame) tuples in one batch. Returns the number of poses found."""
+        images = [image_rgb for _, _, image_rgb in frames]
+        if roi is None:
+            with stage("pose"):
+                rows = estimator.process_batch(images)
+        else:
+            rows = self._infer_roi(frames, estimator, roi)
+
+        found = 0
+        for (frame_idx, image, _), row in zip(frames, rows):
+            if row is None:
+                continue
+            track.append(frame_idx, row)
+            found += 1
+            if snapshots is not None:
+                with stage("keyframes"):
+                    snapshots.offer(len(track) - 1, frame_idx, image, self._last_wrist_speed(track))
+        return found
+
+    def _infer_roi(self, frames: List[Frame], estimator: PoseEstimator, roi: PersonROI) -> List[Optional[np.ndarray]]:
+        """
+        Pose rows of RGB frames cropped to the tracked player (see person_roi).
+        The batch shares one region, widened for the player's movement over the frames it spans; frames
+        where the box lost the player are re-run on the search region. Detections of other people are dropped.
+        """
+        indices = [frame_idx for frame_idx, _, _ in frames]
+        images = [image_rgb for _, _, image_rgb in frames]
+        shape = images[0].shape
+        rows = self._infer_region(images, estimator, roi, roi.region(indices[-1] - indices[0]))
+        if roi.box is not None:
+            lost = [i for i, row in enumerate(rows)
+                    if not roi.confident(row) or not roi.plausible(row, indices[i], shape)]
+            if lost:
+                roi.lose(shape)
+                retried = self._infer_region([images[i] for i in lost], estimator, roi, roi.region())
+                for i, row in zip(lost, retried):
+                    rows[i] = row
+
+        for i, row in enumerate(rows):
+            if row is not None and not roi.plausible(row, indices[i], shape):
+                rows[i] = None
+                roi.reject()
+
+        # The latest confident row places the box for the next batch
+        confident = [i for i, row in enumerate(rows) if roi.confident(row)]
+        if confident:
+            roi.update(rows[confident[-1]], indices[confident[-1]], shape)
+        return rows
+
+    def _infer_region(self, images: List[np.ndarray], estimator: PoseEstimator, roi: PersonROI,
+                      region) -> List[Optional[np.ndarray]]:
+        """
+        Pose rows of frames cropped to `region` (None = full frames), in full-frame coordinates.
+        Crops go to the ROI's estimator, restarted whenever the region changes.
+        """
+        restart = roi.advance(len(images), region)
+        if region is None:
+            with stage("pose"):
+                return estimator.process_batch(images)
+        with stage("preprocess"):
+            crops = [roi.crop(image, region) for image in images]
+        crop_estimator = roi.estimator or estimator
+        if restart:
+            crop_estimator.reset()
+        with stage("pose"):
+            rows = crop_estimator.process_batch(crops)
+        return [roi.to_frame(row, region, image.shape) if row is not None else None for row, image in zip(rows, images)]
+
+    def _prepare(self, image: np.ndarray, profile: AnalysisProfile) -> np.ndarray:
+        """Downscale a BGR frame to the profile's max_side and convert it to RGB for the pose model."""
+        h, w = image.shape[:2]
+        size = self._inference_size(w, h, profile)
+        if size != (w, h):
+            # Landmarks are normalized, so downscaling does not change their coordinates
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    @staticmethod
+    def _inference_size(w: int, h: int, profile: AnalysisProfile) -> Tuple[int, int]:
+        """(width, height) of the inference frames made from w x h source frames."""
+        if profile.max_side and max(h, w) > profile.max_side:
+            scale = profile.max_side / max(h, w)
+            return int(w * scale), int(h * scale)
+        return w, h
+
+    def _refine_swing(self, video_path: str, coarse: LandmarkTrack, fps: float, stride: int, profile: AnalysisProfile) -> Tuple[LandmarkTrack, SnapshotCollector, int]:
+        """
+        Fine pass: decode every frame within `refine_seconds` of the coarse speed peak
+        and splice those rows into the track in place of the coarse samples.
+        Returns the merged track, the snapshot collector of the fine pass and the number of frames processed.
+        """
+        kin = Kinematics(coarse)
+        peak_frame = int(coarse.frame_indices[int(np.argmax(kin.wrist_speed)) + 1])
+        # Must cover the hit window plus snapshot margins even if the true peak shifts by a stride
+        radius = max(int(profile.refine_seconds * fps), 20 + stride)
+        first = max(0, peak_frame - radius)
+        last = peak_frame + radius
+
+        prefix_end = int(np.searchsorted(coarse.frame_indices, first, side='left'))
+        suffix_start = int(np.searchsorted(coarse.frame_indices, last, side='right'))
+
+        merged = LandmarkTrack(capacity=len(coarse) + 2 * radius + 1)
+        merged.extend(coarse[:prefix_end])
+        snapshots = SnapshotCollector()
+        estimator = self.estimator_for(profile)
+
+        cap = cv2.VideoCapture(video_path)
+        try:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+            roi = self.person_roi(profile)
+            seed = max(prefix_end - 1, 0)
+            if roi is not None and roi.confident(coarse.data[seed]):
+                # Follow the player the coarse pass tracked just before the window, not whoever a full frame shows first
+                w, h = self._inference_size(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), profile)
+                roi.update(coarse.data[seed], int(coarse.frame_indices[seed]), (h, w))
+            with self._reader(cap, 1, profile, estimator, first=first, last=last) as reader:
+                self._extract(reader, merged, snapshots, estimator, roi)
+        finally:
+            cap.release()
+
+        merged.extend(coarse[suffix_start:])
+        return merged, snapshots, reader.frames_decoded
+
+    def _detect_action_type(self, kin: Kinematics, start: int = 0, end: Optional[int] = None) -> str:
+        """
+        Heuristic-based action detection over rows start..end (inclusive; default the whole clip).
         Returns: 'smash', 'lift', 'net_shot', 'drop', or 'clear'
         """
-        if not history:
+        if len(kin) == 0:
             return "smash" 
+        if end is None:
+            end = len(kin) - 1
 
-        # 1. Calculate Body Height (Reference)
-        body_heights = []
-        for frame in history:
-            nose = frame['nose'].y
-            ankle = (frame['right_ankle'].y + frame['left_ankle'].y) / 2
-            h = abs(ankle - nose)
-            if h > 0.05: body_heights.append(h)
-        
-        avg_body_height = float(np.mean(body_heights)) if body_heights else 0.5
-
-        # 2. Extract Normalized Features
-        heights_above_nose = [] # Relative to body height
-        normalized_velocities = [] # Relative to body height
-        downward_velocities = [] # Relative to body height (positive = down)
-        wrist_ys = []
-
-        for i, frame in enumerate(history):
-            # Wrist Height check
-            r_y = frame['right_wrist'].y
-            l_y = frame['left_wrist'].y
-            min_wrist_y = min(r_y, l_y)
-            wrist_ys.append(min_wrist_y)
-            
-            nose_y = frame['nose'].y
-            # Positive means above nose
-            relative_h = (nose_y - min_wrist_y) / avg_body_height
-            heights_above_nose.append(relative_h)
-            
-            # Velocity check
-            if i > 0:
-                curr = frame['right_wrist']
-                prev = history[i-1]['right_wrist']
-                dist = np.sqrt((curr.x - prev.x)**2 + (curr.y - prev.y)**2)
-                # Normalize velocity
-                norm_vel = dist / avg_body_height
-                normalized_velocities.append(norm_vel)
-                
-                # Downward velocity (Y diff)
-                dy = curr.y - prev.y # Positive if moving down
-                norm_dy = dy / avg_body_height
-                downward_velocities.append(norm_dy)
-        
-        max_reach = max(heights_above_nose) if heights_above_nose else 0.0
-        max_velocity = max(normalized_velocities) if normalized_velocities else 0.0
-        max_downward_velocity = max(downward_velocities) if downward_velocities else 0.0
+        # Features are normalized by the clip-level body height (see Kinematics)
+        speed = kin.normalized_speed[start:end]
+        downward = kin.normalized_downward[start:end]
+        max_reach = float(kin.normalized_reach[start:end + 1].max())
+        max_velocity = float(speed.max()) if speed.size else 0.0
+        max_downward_velocity = float(downward.max()) if downward.size else 0.0
         
         # Variance of Wrist Y (normalized by body height)
         # We want variance of (wrist_y / body_height)
-        normalized_wrist_ys = [y / avg_body_height for y in wrist_ys]
-        y_variance = np.var(normalized_wrist_ys) if normalized_wrist_ys else 0.0
+        y_variance = float(np.var(kin.higher_wrist_y[start:end + 1] / kin.clip_body_height))
         
         logger.info(f"Action Detect: Reach={max_reach:.2f}, MaxVel={max_velocity:.2f}, MaxDownVel={max_downward_velocity:.2f}, Var={y_variance:.4f}")
 
@@ -193,82 +441,65 @@ class VideoProcessor:
         else:
             return "lift"
 
-    def _detect_hit_phase(self, history: List[Dict]) -> Tuple[int, int, int]:
+    def _detect_hit_phase(self, kin: Kinematics) -> Tuple[int, int, int]:
         """
         Detect the swing phase based on wrist velocity.
         Returns (start_idx, end_idx, peak_idx)
         """
-        velocities = []
-        for i in range(1, len(history)):
-            # Simple 2D distance for velocity
-            curr = history[i]['right_wrist']
-            prev = history[i-1]['right_wrist']
-            dist = np.sqrt((curr.x - prev.x)**2 + (curr.y - prev.y)**2)
-            velocities.append(dist)
-        
-        if not velocities:
-            return 0, len(history)-1, 0
+        if not kin.wrist_speed.size:
+            return 0, len(kin)-1, 0
             
         # Find peak velocity
-        peak_idx = int(np.argmax(velocities) + 1) # +1 because velocities is 1 shorter
+        peak_idx = int(np.argmax(kin.wrist_speed) + 1) # +1 because velocities is 1 shorter
         
-        # Define window (e.g., +/- 15 frames)
-        window_size = 15
-        start_idx = int(max(0, peak_idx - window_size))
-        end_idx = int(min(len(history) - 1, peak_idx + window_size))
+        # Define window (+/- 15 frames)
+        start_idx, end_excl = kin.rows_around(peak_idx, HIT_WINDOW_FRAMES, HIT_WINDOW_FRAMES)
+        end_idx = end_excl - 1
         
         return start_idx, end_idx, peak_idx
 
-    def _calculate_real_metrics(self, history: List[Dict], action: str, hit_window: Tuple[int, int, int], fps: float) -> Dict[str, float]:
+    def _calculate_real_metrics(self, kin: Kinematics, action: str, hit_window: Tuple[int, int, int], fps: float) -> Dict[str, float]:
         start, end, peak = hit_window
-        window_data = history[start:end+1]
         
         # Base body height for normalization (Nose to Ankle)
-        # Calculate average body height in the clip to be robust
-        body_heights = []
-        for frame in window_data:
-            nose = frame['nose'].y
-            ankle = (frame['right_ankle'].y + frame['left_ankle'].y) / 2
-            h = abs(ankle - nose)
-            if h > 0.1: body_heights.append(h)
-        
-        avg_body_height = float(np.mean(body_heights)) if body_heights else 0.5
+        # Average over the hit window to be robust
+        avg_body_height = kin.avg_body_height(start, end)
         
         metrics = {}
         
         # --- Common Metrics ---
         # 1. Contact Height (Normalized 0-1)
-        metrics['contact_height'] = self._calc_contact_height(history, peak, avg_body_height)
+        metrics['contact_height'] = self._calc_contact_height(kin, peak, avg_body_height)
         
         # --- Action Specific Metrics ---
         if action == 'smash' or action == 'clear':
-            metrics['swing_amplitude'] = self._calc_swing_amplitude(window_data, avg_body_height)
-            metrics['coordination'] = self._calc_coordination(window_data)
-            metrics['downward_velocity'] = self._calc_downward_velocity(history, start, end, avg_body_height, fps)
-            metrics['timing'] = self._calc_timing(history, peak, avg_body_height)
+            metrics['swing_amplitude'] = self._calc_swing_amplitude(kin, start, end, avg_body_height)
+            metrics['coordination'] = self._calc_coordination(kin, start, end)
+            metrics['downward_velocity'] = self._calc_downward_velocity(kin, start, end, avg_body_height, fps)
+            metrics['timing'] = self._calc_timing(kin, peak, avg_body_height)
             
             # Fill others with reasonable defaults if missing
             metrics['direction_stability'] = 0.6 
             metrics['stability'] = 0.6
 
         elif action == 'drop':
-            metrics['swing_amplitude'] = self._calc_swing_amplitude(window_data, avg_body_height)
-            metrics['stability'] = self._calc_stability(window_data, avg_body_height)
+            metrics['swing_amplitude'] = self._calc_swing_amplitude(kin, start, end, avg_body_height)
+            metrics['stability'] = self._calc_stability(kin, start, end, avg_body_height)
             # For drop, downward velocity should be controlled (not too high, not too low)
             # But let's reuse the calculator and interpret it differently in rules
-            metrics['downward_velocity'] = self._calc_downward_velocity(history, start, end, avg_body_height, fps)
-            metrics['timing'] = self._calc_timing(history, peak, avg_body_height)
+            metrics['downward_velocity'] = self._calc_downward_velocity(kin, start, end, avg_body_height, fps)
+            metrics['timing'] = self._calc_timing(kin, peak, avg_body_height)
             
         elif action == 'lift':
-            metrics['estimated_shuttle_height'] = self._calc_estimated_shuttle_height(history, peak, avg_body_height)
-            metrics['simplicity'] = self._calc_simplicity(window_data, avg_body_height)
-            metrics['stability'] = self._calc_stability(window_data, avg_body_height)
-            metrics['contact_height_variance'] = 0.3 # Not applicable for single shot
+            metrics['estimated_shuttle_height'] = self._calc_estimated_shuttle_height(kin, peak, avg_body_height)
+            metrics['simplicity'] = self._calc_simplicity(kin, start, end, avg_body_height)
+            metrics['stability'] = self._calc_stability(kin, start, end, avg_body_height)
+            metrics['contact_height_variance'] = 0.3 # Set-level metric, see _apply_stroke_set_metrics
             
         elif action == 'net_shot':
-            metrics['net_tightness_proxy'] = self._calc_net_tightness(window_data, avg_body_height)
-            metrics['swing_speed_low'] = self._calc_swing_speed_low(history, start, end, avg_body_height)
-            metrics['simplicity'] = self._calc_simplicity(window_data, avg_body_height)
+            metrics['net_tightness_proxy'] = self._calc_net_tightness(kin, start, end, avg_body_height)
+            metrics['swing_speed_low'] = self._calc_swing_speed_low(kin, start, end, avg_body_height)
+            metrics['simplicity'] = self._calc_simplicity(kin, start, end, avg_body_height)
             
         # Fallback for any missing keys to avoid crashes
         defaults = {
@@ -285,23 +516,18 @@ class VideoProcessor:
         return metrics
 
     # --- Individual Metric Algorithms ---
+    # Window-based metrics take inclusive frame bounds [start, end] of the hit window.
 
-    def _calc_contact_height(self, history: List[Dict], peak_idx: int, body_height: float) -> float:
+    def _calc_contact_height(self, kin: Kinematics, peak_idx: int, body_height: float) -> float:
         # Search for highest wrist point near peak velocity (contact point)
         # Search window: peak - 5 to peak + 5
-        start = max(0, peak_idx - 5)
-        end = min(len(history), peak_idx + 5)
+        start, end = kin.rows_around(peak_idx, 5, 4)
         
-        min_wrist_y = 1.0 # 1.0 is bottom
-        
-        for i in range(start, end):
-            frame = history[i]
-            # Use higher wrist
-            wrist_y = min(frame['right_wrist'].y, frame['left_wrist'].y)
-            if wrist_y < min_wrist_y:
-                min_wrist_y = wrist_y
+        # Use higher wrist; 1.0 is bottom
+        wrist_ys = kin.higher_wrist_y[start:end]
+        min_wrist_y = min(1.0, float(wrist_ys.min())) if wrist_ys.size else 1.0
                 
-        nose_y = history[peak_idx]['nose'].y
+        nose_y = float(kin.nose_y[peak_idx])
         
         # Higher than nose?
         # delta negative means wrist is above nose (since y=0 at top)
@@ -317,13 +543,9 @@ class VideoProcessor:
         score = (ratio + 0.1) / 0.5
         return float(np.clip(score, 0.0, 1.0))
 
-    def _calc_swing_amplitude(self, window_data: List[Dict], body_height: float) -> float:
+    def _calc_swing_amplitude(self, kin: Kinematics, start: int, end: int, body_height: float) -> float:
         # Measure total travel distance of wrist relative to body height
-        total_dist = 0
-        for i in range(1, len(window_data)):
-            curr = window_data[i]['right_wrist']
-            prev = window_data[i-1]['right_wrist']
-            total_dist += np.sqrt((curr.x - prev.x)**2 + (curr.y - prev.y)**2)
+        total_dist = kin.path_length(start, end)
             
         # Normalize
         # A full smash swing might travel 2-3 body heights?
@@ -333,22 +555,17 @@ class VideoProcessor:
         score = (ratio - 1.0) / 3.0
         return float(np.clip(score, 0.0, 1.0))
 
-    def _calc_coordination(self, window_data: List[Dict]) -> float:
+    def _calc_coordination(self, kin: Kinematics, start: int, end: int) -> float:
         # Measure Shoulder Rotation Range (Z-axis proxy)
         # Width of shoulders projected on 2D plane changes as they rotate
         # Max Width = Facing camera, Min Width = Side to camera
         
-        widths = []
-        for frame in window_data:
-            rw = frame['right_shoulder']
-            lw = frame['left_shoulder']
-            width = np.sqrt((rw.x - lw.x)**2 + (rw.y - lw.y)**2)
-            widths.append(width)
+        widths = kin.shoulder_width[start:end+1]
             
-        if not widths: return 0.5
+        if not widths.size: return 0.5
         
-        max_w = max(widths)
-        min_w = min(widths)
+        max_w = float(widths.max())
+        min_w = float(widths.min())
         
         # Rotation Ratio: 1 - (min/max)
         # If min approx max, no rotation -> 0
@@ -359,16 +576,9 @@ class VideoProcessor:
         score = (rotation_score - 0.1) / 0.4
         return float(np.clip(score, 0.0, 1.0))
 
-    def _calc_downward_velocity(self, history: List[Dict], start: int, end: int, body_height: float, fps: float) -> float:
-        # Max positive Y velocity (downward)
-        max_vel = 0
-        for i in range(start, end):
-            curr = history[i+1]['right_wrist'].y
-            prev = history[i]['right_wrist'].y
-            vel = (curr - prev) * fps # Units per second
-            
-            if vel > max_vel:
-                max_vel = vel
+    def _calc_downward_velocity(self, kin: Kinematics, start: int, end: int, body_height: float, fps: float) -> float:
+        # Max positive Y velocity (downward), units per second
+        max_vel = kin.max_downward_step(start, end) * fps
                 
         # Normalize relative to body height
         # E.g., 5 body heights per second is fast
@@ -378,38 +588,35 @@ class VideoProcessor:
         score = (vel_norm - 2.0) / 6.0
         return float(np.clip(score, 0.0, 1.0))
 
-    def _calc_timing(self, history: List[Dict], peak_idx: int, body_height: float) -> float:
+    def _calc_timing(self, kin: Kinematics, peak_idx: int, body_height: float) -> float:
         # Compare index of max height vs index of peak velocity
         # Ideally they should be close (Hit at max extension and max speed)
         
         # Find index of max height in window
         window_size = 15 # Increased search window to catch earlier preparations
-        s = int(max(0, peak_idx - window_size))
-        e = int(min(len(history), peak_idx + window_size))
+        s, e = kin.rows_around(peak_idx, window_size, window_size - 1)
         
-        min_wrist_y = 1.0
+        wrist_ys = kin.wrist_y[s:e]
         max_height_idx = peak_idx
-        
-        for i in range(s, e):
-            y = history[i]['right_wrist'].y
-            if y < min_wrist_y:
-                min_wrist_y = y
-                max_height_idx = i
+        if wrist_ys.size:
+            i = int(np.argmin(wrist_ys))
+            if wrist_ys[i] < 1.0:
+                max_height_idx = s + i
                 
-        diff = abs(max_height_idx - peak_idx)
+        diff = kin.frame_distance(max_height_idx, peak_idx)
         
         # Relaxed tolerance: 12 frames (approx 0.4s at 30fps)
         # Allows for natural follow-through lag
         score = 1.0 - (diff / 12.0)
         return float(np.clip(score, 0.0, 1.0))
 
-    def _calc_estimated_shuttle_height(self, history: List[Dict], peak_idx: int, body_height: float) -> float:
+    def _calc_estimated_shuttle_height(self, kin: Kinematics, peak_idx: int, body_height: float) -> float:
         # For lift, "shuttle height" goal is high.
         # We assume follow-through height indicates lift height.
         # Look at end of window
-        end_idx = min(len(history)-1, peak_idx + 10)
-        wrist_y = history[end_idx]['right_wrist'].y
-        nose_y = history[end_idx]['nose'].y
+        end_idx = kin.rows_around(peak_idx, 0, 10)[1] - 1
+        wrist_y = float(kin.wrist_y[end_idx])
+        nose_y = float(kin.nose_y[end_idx])
         
         # Higher is better (lower y)
         dist_above_nose = nose_y - wrist_y
@@ -419,20 +626,14 @@ class VideoProcessor:
         score = (ratio + 0.2) / 0.5
         return float(np.clip(score, 0.0, 1.0))
 
-    def _calc_simplicity(self, window_data: List[Dict], body_height: float) -> float:
+    def _calc_simplicity(self, kin: Kinematics, start: int, end: int, body_height: float) -> float:
         # Ratio of Displacement / Total Distance
         # 1.0 = Straight line (Simple)
         
-        start_pt = window_data[0]['right_wrist']
-        end_pt = window_data[-1]['right_wrist']
+        dx, dy = kin.wrist[end] - kin.wrist[start]
+        displacement = float(np.hypot(dx, dy))
         
-        displacement = np.sqrt((end_pt.x - start_pt.x)**2 + (end_pt.y - start_pt.y)**2)
-        
-        total_dist = 0
-        for i in range(1, len(window_data)):
-            curr = window_data[i]['right_wrist']
-            prev = window_data[i-1]['right_wrist']
-            total_dist += np.sqrt((curr.x - prev.x)**2 + (curr.y - prev.y)**2)
+        total_dist = kin.path_length(start, end)
             
         if total_dist == 0: return 1.0
         
@@ -440,12 +641,9 @@ class VideoProcessor:
         # Direct map 0-1
         return float(ratio)
 
-    def _calc_stability(self, window_data: List[Dict], body_height: float) -> float:
+    def _calc_stability(self, kin: Kinematics, start: int, end: int, body_height: float) -> float:
         # Variance of nose position
-        nose_xs = [f['nose'].x for f in window_data]
-        nose_ys = [f['nose'].y for f in window_data]
-        
-        var = np.var(nose_xs) + np.var(nose_ys)
+        var = np.var(kin.nose_x[start:end+1]) + np.var(kin.nose_y[start:end+1])
         std = np.sqrt(var)
         
         # Normalize by body height
@@ -455,15 +653,10 @@ class VideoProcessor:
         score = 1.0 - (norm_std / 0.1)
         return float(np.clip(score, 0.0, 1.0))
 
-    def _calc_net_tightness(self, window_data: List[Dict], body_height: float) -> float:
+    def _calc_net_tightness(self, kin: Kinematics, start: int, end: int, body_height: float) -> float:
         # Proxy: Elbow stability (movement of elbow relative to shoulder)
         # For net shot, elbow should be relatively stable
-        dists = []
-        for f in window_data:
-            e = f['right_elbow']
-            s = f['right_shoulder']
-            d = np.sqrt((e.x - s.x)**2 + (e.y - s.y)**2)
-            dists.append(d)
+        dists = kin.elbow_shoulder_dist[start:end+1]
             
         var = np.var(dists)
         std = np.sqrt(var)
@@ -473,15 +666,10 @@ class VideoProcessor:
         score = 1.0 - (norm_std / 0.05)
         return float(np.clip(score, 0.0, 1.0))
 
-    def _calc_swing_speed_low(self, history: List[Dict], start: int, end: int, body_height: float) -> float:
+    def _calc_swing_speed_low(self, kin: Kinematics, start: int, end: int, body_height: float) -> float:
         # For net shot, we want LOW speed.
         # Calculate max speed in window
-        max_dist = 0
-        for i in range(start, end):
-            curr = history[i+1]['right_wrist']
-            prev = history[i]['right_wrist']
-            dist = np.sqrt((curr.x - prev.x)**2 + (curr.y - prev.y)**2)
-            if dist > max_dist: max_dist = dist
+        max_dist = kin.max_speed(start, end)
             
         speed = max_dist / body_height
         
@@ -491,16 +679,44 @@ class VideoProcessor:
         score = 1.0 - (speed - 0.02) / 0.08
         return float(np.clip(score, 0.0, 1.0))
 
-    def _generate_keyframe(self, video_path: str, frame_idx: int, landmarks: Dict) -> Optional[str]:
+    def _last_wrist_speed(self, track: LandmarkTrack) -> Optional[float]:
+        """Per-frame wrist speed between the last two track rows (same signal as Kinematics.wrist_speed)."""
+        if len(track) < 2:
+            return None
+        wrist = track.data[-2:, JOINT_INDEX['right_wrist'], :2].astype(np.float64)
+        dx, dy = wrist[1] - wrist[0]
+        gap = max(int(track.frame_indices[-1] - track.frame_indices[-2]), 1)
+        return float(np.hypot(dx, dy)) / gap
+
+    def _snapshot(self, video_path: str, track: LandmarkTrack, idx: int, image: Optional[np.ndarray]) -> Optional[str]:
+        landmarks = track.frame_landmarks(idx)
+        if image is None:
+            # Not retained during decoding: fall back to seeking the source video
+            logger.warning(f"Snapshot for row {idx} not captured in decode pass, seeking video")
+            return self._generate_keyframe(video_path, int(track.frame_indices[idx]), landmarks)
+        return self._render_keyframe(image.copy(), landmarks)
+
+    def _generate_keyframe(self, video_path: str, frame_idx: int, landmarks: Dict[str, Tuple[float, float]]) -> Optional[str]:
         try:
             cap = cv2.VideoCapture(video_path)
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            success, image = cap.read()
-            cap.release()
+            try:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+                success, image = cap.read()
+            finally:
+                cap.release()
             
             if not success:
                 return None
                 
+            return self._render_keyframe(image, landmarks)
+            
+        except Exception as e:
+            logger.error(f"Keyframe generation failed: {e}")
+            return None
+
+    def _render_keyframe(self, image: np.ndarray, landmarks: Dict[str, Tuple[float, float]]) -> Optional[str]:
+        """Draw the skeleton overlay on a BGR frame and encode it as a JPEG data URI."""
+        try:
             h, w, _ = image.shape
             color = (0, 255, 255) # Yellow
             thickness = 2
@@ -508,9 +724,9 @@ class VideoProcessor:
             
             pts = {}
             # Map landmarks to pixel coords
-            for name, lm in landmarks.items():
-                px = int(lm.x * w)
-                py = int(lm.y * h)
+            for name, (x, y) in landmarks.items():
+                px = int(x * w)
+                py = int(y * h)
                 pts[name] = (px, py)
                 cv2.circle(image, (px, py), radius, (0, 0, 255), -1) 
                 
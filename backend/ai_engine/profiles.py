@@ -0,0 +1,53 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+
+class AnalysisProfile(BaseModel):
+    """
+    Controls how much of the video is fed to pose inference.
+
+    The coarse pass samples frames at `target_fps` and downscales them so the
+    longest side is at most `max_side`. When sampling is sparser than the source,
+    a refine pass re-decodes `refine_seconds` around the coarse wrist-speed peak
+    at the full frame rate, so the hit window is always analysed densely.
+    `pose_backend` picks the pose estimator (see pose_backends.POSE_BACKENDS),
+    trading landmark accuracy for inference cost. With `person_roi`, frames
+    are cropped to the tracked player before inference (see person_roi). No
+    built-in profile turns it on: on MediaPipe it saves no inference time, as
+    the model already crops to its own tracked region (bench_pose_backends --roi).
+    """
+    name: str
+    max_side: Optional[int] = Field(None, description="Longest side of inference frames (None = native)")
+    target_fps: Optional[float] = Field(None, description="Coarse sampling rate (None = every frame)")
+    refine: bool = True
+    refine_seconds: float = 1.0
+    pose_backend: str = Field("mediapipe-1", description="Pose estimator: mediapipe-0/1/2 or onnx")
+    person_roi: bool = Field(False, description="Crop inference frames to the tracked player")
+
+    def stride_for(self, fps: float) -> int:
+        """Number of source frames between coarse samples."""
+        if not self.target_fps or self.target_fps >= fps:
+            return 1
+        return max(1, int(round(fps / self.target_fps)))
+
+ANALYSIS_PROFILES: Dict[str, AnalysisProfile] = {
+    # Every frame at native resolution (original behaviour)
+    "full": AnalysisProfile(name="full"),
+    # 720p at 30fps, dense around the swing
+    "balanced": AnalysisProfile(name="balanced", max_side=1280, target_fps=30.0),
+    # 480p at 15fps, dense around the swing
+    "fast": AnalysisProfile(name="fast", max_side=854, target_fps=15.0),
+    # Heaviest MediaPipe model on every frame, for reference measurements
+    "accurate": AnalysisProfile(name="accurate", pose_backend="mediapipe-2"),
+    # Lightest MediaPipe model at 480p/15fps
+    "lite": AnalysisProfile(name="lite", max_side=854, target_fps=15.0, pose_backend="mediapipe-0"),
+    # Batched ONNX Runtime model (ONNX_POSE_MODEL) at 720p/30fps
+    "onnx": AnalysisProfile(name="onnx", max_side=1280, target_fps=30.0, pose_backend="onnx"),
+}
+
+def get_profile(profile) -> AnalysisProfile:
+    """Resolve a profile name (or pass through an AnalysisProfile)."""
+    if isinstance(profile, AnalysisProfile):
+        return profile
+    if profile not in ANALYSIS_PROFILES:
+        raise ValueError(f"Unknown analysis profile: {profile}")
+    return ANALYSIS_PROFILES[profile]
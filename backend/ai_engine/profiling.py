@@ -0,0 +1,328 @@
+"""
+Instrumentation: per-stage timing, Prometheus-style metrics and trace IDs.
+
+Stages. Code marks its stages with `stage(name)`. Every call is observed into
+the shuttlecoach_stage_seconds histogram. While a StageTimer is active in the
+current context, the individual durations are kept as well:
+
+    with StageTimer() as timer:
+        analysis_service.analyze_video(path)
+    timer.totals()   # {"decode": 0.41, "pose": 3.2, ...} seconds per stage
+
+Stages: decode, preprocess, pose, metrics, keyframes (VideoProcessor), store,
+rules, llm, strokes, images (AIAnalysisService / ActionAnalyzer). Stages do not
+nest within a thread; decode and preprocess run on frame_pipeline's threads
+concurrently with pose, so stage totals can add up to more than the wall time.
+A span costs two perf_counter calls and one histogram update (about 2 us), so
+the four spans of a frame stay well under 1% of its pose inference.
+
+Metrics. Counters, histograms and callback gauges live in REGISTRY, which
+renders them in the Prometheus text format (served at GET /metrics). Analysis
+worker processes drain() what they recorded after each task; the process
+owning the pool merge()s it into its own registry.
+
+Trace IDs. `trace(task_id)` binds an ID to the current context. After
+enable_trace_logging(), every log record carries it as %(trace_id)s
+("-" outside of a trace).
+"""
+import math
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Seconds; from sub-millisecond frame stages up to whole analyses
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic count per label set, e.g. requests by outcome."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._series: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._series.get(labels, 0.0)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            series = dict(self._series)
+        for labels, value in sorted(series.items()):
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+
+    def _drain(self) -> Dict[Labels, float]:
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def _merge(self, series: Dict[Labels, float]):
+        for labels, value in series.items():
+            self.inc(*labels, amount=value)
+
+
+class Histogram:
+    """Distribution per label set: counts per bucket (upper bounds `buckets`), sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [count in each bucket..., count above the last bucket, sum]
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), values[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(values[-1])}"
+            yield f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}"
+
+    def _drain(self) -> Dict[Labels, List[float]]:
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def _merge(self, series: Dict[Labels, List[float]]):
+        with self._lock:
+            for labels, values in series.items():
+                mine = self._series.get(labels)
+                if mine is None:
+                    self._series[labels] = list(values)
+                else:
+                    self._series[labels] = [a + b for a, b in zip(mine, values)]
+
+
+class Gauge:
+    """Value read at scrape time from `fn`: a number, or {label values: number}."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Union[float, Dict[Labels, float]]], labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.fn = fn
+
+    def _samples(self) -> Iterator[str]:
+        try:
+            values = self.fn()
+        except Exception as e:
+            logger.warning(f"Gauge {self.name} failed: {e}")
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+
+
+class Registry:
+    """Named metrics of this process. Registering an existing name returns the existing metric."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Union[float, Dict[Labels, float]]], labels: Sequence[str] = ()) -> Gauge:
+        """Register (or replace) a callback gauge."""
+        gauge = Gauge(name, help, fn, labels)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric._samples())
+        return "\n".join(lines) + "\n"
+
+    def drain(self) -> Dict[str, Dict[Labels, Any]]:
+        """Counter and histogram values recorded since the last drain (picklable), resetting them."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        drained = {}
+        for metric in metrics:
+            if metric.kind in ("counter", "histogram"):
+                series = metric._drain()
+                if series:
+                    drained[metric.name] = series
+        return drained
+
+    def merge(self, drained: Dict[str, Dict[Labels, Any]]):
+        """Add values drained from another process (metrics unknown here are ignored)."""
+        for name, series in drained.items():
+            metric = self._metrics.get(name)
+            if metric is not None and metric.kind in ("counter", "histogram"):
+                metric._merge(series)
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "shuttlecoach_stage_seconds", "Duration of analysis pipeline stages (per frame for decode/preprocess/keyframes, per inference batch for pose)",
+    ["stage"])
+
+
+# --- Stages ---
+
+_active: ContextVar[Optional["StageTimer"]] = ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    """Collects the duration of every `stage()` call made while it is entered."""
+
+    def __init__(self):
+        # Stage name -> duration of each call, in seconds
+        self.samples: Dict[str, List[float]] = {}
+        self._token = None
+
+    def __enter__(self) -> "StageTimer":
+        self._token = _active.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _active.reset(self._token)
+        self._token = None
+
+    def add(self, name: str, seconds: float):
+        self.samples.setdefault(name, []).append(seconds)
+
+    def totals(self) -> Dict[str, float]:
+        return {name: sum(durations) for name, durations in self.samples.items()}
+
+    def counts(self) -> Dict[str, int]:
+        return {name: len(durations) for name, durations in self.samples.items()}
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(elapsed, self.name)
+        timer = _active.get()
+        if timer is not None:
+            timer.add(self.name, elapsed)
+
+
+def stage(name: str) -> _Span:
+    """Context manager timing one pipeline stage."""
+    return _Span(name)
+
+
+def format_stage_totals(totals: Dict[str, float]) -> str:
+    """'pose=812ms decode=95ms ...', longest first, for log lines."""
+    return " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in sorted(totals.items(), key=lambda kv: -kv[1]))
+
+
+# --- Trace IDs ---
+
+_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(trace_id: Optional[str]):
+    """Bind `trace_id` (e.g. a task ID) to log records of the current context."""
+    token = _trace_id.set(trace_id)
+    try:
+        yield
+    finally:
+        _trace_id.reset(token)
+
+
+def set_trace_id(trace_id: Optional[str]):
+    """Bind `trace_id` for the rest of the current context (e.g. a request handler)."""
+    _trace_id.set(trace_id)
+
+
+def enable_trace_logging():
+    """Give every log record a `trace_id` attribute for format strings (idempotent)."""
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "_adds_trace_id", False):
+        return
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.trace_id = _trace_id.get() or "-"
+        return record
+    record_factory._adds_trace_id = True
+    logging.setLogRecordFactory(record_factory)
+
+
+# Format of the backend's log lines
+LOG_FORMAT = "%(asctime)s [%(levelname)s] [%(trace_id)s] %(message)s"
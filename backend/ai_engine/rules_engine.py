@@ -0,0 +1,288 @@
+"""
+Issue rules, level thresholds and scoring weights compiled into validated rule sets
+that are evaluated on many metric vectors at once.
+
+Rule syntax (rules/issue_rules.json, per action and issue tag):
+    {"metric": "contact_height", "condition": "< beginner", "priority": 1}
+
+    condition  "<", "<=", ">" or ">=" and one operand, or "between A B" /
+               "outside A B" (bounds inclusive / exclusive). An operand is a level
+               name from level_thresholds.json (for that action and metric) or a number.
+    all / any  instead of metric + condition: a list of clauses (which may nest)
+               that must all / any of them hold, e.g.
+               {"all": [{"metric": "stability", "condition": "< beginner"},
+                        {"metric": "swing_amplitude", "condition": "> 0.7"}], "priority": 4}
+    levels     per-level_assumption overrides of the clause, e.g.
+               "levels": {"intermediate": {"condition": "< intermediate"}};
+               null disables the rule for that level.
+
+A metric missing from the input never satisfies a clause. Rules are checked in
+priority order (ties keep file order). Any error raises RuleConfigError when the
+configs are compiled, naming the offending entry.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+COMPARISONS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+RANGES = ("between", "outside")
+RULE_KEYS = {"metric", "condition", "all", "any", "priority", "levels"}
+CLAUSE_KEYS = {"metric", "condition", "all", "any"}
+# Scoring treats a missing metric as average
+MISSING_METRIC_SCORE = 0.5
+
+
+class RuleConfigError(ValueError):
+    """Invalid rule, threshold or scoring configuration."""
+
+
+class Compare:
+    """`metric <op> value`, or `metric between/outside (low, high)`."""
+
+    def __init__(self, column: int, op: str, values: Tuple[float, ...]):
+        self.column = column
+        self.op = op
+        self.values = values
+
+    def evaluate(self, matrix: np.ndarray) -> np.ndarray:
+        col = matrix[:, self.column]
+        # NaN (missing metric) compares False either way, so it never triggers
+        if self.op == "between":
+            return (col >= self.values[0]) & (col <= self.values[1])
+        if self.op == "outside":
+            return (col < self.values[0]) | (col > self.values[1])
+        return COMPARISONS[self.op](col, self.values[0])
+
+
+class Combine:
+    """All (AND) or any (OR) of the child clauses."""
+
+    def __init__(self, mode: str, children: List[Union[Compare, "Combine"]]):
+        self.mode = mode
+        self.children = children
+
+    def evaluate(self, matrix: np.ndarray) -> np.ndarray:
+        reduce = np.logical_and if self.mode == "all" else np.logical_or
+        result = self.children[0].evaluate(matrix)
+        for child in self.children[1:]:
+            result = reduce(result, child.evaluate(matrix))
+        return result
+
+
+Clause = Union[Compare, Combine]
+
+
+class CompiledRule:
+    def __init__(self, tag: str, priority: float, default: Optional[Clause], by_level: Dict[str, Optional[Clause]]):
+        self.tag = tag
+        self.priority = priority
+        self.default = default
+        self.by_level = by_level
+
+    def clause_for(self, level: str) -> Optional[Clause]:
+        return self.by_level.get(level, self.default)
+
+
+class ActionRules:
+    """
+    Rules and scoring weights of one action over a fixed metric column order,
+    so a batch of results is one float matrix (rows = results, NaN = missing).
+    """
+
+    def __init__(self, action: str, columns: List[str], rules: List[CompiledRule], weights: Dict[str, float]):
+        self.action = action
+        self.columns = columns
+        self.index = {name: i for i, name in enumerate(columns)}
+        self.rules = rules
+        # (column, weight) in config order: scores are summed in the same order as before compiling
+        self.weights = [(self.index[name], weight) for name, weight in weights.items()]
+        self.total_weight = sum(weights.values())
+
+    @property
+    def tags(self) -> List[str]:
+        return [rule.tag for rule in self.rules]
+
+    def matrix(self, metrics_list: Sequence[Dict[str, float]]) -> np.ndarray:
+        columns = self.columns
+        shape = (len(metrics_list), len(columns))
+        try:
+            return np.fromiter((metrics.get(name, np.nan) for metrics in metrics_list for name in columns),
+                               dtype=np.float64, count=shape[0] * shape[1]).reshape(shape)
+        except TypeError:
+            # A stored None: the slower object conversion turns it into NaN
+            return np.array([[metrics.get(name) for name in columns] for metrics in metrics_list],
+                            dtype=np.float64).reshape(shape)
+
+    def issue_mask(self, matrix: np.ndarray, level: str) -> np.ndarray:
+        """(rows, rules) bool: which rules fire for each row, columns in priority order."""
+        mask = np.zeros((len(matrix), len(self.rules)), dtype=bool)
+        for i, rule in enumerate(self.rules):
+            clause = rule.clause_for(level)
+            if clause is not None:
+                mask[:, i] = clause.evaluate(matrix)
+        return mask
+
+    def issue_tags(self, matrix: np.ndarray, levels: Union[str, Sequence[str]]) -> List[List[str]]:
+        """Triggered issue tags per row, in priority order; `levels` is one level or one per row."""
+        if isinstance(levels, str):
+            return self._tag_lists(self.issue_mask(matrix, levels))
+        result: List[List[str]] = [[] for _ in range(len(matrix))]
+        levels = np.asarray(levels, dtype=object)
+        for level in set(levels.tolist()):
+            rows = np.flatnonzero(levels == level)
+            for row, tags in zip(rows.tolist(), self._tag_lists(self.issue_mask(matrix[rows], level))):
+                result[row] = tags
+        return result
+
+    def _tag_lists(self, mask: np.ndarray) -> List[List[str]]:
+        tags = self.tags
+        if len(tags) > 62:
+            return [[tag for tag, fired in zip(tags, row) if fired] for row in mask.tolist()]
+        # Rows share few distinct combinations: encode each as a bit pattern and build each tag list once
+        codes = (mask.astype(np.int64) << np.arange(mask.shape[1], dtype=np.int64)).sum(axis=1)
+        combos = {code: tuple(tag for bit, tag in enumerate(tags) if code >> bit & 1) for code in set(codes.tolist())}
+        return [list(combos[code]) for code in codes.tolist()]
+
+    def scores(self, matrix: np.ndarray) -> np.ndarray:
+        """Weighted mean of the scored metrics on a 0-100 scale, rounded half to even like round()."""
+        if self.total_weight == 0:
+            return np.zeros(len(matrix))
+        total = np.zeros(len(matrix))
+        for column, weight in self.weights:
+            values = np.where(np.isnan(matrix[:, column]), MISSING_METRIC_SCORE, matrix[:, column])
+            total = total + values * 100 * weight
+        return np.round(total / self.total_weight)
+
+
+class RuleSet:
+    """All actions' compiled rules; build with `RuleSet.compile(rules, thresholds, scoring)`."""
+
+    def __init__(self, actions: Dict[str, ActionRules]):
+        self.actions = actions
+
+    def __contains__(self, action: str) -> bool:
+        return action in self.actions
+
+    def __getitem__(self, action: str) -> ActionRules:
+        return self.actions[action]
+
+    @classmethod
+    def compile(cls, rules: Dict[str, Any], thresholds: Dict[str, Any], scoring: Dict[str, Any]) -> "RuleSet":
+        actions = {}
+        for action, action_rules in rules.items():
+            where = f"issue_rules.json: {action}"
+            if not isinstance(action_rules, dict):
+                raise RuleConfigError(f"{where}: expected an object of rules")
+            levels = _check_thresholds(action, thresholds.get(action, {}))
+            weights = _check_weights(action, scoring.get(action, {}))
+            columns = list(weights)
+            compiled = []
+            for tag, rule in action_rules.items():
+                compiled.append(_compile_rule(f"{where}.{tag}", tag, rule, levels, columns))
+            compiled.sort(key=lambda r: r.priority)
+            actions[action] = ActionRules(action, columns, compiled, weights)
+        return cls(actions)
+
+
+def _check_thresholds(action: str, action_thresholds: Any) -> Dict[str, Dict[str, float]]:
+    where = f"level_thresholds.json: {action}"
+    if not isinstance(action_thresholds, dict):
+        raise RuleConfigError(f"{where}: expected an object of metrics")
+    for metric, levels in action_thresholds.items():
+        if not isinstance(levels, dict):
+            raise RuleConfigError(f"{where}.{metric}: expected an object of level thresholds")
+        for level, value in levels.items():
+            if not _is_number(value):
+                raise RuleConfigError(f"{where}.{metric}.{level}: threshold must be a number, got {value!r}")
+    return action_thresholds
+
+
+def _check_weights(action: str, config: Any) -> Dict[str, float]:
+    where = f"action_scoring_config.json: {action}"
+    weights = config.get("metrics", {}) if isinstance(config, dict) else None
+    if not isinstance(weights, dict):
+        raise RuleConfigError(f"{where}: expected {{\"metrics\": {{name: weight}}}}")
+    for metric, weight in weights.items():
+        if not _is_number(weight) or weight < 0:
+            raise RuleConfigError(f"{where}.metrics.{metric}: weight must be a non-negative number, got {weight!r}")
+    return dict(weights)
+
+
+def _compile_rule(where: str, tag: str, rule: Any, levels: Dict[str, Dict[str, float]], columns: List[str]) -> CompiledRule:
+    if not isinstance(rule, dict):
+        raise RuleConfigError(f"{where}: expected an object")
+    unknown = set(rule) - RULE_KEYS
+    if unknown:
+        raise RuleConfigError(f"{where}: unknown keys {sorted(unknown)}")
+    priority = rule.get("priority", 99)
+    if not _is_number(priority):
+        raise RuleConfigError(f"{where}.priority: must be a number, got {priority!r}")
+
+    base = {key: rule[key] for key in CLAUSE_KEYS if key in rule}
+    default = _compile_clause(where, base, levels, columns)
+    overrides = rule.get("levels", {})
+    if not isinstance(overrides, dict):
+        raise RuleConfigError(f"{where}.levels: expected an object of level overrides")
+    by_level = {}
+    for level, override in overrides.items():
+        if override is None:
+            by_level[level] = None
+            continue
+        if not isinstance(override, dict) or set(override) - CLAUSE_KEYS:
+            raise RuleConfigError(f"{where}.levels.{level}: expected a clause (metric/condition or all/any) or null")
+        # An override may change just the condition and keep the rule's metric
+        merged = override if ("all" in override or "any" in override) else {**base, **override}
+        by_level[level] = _compile_clause(f"{where}.levels.{level}", merged, levels, columns)
+    return CompiledRule(tag, float(priority), default, by_level)
+
+
+def _compile_clause(where: str, clause: Any, levels: Dict[str, Dict[str, float]], columns: List[str]) -> Clause:
+    if not isinstance(clause, dict):
+        raise RuleConfigError(f"{where}: expected a clause object")
+    modes = [mode for mode in ("all", "any") if mode in clause]
+    if modes:
+        if len(modes) > 1 or "metric" in clause or "condition" in clause:
+            raise RuleConfigError(f"{where}: use one of metric/condition, all or any")
+        children = clause[modes[0]]
+        if not isinstance(children, list) or not children:
+            raise RuleConfigError(f"{where}.{modes[0]}: expected a non-empty list of clauses")
+        return Combine(modes[0], [_compile_clause(f"{where}.{modes[0]}[{i}]", child, levels, columns)
+                                  for i, child in enumerate(children)])
+
+    metric, condition = clause.get("metric"), clause.get("condition")
+    if not isinstance(metric, str) or not isinstance(condition, str):
+        raise RuleConfigError(f"{where}: needs \"metric\" and \"condition\" strings (or all/any)")
+    parts = condition.split()
+    op, operands = (parts[0], parts[1:]) if parts else ("", [])
+    if op in COMPARISONS:
+        expected = 1
+    elif op in RANGES:
+        expected = 2
+    else:
+        raise RuleConfigError(f"{where}: unknown operator in condition {condition!r}")
+    if len(operands) != expected:
+        raise RuleConfigError(f"{where}: '{op}' takes {expected} operand(s), got {condition!r}")
+    values = tuple(_resolve_operand(where, operand, metric, levels) for operand in operands)
+    if op in RANGES and values[0] > values[1]:
+        raise RuleConfigError(f"{where}: empty range in {condition!r}")
+    if metric not in columns:
+        columns.append(metric)
+    return Compare(columns.index(metric), op, values)
+
+
+def _resolve_operand(where: str, operand: str, metric: str, levels: Dict[str, Dict[str, float]]) -> float:
+    try:
+        return float(operand)
+    except ValueError:
+        pass
+    metric_levels = levels.get(metric)
+    if metric_levels is None:
+        raise RuleConfigError(f"{where}: no thresholds for metric '{metric}' in level_thresholds.json")
+    if operand not in metric_levels:
+        raise RuleConfigError(f"{where}: unknown threshold level '{operand}' for '{metric}' "
+                              f"(have {sorted(metric_levels)})")
+    return float(metric_levels[operand])
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -1,23 +1,38 @@
-from typing import Dict, Any, Optional
-from .processor import VideoProcessor
+import os
+import math
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from .processor import ProgressCallback, VideoProcessor
 from .analyzer import ActionAnalyzer
-from .models import AnalysisResult
+from .models import AnalysisResult, ImageRef, StrokeResult, StrokeSummary
+from .strokes import aggregate_strokes
+from .track_store import track_store
+from .blob_store import blob_store
+from .profiling import stage
+
+logger = logging.getLogger(__name__)
 
 class AIAnalysisService:
     def __init__(self):
-        self.processor = VideoProcessor()
+        # Sampling profile for pose extraction: full | balanced | fast
+        self.processor = VideoProcessor(profile=os.getenv("ANALYSIS_PROFILE", "full"))
         self.analyzer = ActionAnalyzer()
 
-    def analyze_video(self, video_path: str, action_type: Optional[str] = None, level_assumption: str = "beginner") -> Dict[str, Any]:
+    def analyze_video(self, video_path: str, action_type: Optional[str] = None, level_assumption: str = "beginner",
+                      task_id: Optional[str] = None, progress: Optional[ProgressCallback] = None,
+                      use_llm: bool = True) -> Dict[str, Any]:
         """
         Orchestrates the analysis process:
         1. Process video to get raw metrics AND detect action type.
         2. Analyze metrics against rules using the detected action.
         3. Return structured JSON result.
+        With a `task_id` the landmark track is stored for later re-analysis.
+        `progress` receives stage updates (see VideoProcessor.process_video, plus 'feedback').
+        With `use_llm=False` the feedback is rule-based (the queue adds LLM feedback later).
         """
         # 1. Extract Metrics & Detect Action
         try:
-            processing_result = self.processor.process_video(video_path)
+            processing_result = self.processor.process_video(video_path, progress=progress)
             raw_metrics = processing_result["metrics"]
             detected_action = processing_result["detected_action"]
             keyframe = processing_result.get("keyframe")
@@ -26,22 +41,162 @@ class AIAnalysisService:
             # Fallback for error handling
             return {"error": f"Video processing failed: {str(e)}"}
 
+        if task_id and len(processing_result["track"]):
+            try:
+                with stage("store"):
+                    track_store.save(task_id, processing_result["track"], processing_result["fps"])
+            except OSError as e:
+                logger.warning(f"Could not store landmark track for task {task_id}: {e}")
+
         # 2. Analyze
         # Use detected action if no specific action_type is forced
         final_action = action_type if action_type else detected_action
         
+        if progress:
+            progress("feedback", None, {})
         # Pass keyframe and sequence to analyzer for LLM context
-        result = self.analyzer.analyze(final_action, raw_metrics, level_assumption, keyframe, action_sequence)
+        result = self.analyzer.analyze(final_action, raw_metrics, level_assumption, keyframe, action_sequence, use_llm=use_llm)
+        with stage("strokes"):
+            self._attach_strokes(result, processing_result.get("strokes", []), processing_result.get("fps", 30.0), action_type)
         
-        # Inject Keyframe & Sequence
-        if keyframe:
-            result.keyframe_base64 = keyframe
-        if action_sequence:
-            result.action_sequence = action_sequence
+        # Inject Keyframe & Sequence (stored as blobs, referenced from the result)
+        with stage("images"):
+            self._attach_images(result, keyframe, action_sequence)
         
         # 3. Serialize
         # AnalysisResult is a Pydantic model, use model_dump to return dict
         return result.model_dump()
 
+    def reanalyze_track(self, track, fps: float, previous: Optional[Dict[str, Any]] = None,
+                        action_type: Optional[str] = None, use_llm: bool = False) -> Dict[str, Any]:
+        """
+        Re-run the metric stage and rules on a stored landmark track.
+        Images are taken from `previous` (the stored result) since there is no video;
+        LLM feedback is off by default so bulk re-scoring stays cheap.
+        """
+        previous = previous or {}
+        level_assumption = previous.get("level_assumption") or "beginner"
+        keyframe = previous.get("keyframe_base64")
+        action_sequence = previous.get("action_sequence") or []
+        keyframe_image = previous.get("keyframe_image")
+        sequence_images = previous.get("action_sequence_images") or []
+
+        if len(track) == 0:
+            return self.analyzer.analyze("unknown", {}, level_assumption).model_dump()
+
+        if use_llm and not keyframe and not action_sequence:
+            # The LLM needs the pixels, not the references
+            keyframe = blob_store.data_uri(keyframe_image) if keyframe_image else None
+            action_sequence = [uri for uri in map(blob_store.data_uri, sequence_images) if uri]
+
+        analysis = self.processor.analyze_track(track, fps)
+        final_action = action_type if action_type else analysis["detected_action"]
+        result = self.analyzer.analyze(final_action, analysis["metrics"], level_assumption,
+                                       keyframe, action_sequence, use_llm=use_llm)
+        self._attach_strokes(result, analysis["strokes"], fps, action_type)
+        if keyframe_image or sequence_images:
+            result.keyframe_image = keyframe_image
+            result.action_sequence_images = sequence_images
+        else:
+            # Results from before the blob store: move their inline images out of the row
+            self._attach_images(result, keyframe, action_sequence)
+        return result.model_dump()
+
+    def rescore_results(self, previous: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Re-apply rules, thresholds and scoring to the metrics stored in results,
+        without their landmark tracks: enough after a config-only change, and
+        evaluated in one batch per action. As in reanalyze_track without use_llm,
+        feedback becomes rule-based (Database.update_task_results queues LLM feedback again).
+        """
+        results = [dict(result) for result in previous]
+        groups: Dict[str, List[int]] = {}
+        for i, result in enumerate(results):
+            groups.setdefault(result.get("action"), []).append(i)
+        for action, rows in groups.items():
+            fresh = self.analyzer.analyze_batch(action, [results[i].get("metrics") or {} for i in rows],
+                                                [results[i].get("level_assumption") or "beginner" for i in rows])
+            for i, new in zip(rows, fresh):
+                results[i].update(new.model_dump(include={"score", "issues", "positive_feedback",
+                                                          "next_training_focus", "generation_source"}))
+
+        flat = []
+        for i, result in enumerate(results):
+            if result.get("strokes"):
+                result["strokes"] = [dict(stroke) for stroke in result["strokes"]]
+                flat += [(i, stroke) for stroke in result["strokes"]]
+        scored = self._score_strokes([stroke for _, stroke in flat],
+                                     [results[i].get("level_assumption") or "beginner" for i, _ in flat])
+        for (_, stroke), (score, tags) in zip(flat, scored):
+            stroke["score"], stroke["issues"] = score, tags
+        for result in results:
+            if result.get("strokes"):
+                result["stroke_summary"] = self._rescore_stroke_summary(result["strokes"], result.get("stroke_summary"))
+        return results
+
+    def _rescore_stroke_summary(self, strokes: List[Dict[str, Any]], summary: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Stroke metrics (and so their statistics and consistency) are unchanged; only the score statistics move."""
+        by_action: Dict[str, List[int]] = {}
+        for stroke in strokes:
+            by_action.setdefault(stroke["action"], []).append(stroke["score"])
+        if not summary or set(summary) != set(by_action):
+            return {action: StrokeSummary(**stats).model_dump()
+                    for action, stats in aggregate_strokes(strokes, self._scored_metrics()).items()}
+        updated = {}
+        for action, scores in by_action.items():
+            mean = sum(scores) / len(scores)
+            std = math.sqrt(sum((score - mean) ** 2 for score in scores) / len(scores))
+            updated[action] = {**summary[action], "score_mean": round(mean, 1), "score_std": round(std, 1)}
+        return updated
+
+    def _attach_strokes(self, result: AnalysisResult, strokes: List[Dict[str, Any]], fps: float, action_type: Optional[str]):
+        """Score every segmented stroke with the rules (no LLM) and summarize them per action."""
+        scored = [{
+            "index": index,
+            "action": action_type if action_type else stroke["detected_action"],
+            "frame": stroke["frame"],
+            "time_sec": round(stroke["frame"] / fps, 2) if fps else 0.0,
+            "metrics": stroke["metrics"],
+        } for index, stroke in enumerate(strokes)]
+        for stroke, (score, tags) in zip(scored, self._score_strokes(scored, [result.level_assumption] * len(scored))):
+            stroke["score"], stroke["issues"] = score, tags
+        result.strokes = [StrokeResult(**stroke) for stroke in scored]
+        result.stroke_summary = {action: StrokeSummary(**summary)
+                                 for action, summary in aggregate_strokes(scored, self._scored_metrics()).items()}
+
+    def _score_strokes(self, strokes: List[Dict[str, Any]], levels: List[str]) -> List[Tuple[int, List[str]]]:
+        """Rule score and issue tags of each stroke ({"action", "metrics"}), one batch per action."""
+        scored: List[Tuple[int, List[str]]] = [(0, [])] * len(strokes)
+        groups: Dict[str, List[int]] = {}
+        for i, stroke in enumerate(strokes):
+            groups.setdefault(stroke["action"], []).append(i)
+        for action, rows in groups.items():
+            if action not in self.analyzer.rule_set:
+                continue  # Unsupported action: scored 0 without issues, like analyze()
+            action_rules = self.analyzer.rule_set[action]
+            matrix = action_rules.matrix([strokes[i]["metrics"] for i in rows])
+            tags = action_rules.issue_tags(matrix, [levels[i] for i in rows])
+            for i, score, stroke_tags in zip(rows, action_rules.scores(matrix).tolist(), tags):
+                scored[i] = (int(score), stroke_tags)
+        return scored
+
+    def _scored_metrics(self) -> Dict[str, List[str]]:
+        return {action: list(config.get("metrics", {})) for action, config in self.analyzer.scoring_config.items()}
+
+    def _attach_images(self, result: AnalysisResult, keyframe: Optional[str], action_sequence: List[str]):
+        try:
+            if keyframe:
+                result.keyframe_image = ImageRef(**blob_store.put_image(keyframe))
+            result.action_sequence_images = [ImageRef(**blob_store.put_image(img)) for img in action_sequence]
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not store result images, keeping them inline: {e}")
+            result.keyframe_image = None
+            result.action_sequence_images = []
+        if keyframe:
+            result.keyframe_base64 = keyframe
+        if action_sequence:
+            result.action_sequence = action_sequence
+
 # Singleton instance for easy import
 analysis_service = AIAnalysisService()
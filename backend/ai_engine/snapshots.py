@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from .strokes import HIT_WINDOW_FRAMES
+
+# Longest side of the snapshot frames handed out; larger frames are downscaled when read
+SNAPSHOT_MAX_SIDE = 1280
+# Action sequence: source frames before the hit window starts / after it ends
+SEQUENCE_MARGIN_FRAMES = 5
+
+
+def shrink_frame(image: np.ndarray, max_side: Optional[int] = SNAPSHOT_MAX_SIDE) -> np.ndarray:
+    """Downscale a frame so its longest side is at most `max_side` (returned as is when already small enough)."""
+    h, w = image.shape[:2]
+    if not max_side or max(h, w) <= max_side:
+        return image
+    scale = max_side / max(h, w)
+    return cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+class SnapshotCollector:
+    """
+    Keeps the decoded frames needed for the keyframe and action sequence while
+    the video is being decoded, so no second open/seek pass is required.
+
+    Rows are landmark-track rows (frames with a detection), offered in order with
+    their source frame index. The collector follows the running wrist-speed peak
+    exactly like VideoProcessor._detect_hit_phase and retains the frames
+    VideoProcessor renders for it, found by source frame like
+    Kinematics.rows_around (so stride and frames without a detection pick the
+    same rows):
+      - prep:   the first row at most `margin` frames before the hit window's first row
+      - peak:   the row with the highest speed so far
+      - follow: the last row at most `margin` frames after the hit window's last row
+    The hit window holds the rows within `window` frames of the peak.
+
+    Decoded frames are held by reference (no per-frame copy or resize): the
+    rows a prep frame can still come from, plus the three picks. Only the
+    frames read from frames() are downscaled to `max_side`.
+    """
+
+    def __init__(self, window: int = HIT_WINDOW_FRAMES, margin: int = SEQUENCE_MARGIN_FRAMES,
+                 max_side: Optional[int] = SNAPSHOT_MAX_SIDE):
+        self.window = window
+        self.margin = margin
+        self.max_side = max_side
+        # (row, frame index, image) of the rows a new peak's prep frame can come from
+        self._recent: Deque[Tuple[int, int, np.ndarray]] = deque()
+        self._peak_speed = -1.0
+        self._peak: Optional[Tuple[int, int, np.ndarray]] = None
+        self._prep: Optional[Tuple[int, np.ndarray]] = None
+        self._follow: Optional[Tuple[int, np.ndarray]] = None
+        # Source frame of the hit window's last row so far
+        self._window_end = 0
+
+    def offer(self, row: int, frame_idx: int, image: np.ndarray, speed: Optional[float]):
+        """
+        Record a decoded frame for a track row.
+        `speed` is the wrist speed from the previous row (None for the first row).
+        """
+        self._recent.append((row, frame_idx, image))
+        while self._recent[0][1] < frame_idx - self.window - self.margin:
+            self._recent.popleft()
+
+        if self._peak is None or (speed is not None and speed > self._peak_speed):
+            if speed is not None:
+                self._peak_speed = speed
+            self._peak = (row, frame_idx, image)
+            start_frame = next(f for _, f, _ in self._recent if f >= frame_idx - self.window)
+            self._prep = next((r, img) for r, f, img in self._recent if f >= start_frame - self.margin)
+
+        if frame_idx <= self._peak[1] + self.window:
+            self._window_end = frame_idx
+        if frame_idx <= self._window_end + self.margin:
+            self._follow = (row, image)
+
+    def frames(self) -> Dict[int, np.ndarray]:
+        """Retained frames keyed by track row, at most `max_side` long."""
+        frames = {}
+        for kept in (self._prep, self._peak, self._follow):
+            if kept is not None and kept[0] not in frames:
+                frames[kept[0]] = shrink_frame(kept[-1], self.max_side)
+        return frames
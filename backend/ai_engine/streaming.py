@@ -0,0 +1,184 @@
+import time
+import logging
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .analyzer import ActionAnalyzer
+from .kinematics import Kinematics
+from .landmarks import LandmarkTrack
+from .processor import VideoProcessor
+from .profiles import get_profile
+from .strokes import (HIT_WINDOW_FRAMES, REFRACTORY_SEC, aggregate_strokes,
+                      contact_height_variance, detect_strokes)
+
+logger = logging.getLogger(__name__)
+
+# Landmark history kept per stream: classification context before a stroke plus
+# the settle time after it, with margin
+WINDOW_SEC = 3.0
+# Strokes kept for the session summary, and lifts for contact_height_variance
+MAX_SESSION_STROKES = 500
+MAX_LIFT_HISTORY = 20
+
+
+class StreamingAnalyzer:
+    """
+    Incremental stroke analysis for live sources (camera, RTSP, replayed file).
+
+    Frames (or externally extracted landmarks) are pushed one at a time; only a
+    sliding window of WINDOW_SEC of landmark state is kept, so memory stays flat
+    however long the session runs. A stroke is emitted once no stronger peak can
+    still suppress it, i.e. REFRACTORY_SEC (and the hit window) after its hit, so
+    feedback latency is bounded by about that plus one check interval.
+
+    Strokes are scored with the rules only; the LLM is far too slow for on-court feedback.
+    """
+
+    def __init__(self, fps: float, profile="balanced", level_assumption: str = "beginner",
+                 action_type: Optional[str] = None, processor: Optional[VideoProcessor] = None,
+                 analyzer: Optional[ActionAnalyzer] = None):
+        self.fps = fps or 30.0
+        self.profile = get_profile(profile)
+        self.level_assumption = level_assumption
+        self.action_type = action_type
+        # A processor per stream: MediaPipe keeps tracking state between frames
+        self.processor = processor or VideoProcessor(profile=self.profile)
+        self.analyzer = analyzer or ActionAnalyzer()
+        self.stride = self.profile.stride_for(self.fps)
+
+        self.window_frames = int(WINDOW_SEC * self.fps)
+        self.refractory_frames = max(1, int(REFRACTORY_SEC * self.fps))
+        self.settle_frames = max(self.refractory_frames, HIT_WINDOW_FRAMES)
+        # Re-run segmentation about 10 times per second
+        self.check_every = max(1, int(self.fps / 10))
+
+        self._track = LandmarkTrack(capacity=2 * self.window_frames)
+        # Keeps inference on the player the session started with
+        self._roi = self.processor.person_roi(self.profile)
+        self._frame_idx = -1
+        self._last_check = -1
+        self._last_stroke_frame: Optional[int] = None
+        self._stroke_count = 0
+        self._strokes = deque(maxlen=MAX_SESSION_STROKES)
+        self._lift_heights = deque(maxlen=MAX_LIFT_HISTORY)
+
+    def push_frame(self, image: np.ndarray, frame_idx: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Run pose inference on one BGR frame. Returns the strokes completed by it (usually none)."""
+        frame_idx = self._frame_idx + 1 if frame_idx is None else frame_idx
+        if frame_idx % self.stride == 0:
+            self.processor.infer_frame(self._track, frame_idx, image, self.profile, self._roi)
+        return self._advance(frame_idx)
+
+    def push_landmarks(self, frame_idx: int, joints: Optional[np.ndarray]) -> List[Dict[str, Any]]:
+        """Feed landmarks from an external pose source, as a (joints, 4) array in JOINTS order (None = no detection)."""
+        if joints is not None:
+            self._track.append(frame_idx, joints)
+        return self._advance(frame_idx)
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """End of stream: emit the strokes still waiting for their settle time."""
+        return self._emit(final=True)
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-action aggregates of the session's strokes (see strokes.aggregate_strokes)."""
+        strokes = list(self._strokes)
+        scored_metrics = {action: list(config.get("metrics", {}))
+                          for action, config in self.analyzer.scoring_config.items()}
+        return {
+            "strokes": self._stroke_count,
+            "stroke_summary": aggregate_strokes(strokes, scored_metrics),
+        }
+
+    @property
+    def window_rows(self) -> int:
+        return len(self._track)
+
+    def _advance(self, frame_idx: int) -> List[Dict[str, Any]]:
+        self._frame_idx = frame_idx
+        self._trim()
+        if frame_idx - self._last_check < self.check_every:
+            return []
+        self._last_check = frame_idx
+        return self._emit(final=False)
+
+    def _trim(self):
+        """Drop rows older than the window; compacts only when the buffer is half stale, so appends stay O(1)."""
+        frames = self._track.frame_indices
+        if not len(frames):
+            return
+        first_kept = int(np.searchsorted(frames, self._frame_idx - self.window_frames, side='left'))
+        if first_kept > len(frames) // 2:
+            kept = self._track[first_kept:]
+            self._track = LandmarkTrack(capacity=2 * self.window_frames)
+            self._track.extend(kept)
+
+    def _emit(self, final: bool) -> List[Dict[str, Any]]:
+        if len(self._track) < 2:
+            return []
+        kin = Kinematics(self._track)
+        emitted = []
+        for stroke in detect_strokes(kin, self.fps):
+            peak = stroke["hit_window"][2]
+            frame = int(kin.frame_indices[peak])
+            if self._last_stroke_frame is not None and frame - self._last_stroke_frame < self.refractory_frames:
+                continue  # Already emitted, or suppressed by a stroke that has left the window
+            if not final and self._frame_idx - frame < self.settle_frames:
+                break  # Strokes are in time order: the rest are even more recent
+            emitted.append(self._score(kin, stroke, frame))
+            self._last_stroke_frame = frame
+        return emitted
+
+    def _score(self, kin: Kinematics, stroke: Dict[str, Tuple[int, ...]], frame: int) -> Dict[str, Any]:
+        detected_action, metrics = self.processor.measure_stroke(kin, stroke, self.fps)
+        if detected_action == "lift":
+            self._lift_heights.append(metrics["contact_height"])
+            if len(self._lift_heights) > 1:
+                metrics["contact_height_variance"] = contact_height_variance(list(self._lift_heights))
+
+        action = self.action_type or detected_action
+        result = self.analyzer.analyze(action, metrics, self.level_assumption, use_llm=False)
+        scored = {
+            "index": self._stroke_count,
+            "action": action,
+            "frame": frame,
+            "time_sec": round(frame / self.fps, 2),
+            "score": result.score,
+            "metrics": metrics,
+            "issues": [issue.tag for issue in result.issues],
+            # Source frames between the hit and this result
+            "delay_frames": self._frame_idx - frame,
+        }
+        self._stroke_count += 1
+        self._strokes.append(scored)
+        return scored
+
+
+def replay_video(video_path: str, realtime: bool = True) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """
+    Stand-in for a live source: yield (frame_idx, capture time, BGR frame) from a file,
+    paced at the video's frame rate when `realtime` is set.
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    started = time.perf_counter()
+    frame_idx = 0
+    try:
+        while True:
+            due = started + frame_idx / fps
+            if realtime:
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            success, image = cap.read()
+            if not success:
+                break
+            yield frame_idx, due if realtime else time.perf_counter(), image
+            frame_idx += 1
+    finally:
+        cap.release()
@@ -0,0 +1,104 @@
+import numpy as np
+from typing import Any, Dict, List, Tuple
+from .kinematics import Kinematics
+
+# A stroke is a wrist speed peak (normalized by body height, per source frame) above
+# max(MIN_STROKE_SPEED, RELATIVE_STROKE_SPEED * clip maximum); slow drops must still pass
+MIN_STROKE_SPEED = 0.05
+RELATIVE_STROKE_SPEED = 0.3
+# Minimum time between two strokes: suppresses the backswing/forward-swing double peak
+REFRACTORY_SEC = 0.6
+# Frames on each side of a stroke used to classify it (capped at half the gap to its neighbours)
+CONTEXT_SEC = 1.0
+# Hit window around each peak, in source frames; also the single-shot window
+# (VideoProcessor._detect_hit_phase) and the span SnapshotCollector follows
+HIT_WINDOW_FRAMES = 15
+
+# contact_height_variance: spread (std) of contact_height across strokes of one action,
+# scaled so a std of 0.14 reaches the 0.35 beginner threshold
+CONTACT_SPREAD_SCALE = 2.5
+
+
+def detect_strokes(kin: Kinematics, fps: float) -> List[Dict[str, Tuple[int, int, int]]]:
+    """
+    Find every swing in the track: local maxima of wrist speed above the stroke
+    threshold, strongest first, with weaker peaks within REFRACTORY_SEC of an
+    accepted one suppressed. Returns strokes in time order, each with a
+    `hit_window` (start, end, peak rows, inclusive) and a `segment` (start, end rows)
+    to classify the stroke on. The strongest stroke is the single-shot hit window.
+    Returns no strokes when the wrist never moves faster than MIN_STROKE_SPEED.
+    """
+    speed = kin.normalized_speed
+    if not speed.size:
+        return []
+
+    threshold = max(MIN_STROKE_SPEED, RELATIVE_STROKE_SPEED * float(speed.max()))
+    padded = np.concatenate(([-np.inf], speed, [-np.inf]))
+    is_peak = (speed >= padded[:-2]) & (speed > padded[2:]) & (speed >= threshold)
+    candidates = np.flatnonzero(is_peak)
+    if not candidates.size:
+        return []  # No swing (e.g. standing still between strokes)
+
+    # Non-maximum suppression in source frames; step i ends at row i + 1
+    peak_rows = candidates + 1
+    peak_frames = kin.frame_indices[peak_rows]
+    refractory = max(1, int(REFRACTORY_SEC * fps))
+    accepted: List[int] = []
+    for i in np.argsort(-speed[candidates], kind='stable'):
+        if all(abs(int(peak_frames[i]) - int(peak_frames[j])) >= refractory for j in accepted):
+            accepted.append(int(i))
+    accepted.sort()
+
+    context = max(HIT_WINDOW_FRAMES, int(CONTEXT_SEC * fps))
+    strokes = []
+    for n, i in enumerate(accepted):
+        peak = int(peak_rows[i])
+        frame = int(peak_frames[i])
+        before = after = context
+        if n > 0:
+            before = min(before, (frame - int(peak_frames[accepted[n - 1]])) // 2)
+        if n + 1 < len(accepted):
+            after = min(after, (int(peak_frames[accepted[n + 1]]) - frame) // 2)
+        start, end_excl = kin.rows_around(peak, HIT_WINDOW_FRAMES, HIT_WINDOW_FRAMES)
+        seg_start, seg_end_excl = kin.rows_around(peak, before, after)
+        strokes.append({
+            "hit_window": (start, end_excl - 1, peak),
+            "segment": (seg_start, seg_end_excl - 1),
+        })
+    return strokes
+
+
+def contact_height_variance(contact_heights: List[float]) -> float:
+    """Set-level metric for strokes of one action; needs at least two strokes."""
+    spread = float(np.std(contact_heights)) * CONTACT_SPREAD_SCALE
+    return float(np.clip(spread, 0.0, 1.0))
+
+
+def aggregate_strokes(strokes: List[Dict[str, Any]], scored_metrics: Dict[str, List[str]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-action aggregates of scored strokes: count, score and per-metric mean/std,
+    and a consistency score (1 - 2 * mean std of the action's `scored_metrics`,
+    so 1.0 is a perfectly repeated stroke; None for a single stroke).
+    """
+    by_action: Dict[str, List[Dict[str, Any]]] = {}
+    for stroke in strokes:
+        by_action.setdefault(stroke["action"], []).append(stroke)
+
+    summary = {}
+    for action, group in by_action.items():
+        names = sorted(group[0]["metrics"])
+        values = np.array([[s["metrics"].get(name, 0.0) for name in names] for s in group], dtype=np.float64)
+        scores = np.array([s["score"] for s in group], dtype=np.float64)
+        means = values.mean(axis=0)
+        stds = values.std(axis=0)
+        scored = [i for i, name in enumerate(names) if name in scored_metrics.get(action, names)]
+        summary[action] = {
+            "count": len(group),
+            "score_mean": round(float(scores.mean()), 1),
+            "score_std": round(float(scores.std()), 1),
+            "metrics": {name: {"mean": round(float(m), 3), "std": round(float(s), 3)}
+                        for name, m, s in zip(names, means, stds)},
+            "consistency": round(float(np.clip(1.0 - 2.0 * stds[scored].mean(), 0.0, 1.0)), 3)
+                           if len(group) > 1 and scored else None,
+        }
+    return summary
@@ -0,0 +1,73 @@
+import os
+import logging
+import numpy as np
+from typing import Optional, Tuple
+
+from .landmarks import LandmarkTrack, JOINTS, CHANNELS
+
+logger = logging.getLogger(__name__)
+
+# Bump if the on-disk layout changes
+TRACK_FORMAT_VERSION = 1
+
+
+class TrackStore:
+    """
+    Persists extracted landmark tracks so analyses can be re-scored without the video.
+
+    One compressed `.npz` per task (a few KB for a typical clip), sharded into
+    sub-directories by the first two characters of the task id so directories
+    stay small with hundreds of thousands of tasks.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, task_id: str) -> str:
+        name = os.path.basename(task_id)
+        return os.path.join(self.root, name[:2], f"{name}.npz")
+
+    def exists(self, task_id: str) -> bool:
+        return os.path.exists(self.path(task_id))
+
+    def save(self, task_id: str, track: LandmarkTrack, fps: float) -> str:
+        path = self.path(task_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so readers never see a truncated archive
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                data=np.ascontiguousarray(track.data, dtype=np.float32),
+                frame_indices=np.ascontiguousarray(track.frame_indices, dtype=np.int64),
+                fps=np.float64(fps),
+                version=np.int32(TRACK_FORMAT_VERSION),
+            )
+        os.replace(tmp_path, path)
+        return path
+
+    def load(self, task_id: str) -> Optional[Tuple[LandmarkTrack, float]]:
+        """Returns (track, fps), or None if no track was stored for the task."""
+        path = self.path(task_id)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as archive:
+            version = int(archive["version"])
+            if version != TRACK_FORMAT_VERSION:
+                raise ValueError(f"Unsupported track format {version} in {path}")
+            data = archive["data"]
+            if data.ndim != 3 or data.shape[1:] != (len(JOINTS), CHANNELS):
+                raise ValueError(f"Unexpected track shape {data.shape} in {path}")
+            track = LandmarkTrack.from_arrays(data, archive["frame_indices"])
+            fps = float(archive["fps"])
+        return track, fps
+
+    def delete(self, task_id: str):
+        try:
+            os.remove(self.path(task_id))
+        except FileNotFoundError:
+            pass
+
+
+# Shared store; LANDMARK_DIR is relative to the working directory like uploads/
+track_store = TrackStore(os.getenv("LANDMARK_DIR", "landmarks"))
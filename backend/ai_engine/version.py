@@ -0,0 +1,49 @@
+import os
+import json
+import hashlib
+
+from .pose_backends import backend_fingerprint
+from .profiles import ANALYSIS_PROFILES
+
+# Bump when metric extraction or scoring code changes in a way that alters results
+ENGINE_VERSION = "3"
+
+_CONFIG_FILES = (
+    "rules/issue_rules.json",
+    "thresholds/level_thresholds.json",
+    "config/action_scoring_config.json",
+)
+
+_fingerprint = None
+
+def analysis_version() -> str:
+    """
+    Identifies everything that determines an analysis result besides the video:
+    engine code version, rule/threshold/scoring configs, the definition of the
+    analysis profile and its pose backend's model.
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        hasher = hashlib.sha256(ENGINE_VERSION.encode())
+        base_path = os.path.dirname(os.path.abspath(__file__))
+        for relative_path in _CONFIG_FILES:
+            try:
+                with open(os.path.join(base_path, relative_path), "rb") as f:
+                    hasher.update(f.read())
+            except FileNotFoundError:
+                hasher.update(b"missing:" + relative_path.encode())
+        profile = os.getenv("ANALYSIS_PROFILE", "full")
+        if profile in ANALYSIS_PROFILES:
+            # The definition, not just the name: retuning a profile changes its results
+            definition = ANALYSIS_PROFILES[profile]
+            hasher.update(json.dumps(definition.model_dump(), sort_keys=True).encode())
+            # Landmarks depend on the model file of the backend
+            hasher.update(backend_fingerprint(definition.pose_backend).encode())
+        else:
+            hasher.update(profile.encode())
+        _fingerprint = f"v{ENGINE_VERSION}-{hasher.hexdigest()[:12]}"
+    return _fingerprint
+
+def analysis_cache_key(content_sha256: str) -> str:
+    """Cache key of an analysis result: video content hash plus analysis version."""
+    return f"{content_sha256}:{analysis_version()}"
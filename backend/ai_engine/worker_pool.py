@@ -0,0 +1,218 @@
+import os
+import math
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .profiling import REGISTRY, StageTimer, enable_trace_logging, format_stage_totals, trace
+
+logger = logging.getLogger(__name__)
+
+# --- Worker process side ---
+
+_worker_service = None
+_progress_queue = None
+
+# Minimum seconds between progress messages of one task (stage changes are always sent)
+PROGRESS_INTERVAL = 0.5
+
+ANALYSIS_SECONDS = REGISTRY.histogram("shuttlecoach_analysis_seconds", "Duration of analyze_video in the workers")
+
+def _init_worker(progress_queue=None):
+    """Build and warm up this process's own analysis service (and its pose model)."""
+    global _worker_service, _progress_queue
+    enable_trace_logging()
+    from .service import analysis_service
+    analysis_service.processor.warmup()
+    _worker_service = analysis_service
+    _progress_queue = progress_queue
+    logger.info(f"Analysis worker {os.getpid()} ready")
+
+class _ProgressReporter:
+    """Forwards a task's stage updates to the parent process, throttled."""
+    def __init__(self, task_id: str, queue):
+        self.task_id = task_id
+        self.queue = queue
+        self._last_stage = None
+        self._last_sent = 0.0
+
+    def __call__(self, stage: str, fraction: Optional[float], detail: Dict[str, int]):
+        now = time.monotonic()
+        if stage == self._last_stage and now - self._last_sent < PROGRESS_INTERVAL:
+            return
+        self._last_stage, self._last_sent = stage, now
+        self.queue.put((self.task_id, stage, fraction, detail))
+
+def _run_analysis(video_path: str, action_type: Optional[str], level_assumption: str,
+                  task_id: Optional[str] = None) -> Tuple[dict, Dict[str, Any]]:
+    """Returns the result and this task's telemetry: the metrics recorded meanwhile and the stage totals."""
+    progress = _ProgressReporter(task_id, _progress_queue) if task_id and _progress_queue is not None else None
+    with trace(task_id), StageTimer() as timer:
+        started = time.perf_counter()
+        # Rule-based feedback only: the LLM stage runs after the task completed (see backend.worker.EnrichmentWorker)
+        result = _worker_service.analyze_video(video_path, action_type=action_type, level_assumption=level_assumption,
+                                               task_id=task_id, progress=progress, use_llm=False)
+        ANALYSIS_SECONDS.observe(time.perf_counter() - started)
+    return result, {"metrics": REGISTRY.drain(), "stages": timer.totals()}
+
+def _noop() -> int:
+    return os.getpid()
+
+# --- API process side ---
+
+class PoolSaturated(Exception):
+    """Raised when the pool's bounded queue is full."""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Analysis queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class AnalysisWorkerPool:
+    """
+    Process pool where each worker owns a warmed-up VideoProcessor / Pose instance.
+
+    At most `workers` analyses run at once and at most `max_pending` more wait in
+    the queue; beyond that `submit` raises PoolSaturated so callers can apply
+    backpressure (e.g. HTTP 503 with Retry-After).
+    Workers are started with the `spawn` method: MediaPipe graphs and their
+    threads must not be inherited through fork. The metrics a worker records
+    for a task come back with its result and are merged into this process's
+    registry.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending if max_pending is not None else self.workers * 2
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        # Exponential moving average of task duration, used for Retry-After
+        self._avg_task_seconds = 30.0
+        # See set_progress_handler
+        self._on_progress = None
+        self._progress_queue = None
+        self._progress_thread: Optional[threading.Thread] = None
+
+    def set_progress_handler(self, handler: Callable[[str, str, Optional[float], Dict[str, int]], None]):
+        """
+        Receive (task_id, stage, fraction, detail) updates from the workers.
+        Workers put them on a multiprocessing queue handed over at spawn time and a
+        listener thread calls `handler` in this process. Must be set before start().
+        """
+        if self._executor is not None:
+            raise RuntimeError("Progress handler must be set before the pool is started")
+        self._on_progress = handler
+        if self._progress_queue is None:
+            self._progress_queue = multiprocessing.get_context("spawn").Queue()
+
+    def start(self, warm: bool = True):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            if self._progress_queue is not None and self._progress_thread is None:
+                self._progress_thread = threading.Thread(target=self._progress_loop, name="pool-progress", daemon=True)
+                self._progress_thread.start()
+        if warm:
+            # One task per worker forces every process to spawn and load its model now
+            for f in [self._executor.submit(_noop) for _ in range(self.workers)]:
+                f.result()
+        logger.info(f"Analysis pool started: {self.workers} workers, queue size {self.max_pending}")
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        with self._lock:
+            thread, self._progress_thread = self._progress_thread, None
+        if thread is not None:
+            self._progress_queue.put(None)  # Stops the listener
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._progress_queue,),
+        )
+
+    def _progress_loop(self):
+        while True:
+            message = self._progress_queue.get()
+            if message is None:
+                return
+            try:
+                self._on_progress(*message)
+            except Exception as e:
+                logger.error(f"Progress callback failed: {e}")
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def has_capacity(self) -> bool:
+        return self._in_flight < self.workers + self.max_pending
+
+    def estimate_wait(self, waiting: int) -> int:
+        """Rough seconds until `waiting` queued analyses have been started."""
+        return max(1, math.ceil(self._avg_task_seconds * waiting / self.workers))
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queue slot frees up."""
+        return self.estimate_wait(max(0, self._in_flight - self.workers + 1))
+
+    def submit(self, video_path: str, action_type: Optional[str] = None, level_assumption: str = "beginner",
+               task_id: Optional[str] = None) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated(self.retry_after())
+        with self._lock:
+            self._in_flight += 1
+        started = time.monotonic()
+
+        try:
+            inner = self._submit(video_path, action_type, level_assumption, task_id)
+        except Exception:
+            self._release(None)
+            raise
+
+        # Callers get the bare result; the telemetry is consumed here
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+        inner.add_done_callback(lambda done: self._complete(future, done, task_id, time.monotonic() - started))
+        return future
+
+    def _complete(self, future: Future, done: Future, task_id: Optional[str], duration: float):
+        self._release(duration)
+        try:
+            result, telemetry = done.result()
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        REGISTRY.merge(telemetry["metrics"])
+        with trace(task_id):
+            logger.info(f"Analysis stages: {format_stage_totals(telemetry['stages'])}")
+        future.set_result(result)
+
+    def _submit(self, video_path: str, action_type: Optional[str], level_assumption: str, task_id: Optional[str]) -> Future:
+        if self._executor is None:
+            self.start(warm=False)
+        try:
+            return self._executor.submit(_run_analysis, video_path, action_type, level_assumption, task_id)
+        except BrokenProcessPool:
+            # A worker died (e.g. native crash); replace the pool and retry once
+            logger.error("Analysis pool broken, restarting workers")
+            with self._lock:
+                broken, self._executor = self._executor, self._create_executor()
+            broken.shutdown(wait=False, cancel_futures=True)
+            return self._executor.submit(_run_analysis, video_path, action_type, level_assumption, task_id)
+
+    def _release(self, duration: Optional[float]):
+        with self._lock:
+            self._in_flight -= 1
+            if duration is not None:
+                self._avg_task_seconds = 0.8 * self._avg_task_seconds + 0.2 * duration
+        self._slots.release()
@@ -0,0 +1,201 @@
+"""
+HTTP load test of the API endpoints under concurrency.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_api [--concurrency 1 16 64] [--requests 400]
+    python -m backend.benchmarks.bench_api --url http://127.0.0.1:8000   # an already running server
+
+Without --url, a uvicorn server is started in a temporary directory with a
+fresh database seeded with `--seed` completed tasks, the local fake Gemini
+server as the LLM (`--llm-latency` seconds per request) and no embedded queue
+worker (`--with-worker` adds one; it then analyzes the uploads too).
+With --url, the task ids come from the server's /api/history.
+
+Endpoints (`--endpoints`):
+- upload:  POST /api/upload with a generated clip. A few random bytes are
+  appended each time, so no upload is a duplicate.
+- result:  GET /api/result/{task_id} of a random completed task.
+- history: GET /api/history (first page).
+- chat:    POST /api/chat about a completed task (one task per request,
+  round-robin, so requests do not queue behind one session).
+For each concurrency level it prints the requests/sec, latency percentiles
+and the errors by status code.
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+from backend.benchmarks.bench_pipeline import ensure_clips
+from backend.benchmarks.fake_llm import FakeLLMServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ENDPOINTS = ["upload", "result", "history", "chat"]
+CHAT_MESSAGE = "How can I hit the shuttle earlier?"
+
+
+def seed_database(workdir: str, n: int) -> List[str]:
+    """Completed tasks with rule-based results for random metrics, in workdir/shuttlecoach.db."""
+    os.chdir(workdir)
+    from backend.ai_engine.analyzer import ActionAnalyzer
+    from backend.database import db
+
+    analyzer = ActionAnalyzer()
+    rng = np.random.default_rng(0)
+    actions = list(analyzer.rule_set.actions)
+    task_ids = []
+    for i in range(n):
+        action = actions[i % len(actions)]
+        metrics = {name: round(float(rng.uniform(0, 1)), 2) for name in analyzer.rule_set[action].columns}
+        task_id = str(uuid.uuid4())
+        db.create_task(task_id, f"uploads/{task_id}_seed.mp4")
+        db.update_task_result(task_id, analyzer.analyze(action, metrics, use_llm=False).model_dump())
+        task_ids.append(task_id)
+    db.close()
+    os.chdir(ROOT)
+    return task_ids
+
+
+def start_server(workdir: str, port: int, llm_url: str, with_worker: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT,
+        "GEMINI_API_KEY": "fake",
+        "GEMINI_BASE_URL": llm_url,
+        "FEEDBACK_CACHE_MAX_ENTRIES": "0",
+        "EMBEDDED_WORKER": "1" if with_worker else "0",
+        # Measure the endpoints, not the queue-full rejection
+        "ANALYSIS_QUEUE_SIZE": "1000000",
+    })
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_ready(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(f"{url}/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server at {url} did not start (see server.log)")
+            await asyncio.sleep(0.2)
+
+
+async def fetch_task_ids(client: httpx.AsyncClient, url: str) -> List[str]:
+    response = await client.get(f"{url}/api/history", params={"limit": 100})
+    response.raise_for_status()
+    return [item["task_id"] for item in response.json()["items"]]
+
+
+def make_request(endpoint: str, url: str, task_ids: List[str], clip: bytes, i: int):
+    """(method, url, request kwargs) of the i-th request to an endpoint."""
+    if endpoint == "upload":
+        data = clip + os.urandom(16)
+        return "POST", f"{url}/api/upload", {"files": {"file": (f"bench_{i}.mp4", data, "video/mp4")}}
+    if endpoint == "result":
+        return "GET", f"{url}/api/result/{random.choice(task_ids)}", {}
+    if endpoint == "history":
+        return "GET", f"{url}/api/history", {"params": {"limit": 20}}
+    if endpoint == "chat":
+        body = {"task_id": task_ids[i % len(task_ids)], "message": CHAT_MESSAGE, "language": "en"}
+        return "POST", f"{url}/api/chat", {"json": body}
+    raise ValueError(endpoint)
+
+
+async def load(endpoint: str, url: str, task_ids: List[str], clip: bytes, requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = iter(range(requests))
+
+    async def client_loop(client: httpx.AsyncClient):
+        for i in counter:
+            method, target, kwargs = make_request(endpoint, url, task_ids, clip, i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, target, **kwargs)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120.0, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {"latencies": latencies, "statuses": statuses, "elapsed": elapsed}
+
+
+async def run(args, url: str, task_ids: List[str], clip: bytes):
+    async with httpx.AsyncClient() as client:
+        task_ids = task_ids or await fetch_task_ids(client, url)
+    if not task_ids and set(args.endpoints) & {"result", "chat"}:
+        raise SystemExit("No completed tasks on the server to query (result/chat need some)")
+
+    print(f"{'endpoint':<8} | {'conc':>4} | {'reqs':>5} | {'req/s':>7} | {'p50 ms':>7} | {'p95 ms':>7} | "
+          f"{'p99 ms':>7} | {'max ms':>7} | errors")
+    for endpoint in args.endpoints:
+        for concurrency in args.concurrency:
+            out = await load(endpoint, url, task_ids, clip, args.requests, concurrency)
+            ms = np.array(out["latencies"]) * 1000
+            errors = {code: count for code, count in out["statuses"].items() if code != 200}
+            print(f"{endpoint:<8} | {concurrency:>4} | {len(ms):>5} | {len(ms) / out['elapsed']:>7.1f} | "
+                  f"{np.percentile(ms, 50):>7.1f} | {np.percentile(ms, 95):>7.1f} | {np.percentile(ms, 99):>7.1f} | "
+                  f"{ms.max():>7.1f} | {errors or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Test a running server instead of starting one')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint and concurrency level')
+    parser.add_argument('--clip', default='640x360@30:4', help='Uploaded clip, WIDTHxHEIGHT@FPS:SECONDS')
+    parser.add_argument('--seed', type=int, default=200, help='Completed tasks in the fresh database')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='Seconds per fake Gemini request')
+    parser.add_argument('--with-worker', action='store_true', help='Run the embedded analysis worker')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_api_") as workdir:
+        clip_path = next(iter(ensure_clips([args.clip], os.path.join(workdir, "clips")).values()))
+        with open(clip_path, "rb") as f:
+            clip = f.read()
+
+        if args.url:
+            asyncio.run(run(args, args.url.rstrip("/"), [], clip))
+            return
+
+        llm = FakeLLMServer(latency=args.llm_latency).start()
+        task_ids = seed_database(workdir, args.seed)
+        server = start_server(workdir, args.port, llm.url, args.with_worker)
+        url = f"http://127.0.0.1:{args.port}"
+        try:
+            asyncio.run(wait_ready(url))
+            asyncio.run(run(args, url, task_ids, clip))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            llm.stop()
+
+
+if __name__ == '__main__':
+    main()
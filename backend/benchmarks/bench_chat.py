@@ -0,0 +1,82 @@
+"""
+Chat cost as a conversation grows: stateless history replay vs server-side sessions.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_chat [--turns 60] [--budget 2000]
+
+Both modes talk to the local fake Gemini server (0.1 s to first token). The
+stateless mode is the old /api/chat contract: the client sends its whole
+history and the full prompt is rebuilt for every message. The session mode
+keeps the prebuilt context and a token-budgeted history on the server and
+streams the reply. Reported per turn: upstream request size, client payload
+size, time to first chunk and total reply time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from backend.benchmarks.fake_llm import FakeLLMServer
+
+RESULT = {
+    "action": "smash", "score": 72,
+    "issues": [{"tag": "low_contact", "coach_tip": {"en": "Hit the shuttle at the highest point.", "zh": "在最高点击球。"}}],
+}
+QUESTION = "How should I change my grip and footwork to get a higher contact point on my smash?"
+
+
+async def stateless(coach, turns: int, server):
+    rows, history = [], []
+    for _ in range(turns):
+        payload = len(json.dumps({"message": QUESTION, "history": history}))
+        started = time.perf_counter()
+        reply = await coach.chat_with_coach_async(RESULT, QUESTION, history, "en")
+        total = time.perf_counter() - started
+        history += [{"role": "user", "content": QUESTION}, {"role": "model", "content": reply}]
+        rows.append((server.last_request_bytes, payload, total, total))
+    return rows
+
+
+async def sessions(coach, turns: int, server, budget: int):
+    from backend.chat_sessions import ChatSessions
+    store = ChatSessions(coach, history_tokens=budget)
+    session = store.create("bench", "en", RESULT)
+    rows = []
+    for _ in range(turns):
+        payload = len(json.dumps({"message": QUESTION}))
+        started = time.perf_counter()
+        first = None
+        async for _ in store.send(session, QUESTION):
+            first = first or time.perf_counter() - started
+        rows.append((server.last_request_bytes, payload, first, time.perf_counter() - started))
+    return rows
+
+
+def report(name: str, rows):
+    print(f"\n{name}")
+    print(f"{'turn':>5} | {'upstream B':>10} | {'client B':>8} | {'first ms':>8} | {'total ms':>8}")
+    for turn in sorted({1, 10, 25, len(rows) // 2, len(rows)}):
+        upstream, payload, first, total = rows[turn - 1]
+        print(f"{turn:>5} | {upstream:>10} | {payload:>8} | {first * 1000:>8.0f} | {total * 1000:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=60)
+    parser.add_argument('--budget', type=int, default=2000, help='CHAT_HISTORY_TOKENS')
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=0.1).start()
+    os.environ.update({"GEMINI_API_KEY": "fake", "GEMINI_BASE_URL": server.url})
+    from backend.ai_engine.llm_client import GeminiCoach
+
+    coach = GeminiCoach()
+    report("stateless (history replayed)", asyncio.run(stateless(coach, args.turns, server)))
+    report(f"sessions (budget {args.budget} tokens, streamed)", asyncio.run(sessions(coach, args.turns, server, args.budget)))
+    coach.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
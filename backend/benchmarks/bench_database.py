@@ -0,0 +1,178 @@
+"""
+Load benchmark: connection-per-call rollback-journal SQLite vs the pooled WAL layer.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_database [--threads 1 8 32] [--tasks 200] [--history 2000]
+
+Each simulated client creates a task, polls its status a few times, stores a
+result and reads it back, with a history page every few tasks, mirroring the
+API's access pattern (the legacy layer runs the original SELECT * history
+query, the pooled layer the keyset-paginated summary query). Both layers run against fresh database files in a temp
+directory pre-filled with `--history` completed tasks.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+import backend.database as database
+
+POLLS_PER_TASK = 5
+HISTORY_EVERY = 10
+
+
+class LegacyDatabase:
+    """The original access pattern: a new connection per call, default journal, no status index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        conn = sqlite3.connect(path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_tasks (
+                task_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                video_path TEXT,
+                result_json TEXT,
+                error_message TEXT
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def create_task(self, task_id: str, video_path: str):
+        conn = sqlite3.connect(self.path)
+        conn.execute("INSERT INTO analysis_tasks (task_id, status, video_path) VALUES (?, ?, ?)", (task_id, "queued", video_path))
+        conn.commit()
+        conn.close()
+
+    def update_task_result(self, task_id: str, result: Dict[str, Any]):
+        conn = sqlite3.connect(self.path)
+        conn.execute("UPDATE analysis_tasks SET status = ?, result_json = ? WHERE task_id = ?", ("completed", json.dumps(result), task_id))
+        conn.commit()
+        conn.close()
+
+    def get_task(self, task_id: str):
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM analysis_tasks WHERE task_id = ?", (task_id,)).fetchone()
+        conn.close()
+        if row:
+            task = dict(row)
+            task['result'] = json.loads(task['result_json']) if task['result_json'] else None
+            return task
+        return None
+
+    get_task_status = get_task
+
+    def get_history(self, limit: int = 20) -> list:
+        """The original history query: whole rows (result JSON included), newest first."""
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT * FROM analysis_tasks WHERE status = 'completed' ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+
+def open_pooled(path: str) -> database.Database:
+    database.DB_PATH = path
+    return database.Database()
+
+
+def sample_result() -> Dict[str, Any]:
+    """A result of realistic size (images are blob references)."""
+    return {
+        "action": "smash", "level_assumption": "beginner", "score": 72,
+        "metrics": {f"metric_{i}": 0.5 for i in range(8)},
+        "issues": [{"tag": "contact_point_low", "level": "warning",
+                    "coach_tip": {"zh": "击球点太低" * 5, "en": "Contact point is too low " * 5},
+                    "suggestion": {"zh": "抬高手肘" * 5, "en": "Raise the elbow " * 5}}] * 3,
+        "positive_feedback": {"zh": "不错" * 20, "en": "Good job " * 20},
+        "next_training_focus": [{"zh": "练习" * 10, "en": "Practice " * 10}] * 2,
+        "keyframe_image": {"blob_id": "0" * 64, "url": "/api/blobs/" + "0" * 64, "thumbnail_url": "/api/blobs/" + "1" * 64},
+    }
+
+
+def prefill(db, n: int):
+    result = sample_result()
+    for _ in range(n):
+        task_id = str(uuid.uuid4())
+        db.create_task(task_id, "video.mp4")
+        db.update_task_result(task_id, result)
+
+
+def run_load(db, threads: int, tasks_per_thread: int) -> Dict[str, float]:
+    result = sample_result()
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client(worker: int):
+        nonlocal errors
+        local_latencies = []
+        local_errors = 0
+        for i in range(tasks_per_thread):
+            task_id = str(uuid.uuid4())
+            calls = [lambda: db.create_task(task_id, "video.mp4")]
+            calls += [lambda: db.get_task_status(task_id)] * POLLS_PER_TASK
+            calls += [lambda: db.update_task_result(task_id, result), lambda: db.get_task(task_id)]
+            if i % HISTORY_EVERY == 0:
+                calls.append(lambda: db.get_history(limit=20))
+            for call in calls:
+                started = time.perf_counter()
+                try:
+                    call()
+                except sqlite3.OperationalError:
+                    local_errors += 1
+                local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(client, range(threads)))
+    elapsed = time.perf_counter() - started
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--tasks', type=int, default=200, help='Tasks in total, split across the threads')
+    parser.add_argument('--history', type=int, default=2000, help='Completed tasks already in the database')
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'layer':>8} {'ops/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in args.threads:
+            for name, factory in (("legacy", LegacyDatabase), ("pooled", open_pooled)):
+                db = factory(os.path.join(tmp, f"{name}_{threads}.db"))
+                prefill(db, args.history)
+                stats = run_load(db, threads, max(1, args.tasks // threads))
+                print(f"{threads:>8} {name:>8} {stats['ops_per_sec']:>10.0f} {stats['p50_ms']:>8.2f} "
+                      f"{stats['p95_ms']:>8.2f} {stats['errors']:>7}")
+                if hasattr(db, "close"):
+                    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Feedback cache: hit ratio and saved tokens/latency on a stream of similar analyses.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_feedback_cache [--requests 300] [--buckets 0 0.02 0.05 0.1]
+
+Simulates players repeating the same few strokes: each request picks an action
+and issue set from a small pool and jitters a base metric vector by --noise.
+Requests go through GeminiCoach to the local fake Gemini server (0.3 s latency)
+with a fresh cache per bucket size (0 = cache disabled) and report the hit ratio,
+tokens sent upstream and total wall time. Image policy is whatever LLM_IMAGE_POLICY says.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from backend.benchmarks.fake_llm import FakeLLMServer
+
+ACTIONS = {
+    "smash": {"contact_height": 0.8, "elbow_extension": 0.7, "torso_rotation": 0.6},
+    "clear": {"contact_height": 0.7, "elbow_extension": 0.8, "torso_rotation": 0.5},
+    "lift": {"knee_bend": 0.5, "racket_path": 0.6},
+}
+ISSUE_SETS = [[], ["low_contact"], ["low_contact", "no_rotation"]]
+# A stand-in keyframe; only its size matters to the fake server's token count
+FAKE_JPEG = "data:image/jpeg;base64," + "A" * 4000
+
+
+async def run(coach, n: int, noise: float, seed: int):
+    from backend.ai_engine.models import Issue
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        action = str(rng.choice(list(ACTIONS)))
+        tags = ISSUE_SETS[rng.integers(len(ISSUE_SETS))]
+        metrics = {k: float(np.clip(v + rng.normal(0, noise), 0, 1)) for k, v in ACTIONS[action].items()}
+        issues = [Issue(tag=t, level="warning", coach_tip={"en": t}, suggestion={"en": t}) for t in tags]
+        await coach.generate_feedback_async(action, 70, metrics, issues, None, [FAKE_JPEG] * 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--buckets', type=float, nargs='+', default=[0, 0.02, 0.05, 0.1])
+    parser.add_argument('--noise', type=float, default=0.02, help='Std of the metric jitter between requests')
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=0.3).start()
+    os.environ.update({"GEMINI_API_KEY": "fake", "GEMINI_BASE_URL": server.url})
+    from backend import database
+    from backend.ai_engine import llm_client
+    from backend.ai_engine.feedback_cache import FeedbackCache
+    from backend.ai_engine.profiling import REGISTRY
+
+    print(f"{'bucket':>6} | {'hit rate':>8} | {'upstream':>8} | {'tokens sent':>11} | {'tokens saved':>12} | {'wall s':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for bucket in args.buckets:
+            # Bucket 0 stands for no cache: max_entries=0 disables it
+            database.DB_PATH = os.path.join(tmp, f"cache_{bucket}.db")
+            cache = FeedbackCache(database.Database(), bucket=bucket or 0.05, max_entries=10000 if bucket else 0)
+            llm_client.feedback_cache = cache
+            # Cache counters are per process: start each run from zero
+            REGISTRY.drain()
+            coach = llm_client.GeminiCoach()
+            server.requests = 0
+            started = time.perf_counter()
+            asyncio.run(run(coach, args.requests, args.noise, seed=0))
+            elapsed = time.perf_counter() - started
+            coach.close()
+            stats = cache.stats() if cache.enabled else {"hit_rate": 0.0, "tokens_saved": 0}
+            cache.database.close()
+            sent = stats.get("tokens_spent", "-")
+            print(f"{bucket:>6} | {stats['hit_rate']:>8.1%} | {server.requests:>8} | {sent:>11} | "
+                  f"{stats['tokens_saved']:>12} | {elapsed:>6.1f}")
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
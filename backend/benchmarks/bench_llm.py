@@ -0,0 +1,95 @@
+"""
+LLM client resilience: deadlines, retries, concurrency limit and circuit breaker
+against the local fake Gemini server.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_llm [--requests 40] [--timeout 2.0] [--concurrency 4]
+
+Each scenario fires `--requests` feedback calls at once from one event loop and
+reports call latency, the latency of a second burst fired right after (fast
+failure once the breaker is open), how many fell back to rule-based feedback, how many
+requests reached the upstream, how often the breaker opened and the worst
+event loop stall seen by a 10 ms ticker running alongside (the old synchronous
+client stalled the loop for the whole round trip).
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from backend.benchmarks.fake_llm import FakeLLMServer
+
+# name: (latency, jitter, error_rate)
+SCENARIOS = {
+    "healthy": (0.2, 0.1, 0.0),
+    "flaky": (0.2, 0.1, 0.3),
+    "slow": (5.0, 0.0, 0.0),
+    "down": (0.05, 0.0, 1.0),
+}
+
+
+async def measure_lag(stop: asyncio.Event) -> float:
+    worst = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + 0.01
+        await asyncio.sleep(0.01)
+        worst = max(worst, loop.time() - expected)
+    return worst
+
+
+async def run_scenario(coach, n: int):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    latencies = []
+
+    async def one():
+        started = time.perf_counter()
+        result = await coach.generate_feedback_async("smash", 70, {"contact_height": 0.5}, [], None)
+        latencies.append(time.perf_counter() - started)
+        return result
+
+    results = await asyncio.gather(*(one() for _ in range(n)))
+    first = list(latencies)
+    latencies.clear()
+    results += await asyncio.gather(*(one() for _ in range(n)))
+    stop.set()
+    lag = await ticker
+    return first, latencies, sum(r is None for r in results), lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--timeout', type=float, default=2.0, help='Per-call deadline (LLM_FEEDBACK_TIMEOUT)')
+    parser.add_argument('--concurrency', type=int, default=4, help='LLM_MAX_CONCURRENCY')
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS))
+    args = parser.parse_args()
+
+    server = FakeLLMServer().start()
+    # The client reads its configuration at import time
+    os.environ.update({
+        "GEMINI_API_KEY": "fake", "GEMINI_BASE_URL": server.url,
+        "LLM_FEEDBACK_TIMEOUT": str(args.timeout), "LLM_MAX_CONCURRENCY": str(args.concurrency),
+        # Identical requests would all be cache hits (see bench_feedback_cache)
+        "FEEDBACK_CACHE_MAX_ENTRIES": "0",
+    })
+    from backend.ai_engine.llm_client import GeminiCoach
+
+    print(f"{'scenario':<9} | {'p50 s':>6} | {'p95 s':>6} | {'max s':>6} | {'2nd p50':>7} | {'fallback':>8} | {'upstream':>8} | {'opened':>6} | {'loop lag ms':>11}")
+    for name in args.scenarios:
+        server.configure(*SCENARIOS[name])
+        server.requests = 0
+        # Fresh client per scenario: the breaker must not carry over
+        coach = GeminiCoach()
+        latencies, second, fallbacks, lag = asyncio.run(run_scenario(coach, args.requests))
+        print(f"{name:<9} | {np.percentile(latencies, 50):>6.2f} | {np.percentile(latencies, 95):>6.2f} | "
+              f"{max(latencies):>6.2f} | {np.percentile(second, 50):>7.2f} | {fallbacks:>8} | {server.requests:>8} | {coach.breaker.times_opened:>6} | {lag * 1000:>11.1f}")
+        coach.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
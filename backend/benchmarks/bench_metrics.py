@@ -0,0 +1,158 @@
+"""
+Micro-benchmark: legacy per-frame metric loops vs the vectorized Kinematics stage.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_metrics [--frames 1000 10000 100000] [--repeat 3]
+
+The legacy implementation below reproduces the original processor loops over a
+list of per-frame landmark dicts, so both paths see identical synthetic input.
+"""
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from backend.ai_engine.landmarks import JOINTS, LandmarkTrack
+from backend.ai_engine.kinematics import Kinematics
+from backend.ai_engine.processor import VideoProcessor
+
+ACTIONS = ('smash', 'drop', 'lift', 'net_shot')
+
+
+class _Point:
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x: float, y: float):
+        self.x = x
+        self.y = y
+
+
+def make_track(n_frames: int, seed: int = 0) -> LandmarkTrack:
+    """Random-walk skeleton with one fast overhead swing in the middle."""
+    rng = np.random.default_rng(seed)
+    data = np.zeros((n_frames, len(JOINTS), 4), dtype=np.float32)
+    data[..., :2] = 0.5 + np.cumsum(rng.normal(0, 0.002, (n_frames, len(JOINTS), 2)), axis=0)
+    data[:, JOINTS.index('nose'), 1] -= 0.3
+    data[:, JOINTS.index('right_ankle'), 1] += 0.3
+    data[:, JOINTS.index('left_ankle'), 1] += 0.3
+    swing = np.sin(np.linspace(0, np.pi, min(30, n_frames)))
+    mid = n_frames // 2 - len(swing) // 2
+    data[mid:mid + len(swing), JOINTS.index('right_wrist'), 1] -= 0.4 * swing
+    data[..., 3] = 1.0
+
+    track = LandmarkTrack(capacity=n_frames)
+    for i in range(n_frames):
+        track.append(i, data[i])
+    return track
+
+
+def to_legacy_history(track: LandmarkTrack) -> List[Dict[str, _Point]]:
+    data = track.data
+    return [
+        {name: _Point(float(data[i, j, 0]), float(data[i, j, 1])) for j, name in enumerate(JOINTS)}
+        for i in range(len(track))
+    ]
+
+
+# --- Legacy per-frame implementation (reference) ---
+
+def _dist(a, b) -> float:
+    return np.sqrt((a.x - b.x)**2 + (a.y - b.y)**2)
+
+
+def legacy_feature_pass(history: List[Dict], fps: float) -> Dict[str, float]:
+    body_heights = []
+    for frame in history:
+        h = abs((frame['right_ankle'].y + frame['left_ankle'].y) / 2 - frame['nose'].y)
+        if h > 0.05: body_heights.append(h)
+    clip_height = float(np.mean(body_heights)) if body_heights else 0.5
+
+    reach, vels, downs, wrist_ys = [], [], [], []
+    for i, frame in enumerate(history):
+        min_wrist_y = min(frame['right_wrist'].y, frame['left_wrist'].y)
+        wrist_ys.append(min_wrist_y)
+        reach.append((frame['nose'].y - min_wrist_y) / clip_height)
+        if i > 0:
+            vels.append(_dist(frame['right_wrist'], history[i-1]['right_wrist']) / clip_height)
+            downs.append((frame['right_wrist'].y - history[i-1]['right_wrist'].y) / clip_height)
+    features = {
+        'max_reach': max(reach), 'max_velocity': max(vels) if vels else 0.0,
+        'max_downward_velocity': max(downs) if downs else 0.0,
+        'y_variance': float(np.var([y / clip_height for y in wrist_ys])),
+    }
+
+    velocities = [_dist(history[i]['right_wrist'], history[i-1]['right_wrist']) for i in range(1, len(history))]
+    peak = int(np.argmax(velocities) + 1) if velocities else 0
+    start, end = max(0, peak - 15), min(len(history) - 1, peak + 15)
+    window = history[start:end+1]
+
+    heights = []
+    for frame in window:
+        h = abs((frame['right_ankle'].y + frame['left_ankle'].y) / 2 - frame['nose'].y)
+        if h > 0.1: heights.append(h)
+    bh = float(np.mean(heights)) if heights else 0.5
+
+    total = 0.0
+    for i in range(1, len(window)):
+        total += _dist(window[i]['right_wrist'], window[i-1]['right_wrist'])
+    widths = [_dist(f['right_shoulder'], f['left_shoulder']) for f in window]
+    max_down = 0.0
+    max_step = 0.0
+    for i in range(start, end):
+        max_down = max(max_down, (history[i+1]['right_wrist'].y - history[i]['right_wrist'].y) * fps)
+        max_step = max(max_step, _dist(history[i+1]['right_wrist'], history[i]['right_wrist']))
+    nose_var = np.var([f['nose'].x for f in window]) + np.var([f['nose'].y for f in window])
+    elbow_var = np.var([_dist(f['right_elbow'], f['right_shoulder']) for f in window])
+    features.update({
+        'swing_path': total / bh, 'rotation': 1.0 - min(widths) / (max(widths) + 0.001),
+        'downward': max_down / bh, 'max_step': max_step / bh,
+        'nose_std': float(np.sqrt(nose_var)) / bh, 'elbow_std': float(np.sqrt(elbow_var)) / bh,
+    })
+    return features
+
+
+# --- Vectorized implementation ---
+
+def vectorized_feature_pass(processor: VideoProcessor, track: LandmarkTrack, fps: float) -> Dict[str, float]:
+    kin = Kinematics(track)
+    processor._detect_action_type(kin)
+    hit_window = processor._detect_hit_phase(kin)
+    metrics = {}
+    for action in ACTIONS:
+        metrics.update(processor._calculate_real_metrics(kin, action, hit_window, fps))
+    return metrics
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # Metric stage only: skip building the MediaPipe graph
+    processor = VideoProcessor.__new__(VideoProcessor)
+    fps = 60.0
+
+    print(f"{'frames':>8} | {'legacy ms':>10} | {'vector ms':>10} | {'speedup':>8} | {'legacy MB':>9} | {'track MB':>8}")
+    for n in args.frames:
+        track = make_track(n)
+        history = to_legacy_history(track)
+        legacy = _best_of(lambda: legacy_feature_pass(history, fps), args.repeat)
+        vector = _best_of(lambda: vectorized_feature_pass(processor, track, fps), args.repeat)
+        # Rough footprint of the legacy history: dict + 11 point objects per frame
+        legacy_mb = n * (232 + len(JOINTS) * 56) / 1e6
+        print(f"{n:>8} | {legacy * 1e3:>10.2f} | {vector * 1e3:>10.2f} | {legacy / vector:>7.1f}x | {legacy_mb:>9.1f} | {track.nbytes / 1e6:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+"""
+End-to-end benchmark of AIAnalysisService.analyze_video on generated clips.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_pipeline [--clips 640x360@30:4 1280x720@60:4] [--runs 5]
+    python -m backend.benchmarks.bench_pipeline --pose markers    # no pose model needed
+    python -m backend.benchmarks.bench_pipeline --update-golden   # accept the current results
+
+Each clip (WIDTHxHEIGHT@FPS:SECONDS) shows a stick figure with one overhead
+swing every two seconds. It is generated deterministically into `--clip-dir`
+(a temporary directory by default). The LLM is the local fake Gemini server,
+with the feedback cache off. Every clip runs in its own spawned process: one
+warm-up run, then `--runs` timed runs.
+
+Reported per clip:
+- frames/sec: source frames per second of wall time.
+- wall time p50/p95.
+- peak RSS of the process.
+- drift against the golden results in golden_pipeline.json: action, score and
+  the largest metric difference.
+Then, per stage (see ai_engine/profiling.py): calls per run, total time per run
+(p50/p95 and share of the wall time), and per-call latency (p50/p95/p99).
+With the frame pipeline (PIPELINE_FRAME_BUDGET > 0), decode and preprocess
+overlap the other stages; the time they overlap is shown as (overlap).
+
+`--pose model` (default) runs the pose backend of `--profile`. `--pose markers`
+replaces it with a lookup of the figure's coloured joint markers. The whole pipeline still runs (decode, resize, metrics, keyframes,
+LLM), but the pose stage then measures the marker lookup, not model inference.
+The exit status is 1 when a clip drifts beyond `--max-drift` (or changes action).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from backend.ai_engine.landmarks import CHANNELS, JOINT_INDEX, JOINTS
+from backend.ai_engine.pose_backends import PoseEstimator
+from backend.benchmarks.fake_llm import FakeLLMServer
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_pipeline.json")
+DEFAULT_CLIPS = ["640x360@30:4", "1280x720@30:4", "1280x720@60:4", "1920x1080@30:8"]
+SWING_INTERVAL = 2.0
+SWING_SECONDS = 0.8
+BACKGROUND = (40, 40, 40)
+LIMB_COLOR = (160, 160, 160)
+# BGR marker per joint, at least 128 apart in one channel from every other marker
+MARKER_COLORS = {
+    'nose': (255, 255, 255),
+    'right_wrist': (0, 0, 255), 'left_wrist': (0, 255, 0),
+    'right_shoulder': (255, 0, 0), 'left_shoulder': (0, 255, 255),
+    'right_hip': (255, 0, 255), 'left_hip': (255, 255, 0),
+    'right_ankle': (0, 128, 255), 'left_ankle': (255, 0, 128),
+    'right_elbow': (128, 255, 0), 'left_elbow': (0, 128, 128),
+}
+LIMBS = [('right_shoulder', 'left_shoulder'), ('right_shoulder', 'right_elbow'), ('right_elbow', 'right_wrist'),
+         ('left_shoulder', 'left_elbow'), ('left_elbow', 'left_wrist'), ('right_shoulder', 'right_hip'),
+         ('left_shoulder', 'left_hip'), ('right_hip', 'left_hip'), ('right_hip', 'right_ankle'),
+         ('left_hip', 'left_ankle')]
+# Markers are drawn in this order, so the swinging wrist stays on top
+DRAW_ORDER = ['left_ankle', 'right_ankle', 'left_hip', 'right_hip', 'left_shoulder', 'right_shoulder',
+              'nose', 'left_elbow', 'left_wrist', 'right_elbow', 'right_wrist']
+MARKER_TOLERANCE = 50
+# MarkerPose looks for markers on frames downscaled to this longest side
+MARKER_MAX_SIDE = 320
+
+
+def parse_clip(spec: str) -> Tuple[int, int, float, float]:
+    match = re.fullmatch(r"(\d+)x(\d+)@(\d+(?:\.\d+)?):(\d+(?:\.\d+)?)", spec)
+    if not match:
+        raise argparse.ArgumentTypeError(f"clip must look like 1280x720@30:4, got {spec!r}")
+    width, height, fps, seconds = match.groups()
+    return int(width), int(height), float(fps), float(seconds)
+
+
+def figure_positions(n_frames: int, fps: float, seed: int = 0) -> np.ndarray:
+    """(frames, joints, 2) normalized positions of a standing player with periodic overhead swings."""
+    rng = np.random.default_rng(seed)
+    base = {
+        'nose': (0.50, 0.28),
+        'right_shoulder': (0.45, 0.38), 'left_shoulder': (0.55, 0.38),
+        'right_elbow': (0.43, 0.48), 'left_elbow': (0.58, 0.48),
+        'right_wrist': (0.42, 0.57), 'left_wrist': (0.60, 0.56),
+        'right_hip': (0.47, 0.60), 'left_hip': (0.53, 0.60),
+        'right_ankle': (0.46, 0.86), 'left_ankle': (0.54, 0.86),
+    }
+    pos = np.tile(np.array([base[name] for name in JOINTS], dtype=np.float64), (n_frames, 1, 1))
+    pos += rng.normal(0, 0.001, pos.shape)
+
+    # Arm angle from hanging (0): raised behind the head (0.75 pi), then struck over the
+    # top (pi, fastest there) and down across the body (2 pi)
+    t = np.arange(n_frames) / fps
+    theta = np.zeros(n_frames)
+    turn = np.zeros(n_frames)
+    for start in np.arange(SWING_INTERVAL / 2, t[-1] - SWING_SECONDS, SWING_INTERVAL):
+        duration = SWING_SECONDS * (1 + 0.1 * rng.standard_normal())
+        u = (t - start) / duration
+        raise_part = (u >= 0) & (u < 0.6)
+        strike_part = (u >= 0.6) & (u < 1.0)
+        theta[raise_part] = 0.75 * np.pi * np.sin(u[raise_part] / 0.6 * np.pi / 2)
+        theta[strike_part] = np.pi * (0.75 + 1.25 * (1 - (1 - (u[strike_part] - 0.6) / 0.4) ** 2))
+        turn = np.maximum(turn, np.clip(np.sin(np.clip(u, 0, 1) * np.pi), 0, None) * ((u >= 0) & (u < 1)))
+
+    index = {name: i for i, name in enumerate(JOINTS)}
+    # Shoulders turn sideways during the swing (narrower in the image)
+    center = pos[:, [index['right_shoulder'], index['left_shoulder']], 0].mean(axis=1)
+    for name in ('right_shoulder', 'left_shoulder'):
+        pos[:, index[name], 0] = center + (pos[:, index[name], 0] - center) * (1 - 0.6 * turn)
+    shoulder = pos[:, index['right_shoulder']]
+    direction = np.stack([np.sin(theta), np.cos(theta)], axis=1)
+    swinging = theta > 0
+    pos[swinging, index['right_elbow']] = shoulder[swinging] + 0.11 * direction[swinging]
+    pos[swinging, index['right_wrist']] = shoulder[swinging] + 0.21 * direction[swinging]
+    return pos
+
+
+def write_clip(path: str, width: int, height: int, fps: float, seconds: float):
+    n_frames = int(round(fps * seconds))
+    positions = figure_positions(n_frames, fps)
+    radius = max(4, height // 50)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot write {path} (no mp4v encoder in this OpenCV build?)")
+    for frame in positions:
+        image = np.full((height, width, 3), BACKGROUND, dtype=np.uint8)
+        pts = {name: (int(x * width), int(y * height)) for name, (x, y) in zip(JOINTS, frame)}
+        for start, end in LIMBS:
+            cv2.line(image, pts[start], pts[end], LIMB_COLOR, max(1, radius // 2))
+        for name in DRAW_ORDER:
+            cv2.circle(image, pts[name], radius, MARKER_COLORS[name], -1)
+        writer.write(image)
+    writer.release()
+
+
+def ensure_clips(specs: List[str], clip_dir: str) -> Dict[str, str]:
+    """Generate the clips missing from `clip_dir`; returns name -> path."""
+    os.makedirs(clip_dir, exist_ok=True)
+    paths = {}
+    for spec in specs:
+        width, height, fps, seconds = parse_clip(spec)
+        name = f"{width}x{height}@{fps:g}_{seconds:g}s"
+        path = os.path.join(clip_dir, f"{name}.mp4")
+        if not os.path.exists(path):
+            write_clip(path, width, height, fps, seconds)
+        paths[name] = path
+    return paths
+
+
+class MarkerPose(PoseEstimator):
+    """Stand-in pose backend: locates the coloured joint markers of the generated clips."""
+    name = "markers"
+
+    def __init__(self):
+        # process_batch() receives RGB frames
+        self._ranges = {
+            name: (np.array([max(0, c - MARKER_TOLERANCE) for c in color[::-1]], dtype=np.uint8),
+                   np.array([min(255, c + MARKER_TOLERANCE) for c in color[::-1]], dtype=np.uint8))
+            for name, color in MARKER_COLORS.items()
+        }
+
+    def process_batch(self, images: Sequence[np.ndarray]) -> List[Optional[np.ndarray]]:
+        return [self._process(image) for image in images]
+
+    def _process(self, image_rgb: np.ndarray) -> Optional[np.ndarray]:
+        h, w = image_rgb.shape[:2]
+        if max(h, w) > MARKER_MAX_SIDE:
+            scale = MARKER_MAX_SIDE / max(h, w)
+            w, h = int(w * scale), int(h * scale)
+            image_rgb = cv2.resize(image_rgb, (w, h), interpolation=cv2.INTER_NEAREST)
+        row = np.zeros((len(JOINTS), CHANNELS), dtype=np.float32)
+        found = 0
+        for name, (low, high) in self._ranges.items():
+            moments = cv2.moments(cv2.inRange(image_rgb, low, high), binaryImage=True)
+            if moments["m00"]:
+                found += 1
+                row[JOINT_INDEX[name]] = (moments["m10"] / moments["m00"] / w, moments["m01"] / moments["m00"] / h, 0.0, 1.0)
+        return row if found >= len(MARKER_COLORS) - 2 else None
+
+
+def run_clip(path: str, pose: str, runs: int, workdir: str) -> Dict[str, Any]:
+    """Runs in a fresh process: one warm-up, then `runs` timed analyze_video calls."""
+    # Stored tracks and result images go to the scratch directory
+    os.chdir(workdir)
+    from backend.ai_engine.profiling import StageTimer
+    from backend.ai_engine.service import analysis_service
+
+    if pose == "markers":
+        analysis_service.processor.estimator = MarkerPose()
+    else:
+        analysis_service.processor.warmup()
+    analysis_service.analyze_video(path, task_id="warmup")
+
+    rows = []
+    for i in range(runs):
+        with StageTimer() as timer:
+            started = time.perf_counter()
+            result = analysis_service.analyze_video(path, task_id=f"bench-{i}")
+            wall = time.perf_counter() - started
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        rows.append({"wall": wall, "samples": timer.samples, "result": {
+            "action": result["action"], "score": result["score"], "metrics": result["metrics"],
+            "generation_source": result["generation_source"], "strokes": len(result["strokes"]),
+        }})
+    cap = cv2.VideoCapture(path)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return {"frames": frames, "rows": rows, "peak_rss_mb": peak_mb}
+
+
+def drift(result: Dict[str, Any], golden: Optional[Dict[str, Any]]) -> Tuple[Optional[float], str]:
+    """Largest metric difference from the golden result (None without one) and a short description."""
+    if not golden:
+        return None, "no golden"
+    metrics, expected = result["metrics"], golden["metrics"]
+    worst = max((abs(metrics.get(k, 0.0) - v) for k, v in expected.items()), default=0.0)
+    notes = [f"max {worst:.3f}"]
+    if result["score"] != golden["score"]:
+        notes.append(f"score {golden['score']}->{result['score']}")
+    if result["action"] != golden["action"]:
+        notes.append(f"ACTION {golden['action']}->{result['action']}")
+        worst = float("inf")
+    return worst, ", ".join(notes)
+
+
+def pct(values, q) -> float:
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def report_stages(out: Dict[str, Any]):
+    runs = out["rows"]
+    walls = [row["wall"] for row in runs]
+    names = sorted({name for row in runs for name in row["samples"]},
+                   key=lambda name: -sum(sum(row["samples"].get(name, [])) for row in runs))
+    print(f"    {'stage':<11} | {'calls/run':>9} | {'ms/run p50':>10} | {'p95':>8} | {'share':>6} | "
+          f"{'ms/call p50':>11} | {'p95':>7} | {'p99':>7}")
+    for name in names:
+        totals = [sum(row["samples"].get(name, [])) for row in runs]
+        calls = [d for row in runs for d in row["samples"].get(name, [])]
+        share = sum(totals) / sum(walls) if sum(walls) else 0.0
+        print(f"    {name:<11} | {len(calls) / len(runs):>9.0f} | {pct(totals, 50) * 1000:>10.1f} | "
+              f"{pct(totals, 95) * 1000:>8.1f} | {share:>6.1%} | {pct(calls, 50) * 1000:>11.3f} | "
+              f"{pct(calls, 95) * 1000:>7.3f} | {pct(calls, 99) * 1000:>7.3f}")
+    other = sum(walls) - sum(sum(sum(d) for d in row["samples"].values()) for row in runs)
+    if other < 0:
+        # Decode and preprocess ran on the frame pipeline's threads, overlapping the other stages
+        print(f"    {'(overlap)':<11} | {'':>9} | {-other / len(runs) * 1000:>10.1f} | {'':>8} | "
+              f"{-other / sum(walls):>6.1%} |")
+        return
+    print(f"    {'(other)':<11} | {'':>9} | {other / len(runs) * 1000:>10.1f} | {'':>8} | "
+          f"{other / sum(walls) if sum(walls) else 0.0:>6.1%} |")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clips', nargs='+', default=DEFAULT_CLIPS, help='WIDTHxHEIGHT@FPS:SECONDS')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--pose', choices=['model', 'markers'], default='model')
+    parser.add_argument('--profile', default=os.getenv("ANALYSIS_PROFILE", "full"))
+    parser.add_argument('--clip-dir', help='Where to generate (and reuse) the clips')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='Seconds per fake Gemini request')
+    parser.add_argument('--no-llm', action='store_true', help='Rule-based feedback only')
+    parser.add_argument('--golden', default=GOLDEN_PATH)
+    parser.add_argument('--update-golden', action='store_true')
+    parser.add_argument('--max-drift', type=float, default=0.02, help='Largest accepted metric difference')
+    args = parser.parse_args()
+
+    scratch = tempfile.TemporaryDirectory(prefix="bench_pipeline_")
+    clips = ensure_clips(args.clips, args.clip_dir or os.path.join(scratch.name, "clips"))
+
+    server = FakeLLMServer(latency=args.llm_latency).start()
+    # Inherited by the spawned processes
+    os.environ.update({"ANALYSIS_PROFILE": args.profile, "FEEDBACK_CACHE_MAX_ENTRIES": "0",
+                       "GEMINI_BASE_URL": server.url})
+    if args.no_llm:
+        os.environ.pop("GEMINI_API_KEY", None)
+    else:
+        os.environ["GEMINI_API_KEY"] = "fake"
+
+    golden_all = {}
+    if os.path.exists(args.golden):
+        with open(args.golden, encoding="utf-8") as f:
+            golden_all = json.load(f)
+    golden = golden_all.setdefault(args.pose, {}).setdefault(args.profile, {})
+
+    print(f"pose={args.pose} profile={args.profile} runs={args.runs} "
+          f"llm={'off' if args.no_llm else f'fake, {args.llm_latency:g}s'}")
+    print(f"{'clip':<20} | {'frames':>6} | {'fps p50':>7} | {'wall ms p50':>11} | {'p95':>8} | "
+          f"{'RSS MB':>6} | {'action':<8} | {'score':>5} | {'llm':<6} | drift")
+    failed = False
+    context = multiprocessing.get_context("spawn")
+    for name, path in clips.items():
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            out = executor.submit(run_clip, os.path.abspath(path), args.pose, args.runs,
+                                  tempfile.mkdtemp(dir=scratch.name)).result()
+        walls = [row["wall"] for row in out["rows"]]
+        last = out["rows"][-1]["result"]
+        worst, note = drift(last, golden.get(name))
+        if worst is not None and worst > args.max_drift:
+            failed = True
+            note += " (!)"
+        print(f"{name:<20} | {out['frames']:>6} | {out['frames'] / pct(walls, 50):>7.1f} | "
+              f"{pct(walls, 50) * 1000:>11.0f} | {pct(walls, 95) * 1000:>8.0f} | {out['peak_rss_mb']:>6.0f} | "
+              f"{last['action']:<8} | {last['score']:>5} | {last['generation_source']:<6} | {note}")
+        report_stages(out)
+        if args.update_golden:
+            golden[name] = {key: last[key] for key in ("action", "score", "metrics")}
+
+    server.stop()
+    scratch.cleanup()
+    if args.update_golden:
+        with open(args.golden, "w", encoding="utf-8") as f:
+            json.dump(golden_all, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Golden results written to {args.golden}")
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
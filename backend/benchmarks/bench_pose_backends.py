@@ -0,0 +1,170 @@
+"""
+Accuracy/throughput comparison of the pose backends (ai_engine/pose_backends.py).
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_pose_backends path/to/clip.mp4 [more clips...] \
+        [--backends mediapipe-0 mediapipe-1 mediapipe-2 onnx] [--reference mediapipe-2]
+    python -m backend.benchmarks.bench_pose_backends --backends markers mediapipe-1   # generated clips
+
+Every backend extracts the track of every frame of each video, downscaled to
+`--max-side`, in a fresh VideoProcessor after one warm-up frame. Without
+videos, the stick-figure clips of bench_pipeline are generated (`--clips`) and
+compared against their true joint positions; `markers` is the marker-lookup
+stand-in from bench_pipeline, useful where no model is installed.
+
+Reported per video and backend:
+- pose ms/frame and pose fps: time spent in process_batch per inferred frame
+  (batches included), and total fps of the whole extraction.
+- detected: share of frames with a pose.
+- error: mean landmark distance from the reference in percent of the
+  reference body height (nose to ankles), over frames both detected;
+  PCK@10: share of joints within 10% of the body height.
+- action and largest metric difference vs the reference's analysis.
+The reference is `--reference` (a backend, first in the run order) or the true
+positions of generated clips. Backends that cannot be loaded here (e.g. onnx
+without onnxruntime or ONNX_POSE_MODEL) are reported as unavailable.
+`--batch` / `--threads` set ONNX_POSE_BATCH / ONNX_POSE_THREADS. `--roi` also
+runs every backend with frames cropped to the tracked player (shown as
+BACKEND+roi; see ai_engine/person_roi.py).
+"""
+import argparse
+import os
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from backend.ai_engine.landmarks import JOINT_INDEX, LandmarkTrack
+from backend.ai_engine.pose_backends import POSE_BACKENDS
+from backend.ai_engine.processor import VideoProcessor
+from backend.ai_engine.profiles import AnalysisProfile
+from backend.ai_engine.profiling import StageTimer
+from backend.benchmarks.bench_pipeline import MarkerPose, ensure_clips, figure_positions, parse_clip
+
+BACKENDS = list(POSE_BACKENDS) + ["markers"]
+TRUTH = "truth"
+
+
+def truth_track(spec: str) -> LandmarkTrack:
+    """True joint positions of a generated clip."""
+    _, _, fps, seconds = parse_clip(spec)
+    positions = figure_positions(int(round(fps * seconds)), fps)
+    track = LandmarkTrack(capacity=len(positions))
+    for frame_idx, frame in enumerate(positions):
+        row = np.zeros((frame.shape[0], 4), dtype=np.float32)
+        row[:, :2] = frame
+        row[:, 3] = 1.0
+        track.append(frame_idx, row)
+    return track
+
+
+def run_backend(video: str, run: str, max_side: Optional[int]) -> Dict[str, Any]:
+    """Extract the track of `video` with a backend name, optionally suffixed with '+roi' (person_roi on)."""
+    backend, _, roi = run.partition("+")
+    profile = AnalysisProfile(name=f"bench-{run}", max_side=max_side, refine=False, person_roi=roi == "roi",
+                              pose_backend=backend if backend in POSE_BACKENDS else "mediapipe-1")
+    processor = VideoProcessor(profile=profile, estimator=MarkerPose() if backend == "markers" else None)
+    processor.warmup()
+    with StageTimer() as timer:
+        result = processor.process_video(video)
+    pose_sec = sum(timer.samples.get("pose", []))
+    return {"result": result, "pose_sec": pose_sec}
+
+
+def landmark_error(track: LandmarkTrack, reference: LandmarkTrack, width: int, height: int) -> Tuple[float, float, int]:
+    """(mean error in body heights, PCK@0.1, frames compared) over frames present in both tracks."""
+    common, rows, ref_rows = np.intersect1d(track.frame_indices, reference.frame_indices, return_indices=True)
+    if not len(common):
+        return float("nan"), float("nan"), 0
+    scale = np.array([width, height], dtype=np.float64)
+    got = track.data[rows, :, :2] * scale
+    expected = reference.data[ref_rows, :, :2] * scale
+    ankles = expected[:, [JOINT_INDEX['right_ankle'], JOINT_INDEX['left_ankle']], 1].mean(axis=1)
+    body_height = np.maximum(np.abs(ankles - expected[:, JOINT_INDEX['nose'], 1]), 1.0)
+    error = np.linalg.norm(got - expected, axis=2) / body_height[:, None]
+    return float(error.mean()), float((error < 0.1).mean()), len(common)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='*')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(POSE_BACKENDS))
+    parser.add_argument('--reference', help=f'Backend (or {TRUTH!r} for generated clips) the others are compared with')
+    parser.add_argument('--clips', nargs='+', default=["1280x720@30:4"], help='Generated clips when no videos are given')
+    parser.add_argument('--max-side', type=int, default=1280, help='Longest side of inference frames (0 = native)')
+    parser.add_argument('--batch', type=int, help='ONNX_POSE_BATCH')
+    parser.add_argument('--threads', type=int, help='ONNX_POSE_THREADS')
+    parser.add_argument('--roi', action='store_true', help='Also run each backend with the person ROI')
+    args = parser.parse_args()
+
+    if args.batch:
+        os.environ["ONNX_POSE_BATCH"] = str(args.batch)
+    if args.threads is not None:
+        os.environ["ONNX_POSE_THREADS"] = str(args.threads)
+
+    scratch = tempfile.TemporaryDirectory(prefix="bench_pose_")
+    # name -> (path, true track or None)
+    videos: Dict[str, Tuple[str, Optional[LandmarkTrack]]] = {}
+    if args.videos:
+        videos = {video: (video, None) for video in args.videos}
+    else:
+        clips = ensure_clips(args.clips, os.path.join(scratch.name, "clips"))
+        videos = {name: (path, truth_track(spec)) for (name, path), spec in zip(clips.items(), args.clips)}
+
+    reference_name = args.reference or (TRUTH if not args.videos else args.backends[0])
+    backends = list(args.backends)
+    if reference_name != TRUTH:
+        # The reference runs first, so the others can be compared with it
+        backends = [reference_name] + [backend for backend in backends if backend != reference_name]
+    if args.roi:
+        backends = [run for backend in backends for run in (backend, f"{backend}+roi")]
+
+    print(f"reference={reference_name} max_side={args.max_side or 'native'}")
+    print(f"{'video':<24} | {'backend':<15} | {'frames':>6} | {'detected':>8} | {'pose ms/f':>9} | {'pose fps':>8} | "
+          f"{'fps':>6} | {'error':>6} | {'PCK@10':>6} | {'action':<8} | {'max drift':>9}")
+    for name, (path, truth) in videos.items():
+        if reference_name == TRUTH and truth is None:
+            raise SystemExit(f"No true positions for {path}: pass --reference BACKEND")
+        cap = cv2.VideoCapture(path)
+        width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+
+        reference_track, reference_result = None, None
+        if reference_name == TRUTH:
+            reference_track, reference_result = truth, VideoProcessor().analyze_track(truth, fps)
+        for backend in backends:
+            try:
+                out = run_backend(path, backend, args.max_side or None)
+            except (ImportError, OSError) as e:
+                print(f"{name[-24:]:<24} | {backend:<15} | unavailable: {e}")
+                continue
+            result, stats = out["result"], out["result"]["stats"]
+            track: LandmarkTrack = result["track"]
+            if backend == reference_name:
+                reference_track, reference_result = track, result
+
+            inferred = stats["frames_inferred"]
+            if backend == reference_name:
+                error, pck, compared = 0.0, 1.0, len(track)
+            elif reference_track is None:
+                error, pck, compared = float("nan"), float("nan"), 0
+            else:
+                error, pck, compared = landmark_error(track, reference_track, width, height)
+            drift = float("nan")
+            if reference_result and result["metrics"]:
+                drift = max((abs(result["metrics"][k] - v) for k, v in reference_result["metrics"].items()
+                             if k in result["metrics"]), default=0.0)
+            action = result["detected_action"]
+            if reference_result and action != reference_result["detected_action"]:
+                action += "!"
+            print(f"{name[-24:]:<24} | {backend:<15} | {inferred:>6} | {len(track) / max(inferred, 1):>8.0%} | "
+                  f"{out['pose_sec'] / max(inferred, 1) * 1000:>9.2f} | {inferred / out['pose_sec'] if out['pose_sec'] else 0.0:>8.1f} | "
+                  f"{stats['throughput_fps']:>6.1f} | {error:>6.1%} | {pck:>6.0%} | {action:<8} | {drift:>9.3f}"
+                  + ("" if compared else " (nothing to compare)"))
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
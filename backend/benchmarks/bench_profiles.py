@@ -0,0 +1,43 @@
+"""
+Pose-extraction throughput per analysis profile.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_profiles path/to/clip.mp4 [more clips...] [--profiles full balanced fast]
+
+Prints frames/sec per profile and the largest metric drift relative to the first profile.
+Profiles whose pose backend cannot be loaded here (e.g. onnx without a model) are reported as unavailable.
+"""
+import argparse
+
+from backend.ai_engine.processor import VideoProcessor
+from backend.ai_engine.profiles import ANALYSIS_PROFILES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='+')
+    parser.add_argument('--profiles', nargs='+', default=list(ANALYSIS_PROFILES))
+    args = parser.parse_args()
+
+    print(f"{'video':<30} | {'profile':<9} | {'backend':<11} | {'stride':>6} | {'inferred':>8} | {'sec':>7} | {'fps':>7} | {'action':<8} | {'max drift':>9}")
+    for video in args.videos:
+        baseline = None
+        for name in args.profiles:
+            backend = ANALYSIS_PROFILES[name].pose_backend
+            # Fresh processor per run so MediaPipe tracking state does not leak between profiles
+            try:
+                result = VideoProcessor(profile=name).process_video(video)
+            except (ImportError, OSError) as e:
+                print(f"{video[-30:]:<30} | {name:<9} | {backend:<11} | unavailable: {e}")
+                continue
+            stats = result['stats']
+            metrics = result['metrics']
+            if baseline is None:
+                baseline = metrics
+            drift = max((abs(metrics[k] - baseline[k]) for k in metrics if k in baseline), default=0.0)
+            print(f"{video[-30:]:<30} | {name:<9} | {backend:<11} | {stats['stride']:>6} | {stats['frames_inferred']:>8} | "
+                  f"{stats['elapsed_sec']:>7.2f} | {stats['throughput_fps']:>7.1f} | {result['detected_action']:<8} | {drift:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Micro-benchmark: legacy per-result rule checks vs the compiled, batched rule engine.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_rules [--results 1000 10000 100000] [--repeat 3]
+
+The legacy implementation below reproduces the original ActionAnalyzer loop
+(re-sort rules, split each condition string, look up thresholds, every call).
+Both paths get the same random metric dicts, and their issue tags and scores
+are checked for equality. Also times the full rules-only re-score of stored
+results (issues, feedback, two strokes each): analyze() per result and stroke
+vs rescore_results, which `python -m backend.reanalyze --rules-only` runs per batch.
+"""
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from backend.ai_engine.analyzer import ActionAnalyzer
+
+
+def legacy_rules(analyzer: ActionAnalyzer, action: str, metrics: Dict[str, float], level: str) -> Tuple[List[str], float]:
+    tags = []
+    action_rules = analyzer.rules.get(action, {})
+    level_thresholds = analyzer.thresholds.get(action, {})
+    for rule_name, rule_data in sorted(action_rules.items(), key=lambda x: x[1].get("priority", 99)):
+        metric_name = rule_data["metric"]
+        if metric_name not in metrics:
+            continue
+        parts = rule_data["condition"].split()
+        if len(parts) != 2:
+            continue
+        operator, threshold_level = parts
+        threshold_val = level_thresholds.get(metric_name, {}).get(threshold_level)
+        if threshold_val is None:
+            continue
+        val = metrics[metric_name]
+        if (operator == "<" and val < threshold_val) or (operator == ">" and val > threshold_val):
+            tags.append(rule_name)
+
+    total_score = total_weight = 0.0
+    for metric, weight in analyzer.scoring_config.get(action, {}).get("metrics", {}).items():
+        total_score += metrics.get(metric, 0.5) * 100 * weight
+        total_weight += weight
+    return tags, (round(total_score / total_weight) if total_weight else 0.0)
+
+
+def make_results(analyzer: ActionAnalyzer, n: int, seed: int = 0) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    actions = list(analyzer.rule_set.actions)
+    results = []
+    for i in range(n):
+        action = actions[i % len(actions)]
+        names = set(analyzer.rule_set[action].columns)
+        metrics = {name: round(float(rng.uniform(0, 1)), 2) for name in names if rng.random() > 0.05}
+        results.append({"action": action, "metrics": metrics, "level_assumption": "beginner", "score": 0,
+                        "strokes": [{"action": action, "metrics": metrics, "score": 0, "issues": []}] * 2})
+    return results
+
+
+def timed(fn, repeat: int) -> Tuple[float, object]:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--results', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from backend.ai_engine.service import analysis_service
+    analyzer = analysis_service.analyzer
+
+    print(f"{'results':>8} | {'legacy ms':>9} | {'batched ms':>10} | {'speedup':>7} | "
+          f"{'analyze() each ms':>17} | {'rescore_results ms':>18} | equal")
+    for n in args.results:
+        # Stored results carry their stroke summaries
+        results = analysis_service.rescore_results(make_results(analyzer, n))
+
+        def legacy():
+            return [legacy_rules(analyzer, r["action"], r["metrics"], "beginner") for r in results]
+
+        def batched():
+            out = [None] * len(results)
+            groups: Dict[str, List[int]] = {}
+            for i, r in enumerate(results):
+                groups.setdefault(r["action"], []).append(i)
+            for action, rows in groups.items():
+                action_rules = analyzer.rule_set[action]
+                matrix = action_rules.matrix([results[i]["metrics"] for i in rows])
+                for i, tags, score in zip(rows, action_rules.issue_tags(matrix, "beginner"), action_rules.scores(matrix).tolist()):
+                    out[i] = (tags, score)
+            return out
+
+        legacy_sec, expected = timed(legacy, args.repeat)
+        batched_sec, got = timed(batched, args.repeat)
+        per_result_sec, _ = timed(lambda: [[analyzer.analyze(r["action"], m["metrics"], use_llm=False)
+                                             for m in [r] + r["strokes"]] for r in results], 1)
+        rescore_sec, _ = timed(lambda: analysis_service.rescore_results(results), 1)
+        equal = all(e[0] == g[0] and e[1] == g[1] for e, g in zip(expected, got))
+        print(f"{n:>8} | {legacy_sec * 1000:>9.1f} | {batched_sec * 1000:>10.1f} | {legacy_sec / batched_sec:>6.1f}x | "
+              f"{per_result_sec * 1000:>17.0f} | {rescore_sec * 1000:>18.0f} | {equal}")
+
+
+if __name__ == '__main__':
+    main()
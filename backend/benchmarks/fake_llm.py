@@ -0,0 +1,160 @@
+"""
+Local stand-in for the Gemini `generateContent` endpoint, with injectable latency and errors.
+
+Run from the repository root:
+    python -m backend.benchmarks.fake_llm [--port 8089] [--latency 1.0] [--jitter 0.5] [--error-rate 0.2]
+
+then start the backend with GEMINI_BASE_URL=http://127.0.0.1:8089 and any GEMINI_API_KEY.
+Feedback prompts get a valid feedback JSON answer, anything else a short text reply
+(streamed word by word on `streamGenerateContent`, after the same initial latency).
+Errors are 503 (or 429 for a quarter of them, with Retry-After: 1).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHAT_ANSWER = "Keep your elbow high and turn your shoulders before the hit, then let the racket follow through."
+FEEDBACK_ANSWER = {
+    "positive_feedback": {"zh": "动作流畅。", "en": "Smooth motion."},
+    "next_training_focus": [{"zh": "多练习挥拍。", "en": "Practice the swing."}],
+}
+
+
+def _usage(body, answer: str):
+    """Rough Gemini accounting: ~4 characters per text token, 258 tokens per image."""
+    parts = [part for content in body.get("contents", []) for part in content.get("parts", [])]
+    prompt = sum(len(part.get("text", "")) // 4 for part in parts) + 258 * sum("inline_data" in part for part in parts)
+    output = len(answer) // 4
+    return {"promptTokenCount": prompt, "candidatesTokenCount": output, "totalTokenCount": prompt + output}
+
+
+class FakeLLMServer:
+    """Threaded HTTP server; every request sleeps latency ± jitter, then fails with probability error_rate."""
+
+    def __init__(self, port: int = 0, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        # Size of the most recent request body, to compare prompt growth
+        self.last_request_bytes = 0
+        # Pause between streamed chunks
+        self.chunk_delay = 0.01
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def configure(self, latency: float = None, jitter: float = None, error_rate: float = None):
+        """Change the behaviour of a running server (between benchmark scenarios)."""
+        if latency is not None:
+            self.latency = latency
+        if jitter is not None:
+            self.jitter = jitter
+        if error_rate is not None:
+            self.error_rate = error_rate
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                body = json.loads(raw or b"{}")
+                with fake._lock:
+                    fake.requests += 1
+                    fake.last_request_bytes = len(raw)
+                time.sleep(max(0.0, fake.latency + random.uniform(-fake.jitter, fake.jitter)))
+
+                streaming = self.path.endswith(":streamGenerateContent?alt=sse")
+                if not (self.path.endswith(":generateContent") or streaming):
+                    return self._reply(404, {"error": {"message": "not found"}})
+                if random.random() < fake.error_rate:
+                    with fake._lock:
+                        fake.errors += 1
+                    if random.random() < 0.25:
+                        return self._reply(429, {"error": {"message": "rate limited"}}, {"Retry-After": "1"})
+                    return self._reply(503, {"error": {"message": "overloaded"}})
+
+                wants_json = body.get("generationConfig", {}).get("responseMimeType") == "application/json"
+                text = json.dumps(FEEDBACK_ANSWER) if wants_json else CHAT_ANSWER
+                if streaming:
+                    return self._stream(text, _usage(body, text))
+                self._reply(200, {
+                    "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}],
+                    "usageMetadata": _usage(body, text),
+                })
+
+            def _reply(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up (deadline)
+
+            def _stream(self, text, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                words = text.split(" ")
+                try:
+                    for i, word in enumerate(words):
+                        chunk = word if i == len(words) - 1 else word + " "
+                        event = {"candidates": [{"content": {"role": "model", "parts": [{"text": chunk}]}}]}
+                        if i == len(words) - 1:
+                            event["usageMetadata"] = usage
+                        self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode())
+                        self.wfile.flush()
+                        time.sleep(fake.chunk_delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=1.0, help='Seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.port, args.latency, args.jitter, args.error_rate).start()
+    print(f"Fake LLM listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
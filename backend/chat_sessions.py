@@ -0,0 +1,172 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHAT_SESSIONS_MAX = int(os.getenv("CHAT_SESSIONS_MAX", "256"))
+# Idle sessions are dropped after this many seconds
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL_MIN", "60")) * 60
+# Verbatim history sent with each message; older turns are folded into a summary
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "2000"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count without a tokenizer: ~4 ASCII characters per token, one per CJK character."""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+class ChatSession:
+    """
+    One conversation about one analysis, in one language.
+
+    `context` (system prompt + acknowledgement) is built once from the task
+    result; each message is sent as context + summary + the recent `turns`
+    that fit the token budget, so the request size stays bounded however long
+    the conversation gets.
+    """
+
+    def __init__(self, task_id: str, language: str, context: List[Dict[str, Any]]):
+        self.task_id = task_id
+        self.language = language
+        self.context = context
+        self.summary: Optional[str] = None
+        self.turns: List[Dict[str, str]] = []
+        self.tokens = 0
+        self.last_used = time.monotonic()
+        # Turns dropped from `turns` but not yet folded into `summary` by the LLM
+        self.pending: List[Dict[str, str]] = []
+        self.summarizing = False
+        # One message at a time per session, so turns stay in order
+        self.lock = asyncio.Lock()
+
+    def contents(self, user_msg: str) -> List[Dict[str, Any]]:
+        contents = list(self.context)
+        if self.summary:
+            contents.append({"role": "user", "parts": [{"text": f"(Summary of our earlier conversation: {self.summary})"}]})
+            contents.append({"role": "model", "parts": [{"text": "OK."}]})
+        for turn in self.turns:
+            contents.append({"role": "user" if turn["role"] == "user" else "model", "parts": [{"text": turn["content"]}]})
+        contents.append({"role": "user", "parts": [{"text": user_msg}]})
+        return contents
+
+    def append(self, role: str, content: str):
+        self.turns.append({"role": role, "content": content})
+        self.tokens += estimate_tokens(content)
+
+    def trim(self, budget: int) -> List[Dict[str, str]]:
+        """
+        Drop the oldest turns once history exceeds `budget`, down to half of it
+        (so trimming and summarizing happen every few messages, not every one).
+        Whole question/answer pairs go; the latest pair is always kept.
+        """
+        if self.tokens <= budget:
+            return []
+        dropped = []
+        while self.tokens > budget // 2 and len(self.turns) > 2:
+            for turn in self.turns[:2]:
+                self.tokens -= estimate_tokens(turn["content"])
+            dropped += self.turns[:2]
+            del self.turns[:2]
+        return dropped
+
+
+class ChatSessions:
+    """
+    In-memory LRU of chat sessions keyed by (task_id, language). Per process:
+    with several API processes, sticky routing keeps a conversation on one of
+    them; a session missing after eviction or restart starts over from the
+    history the client sends, if any.
+    """
+
+    def __init__(self, coach, max_sessions: int = 256, ttl: float = 3600.0, history_tokens: int = 2000):
+        self.coach = coach
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.history_tokens = history_tokens
+        self._sessions: "OrderedDict[Tuple[str, str], ChatSession]" = OrderedDict()
+
+    def get(self, task_id: str, language: str) -> Optional[ChatSession]:
+        key = (task_id, language)
+        session = self._sessions.get(key)
+        if session is None:
+            return None
+        if time.monotonic() - session.last_used > self.ttl:
+            del self._sessions[key]
+            return None
+        self._sessions.move_to_end(key)
+        return session
+
+    def create(self, task_id: str, language: str, result: Dict[str, Any],
+               history: Optional[List[Dict[str, str]]] = None) -> ChatSession:
+        session = ChatSession(task_id, language, self.coach.build_chat_context(result, language))
+        for msg in history or []:
+            session.append("user" if msg.get("role") == "user" else "model", msg.get("content", ""))
+        self._fold(session, session.trim(self.history_tokens))
+        self._sessions[(task_id, language)] = session
+        self._evict()
+        return session
+
+    def reset(self, task_id: str):
+        for key in [key for key in self._sessions if key[0] == task_id]:
+            del self._sessions[key]
+
+    async def send(self, session: ChatSession, user_msg: str) -> AsyncIterator[str]:
+        """
+        Stream the coach's reply. The exchange is added to the session only when
+        the reply completes; on failure the error message is yielded instead.
+        """
+        async with session.lock:
+            session.last_used = time.monotonic()
+            reply = []
+            try:
+                async for chunk in self.coach.stream_chat_async(session.contents(user_msg)):
+                    reply.append(chunk)
+                    yield chunk
+            except Exception as e:
+                logger.error(f"Chat generation failed: {e}")
+                if not reply:
+                    yield self.coach.chat_error_message(session.language)
+                return
+            session.append("user", user_msg)
+            session.append("model", "".join(reply))
+            self._fold(session, session.trim(self.history_tokens))
+
+    def _fold(self, session: ChatSession, dropped: List[Dict[str, str]]):
+        """Summarize dropped turns in the background; until then keep their questions as a stopgap summary."""
+        if not dropped:
+            return
+        session.pending += dropped
+        if session.summarizing:
+            return
+        questions = " / ".join(t["content"] for t in session.pending if t["role"] == "user")
+        session.summary = ((session.summary + " / ") if session.summary else "") + questions
+        # The stopgap must not grow without bound if the LLM stays unavailable
+        session.summary = session.summary[-self.history_tokens:]
+        session.summarizing = True
+        asyncio.get_running_loop().create_task(self._summarize(session))
+
+    async def _summarize(self, session: ChatSession):
+        try:
+            while session.pending:
+                turns, session.pending = session.pending, []
+                summary = await self.coach.summarize_chat_async(session.summary, turns, session.language)
+                if summary:
+                    session.summary = summary
+        finally:
+            session.summarizing = False
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [key for key, s in self._sessions.items() if now - s.last_used > self.ttl]:
+            del self._sessions[key]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+def chat_sessions_from_env(coach) -> ChatSessions:
+    return ChatSessions(coach, CHAT_SESSIONS_MAX, CHAT_SESSION_TTL, CHAT_HISTORY_TOKENS)
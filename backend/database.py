@@ -1,76 +1,718 @@
 import sqlite3
 import json
 import os
-from typing import Dict, Optional, Any
+import time
+import asyncio
+import inspect
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial, wraps
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from datetime import datetime
 
+from backend.ai_engine.profiling import REGISTRY
+
 DB_PATH = "shuttlecoach.db"
 
+# Queue bookkeeping columns added to analysis_tasks after the initial schema.
+# Lease times are UNIX timestamps (seconds).
+QUEUE_COLUMNS = {
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "lease_owner": "TEXT",
+    "lease_expires_at": "REAL",
+    "heartbeat_at": "REAL",
+}
+
+# Result-cache columns: content_hash is the upload's SHA-256, cache_key adds the
+# analysis version (see ai_engine.version). Duplicates of an in-flight task wait
+# in status 'waiting' with duplicate_of pointing at the task doing the work.
+CACHE_COLUMNS = {
+    "content_hash": "TEXT",
+    "content_size": "INTEGER",
+    "cache_key": "TEXT",
+    "cache_status": "TEXT",  # 'miss', 'hit' (served from a finished task) or 'joined' (attached to an in-flight one)
+    "duplicate_of": "TEXT",
+}
+
+# Latest progress report of a running task (see worker_pool progress reporting)
+PROGRESS_COLUMNS = {
+    "progress_stage": "TEXT",
+    "progress": "REAL",
+    "progress_detail": "TEXT",
+    "progress_updated_at": "REAL",
+}
+
+# Summary of a successful result, materialized when it is written so history
+# queries never load result_json. Metrics and feedback are small JSON objects.
+SUMMARY_COLUMNS = {
+    "summary_action": "TEXT",
+    "summary_score": "INTEGER",
+    "summary_metrics": "TEXT",
+    "summary_feedback": "TEXT",
+}
+_SUMMARY_NAMES = tuple(SUMMARY_COLUMNS)
+
+# LLM enrichment stage: a completed task is first stored with rule-based feedback,
+# then an enrichment worker upgrades the feedback in place.
+# enrichment_status: 'pending' -> 'running' -> 'done' | 'failed' (NULL = not requested).
+# enrichment_until is the lease expiry while running, and the earliest retry time while pending.
+ENRICHMENT_COLUMNS = {
+    "enrichment_status": "TEXT",
+    "enrichment_attempts": "INTEGER NOT NULL DEFAULT 0",
+    "enrichment_owner": "TEXT",
+    "enrichment_until": "REAL",
+}
+
+# Fills the summary of rows written before the summary columns existed
+_BACKFILL_SUMMARY_SQL = '''
+    UPDATE analysis_tasks
+    SET summary_action = json_extract(result_json, '$.action'),
+        summary_score = json_extract(result_json, '$.score'),
+        summary_metrics = json_extract(result_json, '$.metrics'),
+        summary_feedback = json_extract(result_json, '$.positive_feedback')
+    WHERE status = 'completed' AND summary_action IS NULL AND result_json IS NOT NULL
+      AND json_extract(result_json, '$.error') IS NULL
+'''
+
+# Copies primary results onto waiting duplicates once the primary finished
+_PROPAGATE_DUPLICATES_SQL = '''
+    UPDATE analysis_tasks AS d
+    SET status = p.status, result_json = p.result_json, error_message = p.error_message,
+        summary_action = p.summary_action, summary_score = p.summary_score,
+        summary_metrics = p.summary_metrics, summary_feedback = p.summary_feedback,
+        enrichment_status = p.enrichment_status
+    FROM analysis_tasks AS p
+    WHERE d.status = 'waiting' AND d.duplicate_of = p.task_id AND p.status IN ('completed', 'failed')
+'''
+
+# Mirrors the enrichment status of primary task ? onto its finished duplicates (which are never enriched themselves)
+_PROPAGATE_ENRICHMENT_SQL = '''
+    UPDATE analysis_tasks AS d
+    SET enrichment_status = p.enrichment_status
+    FROM analysis_tasks AS p
+    WHERE p.task_id = ? AND d.duplicate_of = p.task_id AND d.status = 'completed'
+'''
+
+# Upper bound of one history page (a growth profile of 1000 sessions is one query)
+MAX_HISTORY_PAGE = 1000
+
+def _result_summary(result: Dict[str, Any]) -> Tuple[Optional[str], Optional[int], Optional[str], Optional[str]]:
+    """Values for SUMMARY_COLUMNS; all None for error results."""
+    if "error" in result:
+        return None, None, None, None
+    feedback = result.get("positive_feedback")
+    return (
+        result.get("action"),
+        result.get("score"),
+        json.dumps(result.get("metrics") or {}),
+        json.dumps(feedback) if feedback else None,
+    )
+
+# Applied to every connection. WAL lets readers proceed while a writer commits;
+# NORMAL sync is durable across application crashes in WAL mode (only an OS crash
+# can lose the last transactions), and cache/mmap keep hot pages in memory.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",    # KiB, i.e. 16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256 MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+)
+# Seconds a writer waits for the lock before raising "database is locked"
+BUSY_TIMEOUT = 10.0
+
+DB_SECONDS = REGISTRY.histogram("shuttlecoach_db_seconds", "Duration of database calls", ["op"])
+
+def _timed_methods(cls):
+    """Time every public method into DB_SECONDS (generators run lazily in the caller and are skipped)."""
+    def timed(name, method):
+        @wraps(method)
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                DB_SECONDS.observe(time.perf_counter() - started, name)
+        return call
+
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(method) or inspect.isgeneratorfunction(method):
+            continue
+        setattr(cls, name, timed(name, method))
+    return cls
+
+@_timed_methods
 class Database:
+    """
+    SQLite access layer.
+
+    Each thread keeps one long-lived connection (created on first use), so the
+    per-call cost is a statement from the connection's prepared statement cache
+    rather than opening the file and re-parsing SQL. Connections run in
+    autocommit mode; writes go through _transaction().
+    """
+
     def __init__(self):
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
         self._init_db()
 
-    def _get_conn(self):
-        return sqlite3.connect(DB_PATH)
+    def _get_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                DB_PATH,
+                timeout=BUSY_TIMEOUT,
+                isolation_level=None,
+                cached_statements=256,
+                # Only the owning thread uses it; close() may run on another one at shutdown
+                check_same_thread=False,
+            )
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction; takes the write lock up front so it cannot fail half-way on upgrade."""
+        conn = self._get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self):
+        """Close every thread's connection (at shutdown)."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
 
     def _init_db(self):
         conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS analysis_tasks (
-                task_id TEXT PRIMARY KEY,
-                status TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                video_path TEXT,
-                result_json TEXT,
-                error_message TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        # Persistent setting stored in the database file
+        conn.execute("PRAGMA journal_mode = WAL")
+        with self._transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS analysis_tasks (
+                    task_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    video_path TEXT,
+                    result_json TEXT,
+                    error_message TEXT
+                )
+            ''')
+            # Add queue columns to databases created before the job queue existed
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(analysis_tasks)")}
+            for column, ddl in {**QUEUE_COLUMNS, **CACHE_COLUMNS, **PROGRESS_COLUMNS, **SUMMARY_COLUMNS,
+                                 **ENRICHMENT_COLUMNS}.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE analysis_tasks ADD COLUMN {column} {ddl}")
+            # Queue claims, history and status counts all filter on status and order by age
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON analysis_tasks (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_cache_key ON analysis_tasks (cache_key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_duplicate_of ON analysis_tasks (duplicate_of)")
+            # History filtered by action, newest first
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_action_created ON analysis_tasks (summary_action, created_at)")
+            # Only the few tasks waiting for enrichment are indexed
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tasks_enrichment ON analysis_tasks (created_at) "
+                "WHERE enrichment_status IN ('pending', 'running')"
+            )
+            conn.execute(_BACKFILL_SUMMARY_SQL)
+            # LLM feedback reused across analyses (backend/ai_engine/feedback_cache.py)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS feedback_cache (
+                    key TEXT PRIMARY KEY,
+                    action TEXT NOT NULL,
+                    feedback_json TEXT NOT NULL,
+                    with_images INTEGER NOT NULL,
+                    latency_ms REAL NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_cache_last_used ON feedback_cache (last_used_at)")
 
     def create_task(self, task_id: str, video_path: str):
+        """Enqueue a new analysis task; workers pick it up with claim_task."""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO analysis_tasks (task_id, status, video_path) VALUES (?, ?, ?)",
+                (task_id, "queued", video_path)
+            )
+
+    def update_task_result(self, task_id: str, result: Dict[str, Any], enrich: bool = False,
+                           worker_id: Optional[str] = None) -> bool:
+        """
+        Store a finished result; with `enrich` a successful result is queued for LLM feedback.
+        With `worker_id` the result is only stored while that worker still holds the task's lease;
+        returns False (result dropped) otherwise.
+        """
+        enrichment_status = "pending" if enrich and "error" not in result else None
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                '''
+                UPDATE analysis_tasks
+                SET status = ?, result_json = ?, lease_owner = NULL, lease_expires_at = NULL,
+                    summary_action = ?, summary_score = ?, summary_metrics = ?, summary_feedback = ?,
+                    enrichment_status = ?, enrichment_attempts = 0, enrichment_owner = NULL, enrichment_until = NULL
+                WHERE task_id = ? AND (? IS NULL OR (lease_owner = ? AND status = 'processing'))
+                ''',
+                ("completed", json.dumps(result), *_result_summary(result), enrichment_status, task_id, worker_id, worker_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            conn.execute(_PROPAGATE_DUPLICATES_SQL)
+        return True
+
+    def update_task_error(self, task_id: str, error: str, worker_id: Optional[str] = None) -> bool:
+        """
+        Mark a task failed. With `worker_id` only while that worker still holds the task's lease;
+        returns False (nothing changed) otherwise.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                '''
+                UPDATE analysis_tasks SET status = ?, error_message = ?, lease_owner = NULL, lease_expires_at = NULL
+                WHERE task_id = ? AND (? IS NULL OR (lease_owner = ? AND status = 'processing'))
+                ''',
+                ("failed", error, task_id, worker_id, worker_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            conn.execute(_PROPAGATE_DUPLICATES_SQL)
+        return True
+
+    # --- Job queue ---
+
+    def claim_task(self, worker_id: str, lease_seconds: float, max_attempts: int) -> Optional[Dict[str, Any]]:
+        """
+        Atomically lease the oldest queued task (or one whose lease has expired).
+        Expired leases of tasks that already used `max_attempts` are marked failed instead, so a
+        video that keeps crashing or hanging its worker is not leased again.
+        Returns {task_id, video_path, attempts} or None if the queue is empty.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            exhausted = conn.execute(
+                '''
+                UPDATE analysis_tasks
+                SET status = 'failed', error_message = 'Worker lease expired', lease_owner = NULL, lease_expires_at = NULL
+                WHERE status = 'processing' AND lease_expires_at < ? AND attempts >= ?
+                ''',
+                (now, max_attempts)
+            )
+            if exhausted.rowcount:
+                conn.execute(_PROPAGATE_DUPLICATES_SQL)
+            row = conn.execute(
+                '''
+                UPDATE analysis_tasks
+                SET status = 'processing', lease_owner = ?, lease_expires_at = ?, heartbeat_at = ?, attempts = attempts + 1,
+                    progress_stage = 'started', progress = NULL, progress_detail = NULL, progress_updated_at = ?
+                WHERE task_id = (
+                    SELECT task_id FROM analysis_tasks
+                    WHERE status = 'queued' OR (status = 'processing' AND lease_expires_at < ?)
+                    ORDER BY created_at LIMIT 1
+                )
+                RETURNING task_id, video_path, attempts
+                ''',
+                (worker_id, now + lease_seconds, now, now, now)
+            ).fetchone()
+
+        if row:
+            return {"task_id": row[0], "video_path": row[1], "attempts": row[2]}
+        return None
+
+    def heartbeat(self, task_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extend a lease. Returns False if the worker no longer owns the task."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE analysis_tasks SET heartbeat_at = ?, lease_expires_at = ? WHERE task_id = ? AND lease_owner = ? AND status = 'processing'",
+                (now, now + lease_seconds, task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def update_task_progress(self, task_id: str, stage: str, progress: Optional[float], detail: Dict[str, Any]):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE analysis_tasks SET progress_stage = ?, progress = ?, progress_detail = ?, progress_updated_at = ? WHERE task_id = ? AND status = 'processing'",
+                (stage, progress, json.dumps(detail), time.time(), task_id)
+            )
+
+    def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Status and progress only; cheap enough to poll (no result payload)."""
+        row = self._get_conn().execute(
+            "SELECT status, progress_stage, progress, progress_detail, duplicate_of, enrichment_status FROM analysis_tasks WHERE task_id = ?",
+            (task_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "task_id": task_id,
+            "status": row[0],
+            "stage": row[1],
+            "progress": row[2],
+            "detail": json.loads(row[3]) if row[3] else {},
+            "duplicate_of": row[4],
+            "enrichment_status": row[5],
+        }
+
+    def release_task(self, task_id: str, worker_id: str, error: str, max_attempts: int) -> bool:
+        """
+        Return a failed task to the queue, or mark it failed once its attempts are exhausted.
+        Returns False if `worker_id` no longer holds the task's lease (nothing changed).
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                '''
+                UPDATE analysis_tasks
+                SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END,
+                    error_message = ?, lease_owner = NULL, lease_expires_at = NULL
+                WHERE task_id = ? AND lease_owner = ? AND status = 'processing'
+                ''',
+                (max_attempts, error, task_id, worker_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            conn.execute(_PROPAGATE_DUPLICATES_SQL)
+        return True
+
+    def return_task(self, task_id: str, worker_id: str) -> bool:
+        """
+        Put back a claimed task that never ran (e.g. the pool was full): queued again without
+        using up an attempt. Returns False if `worker_id` no longer holds the task's lease.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                '''
+                UPDATE analysis_tasks
+                SET status = 'queued', attempts = attempts - 1, lease_owner = NULL, lease_expires_at = NULL
+                WHERE task_id = ? AND lease_owner = ? AND status = 'processing'
+                ''',
+                (task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def reclaim_stale_leases(self, max_attempts: int) -> int:
+        """
+        Requeue tasks whose worker died: expired leases, and 'processing' rows
+        without any lease (written before the job queue existed).
+        Tasks that already used up their attempts are marked failed.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                '''
+                UPDATE analysis_tasks
+                SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END,
+                    error_message = CASE WHEN attempts < ? THEN error_message ELSE 'Worker lease expired' END,
+                    lease_owner = NULL, lease_expires_at = NULL
+                WHERE status = 'processing' AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                ''',
+                (max_attempts, max_attempts, now)
+            )
+            count = cursor.rowcount
+            conn.execute(_PROPAGATE_DUPLICATES_SQL)
+        return count
+
+    # --- LLM enrichment queue ---
+
+    def claim_enrichment(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Lease the oldest completed task waiting for LLM feedback (or one whose
+        enrichment lease expired). Returns {task_id, result, attempts} or None.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                '''
+                UPDATE analysis_tasks
+                SET enrichment_status = 'running', enrichment_owner = ?, enrichment_until = ?,
+                    enrichment_attempts = enrichment_attempts + 1
+                WHERE task_id = (
+                    SELECT task_id FROM analysis_tasks
+                    WHERE enrichment_status IN ('pending', 'running') AND duplicate_of IS NULL
+                      AND (enrichment_until IS NULL OR enrichment_until < ?)
+                    ORDER BY created_at LIMIT 1
+                )
+                RETURNING task_id, result_json, enrichment_attempts
+                ''',
+                (worker_id, now + lease_seconds, now)
+            ).fetchone()
+        if row:
+            return {"task_id": row[0], "result": json.loads(row[1]), "attempts": row[2]}
+        return None
+
+    def complete_enrichment(self, task_id: str, worker_id: str, feedback: Dict[str, Any]) -> bool:
+        """
+        Merge LLM feedback into the stored result (and its cache duplicates) in place.
+        Only the feedback fields are replaced, so a concurrent re-scoring is not lost.
+        Returns False if the worker no longer holds the enrichment lease.
+        """
+        positive_feedback = json.dumps(feedback["positive_feedback"])
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE analysis_tasks SET enrichment_status = 'done', enrichment_owner = NULL, enrichment_until = NULL "
+                "WHERE task_id = ? AND enrichment_owner = ? AND enrichment_status = 'running'",
+                (task_id, worker_id)
+            )
+            if cursor.rowcount != 1:
+                return False
+            conn.execute(
+                '''
+                UPDATE analysis_tasks
+                SET result_json = json_set(result_json,
+                        '$.positive_feedback', json(?),
+                        '$.next_training_focus', json(?),
+                        '$.generation_source', 'gemini'),
+                    summary_feedback = ?
+                WHERE status = 'completed' AND (task_id = ? OR duplicate_of = ?)
+                ''',
+                (positive_feedback, json.dumps(feedback["next_training_focus"]), positive_feedback, task_id, task_id)
+            )
+            conn.execute(_PROPAGATE_ENRICHMENT_SQL, (task_id,))
+        return True
+
+    def release_enrichment(self, task_id: str, worker_id: str, max_attempts: int, retry_after: float):
+        """Retry the enrichment after `retry_after` seconds, or give up (keeping rule feedback) after max_attempts."""
+        with self._transaction() as conn:
+            conn.execute(
+                '''
+                UPDATE analysis_tasks
+                SET enrichment_status = CASE WHEN enrichment_attempts < ? THEN 'pending' ELSE 'failed' END,
+                    enrichment_owner = NULL, enrichment_until = ?
+                WHERE task_id = ? AND enrichment_owner = ?
+                ''',
+                (max_attempts, time.time() + retry_after, task_id, worker_id)
+            )
+            conn.execute(_PROPAGATE_ENRICHMENT_SQL, (task_id,))
+
+    def count_enrichment_backlog(self) -> int:
+        return self._get_conn().execute(
+            "SELECT COUNT(*) FROM analysis_tasks WHERE enrichment_status IN ('pending', 'running') AND duplicate_of IS NULL"
+        ).fetchone()[0]
+
+    # --- Result cache ---
+
+    def create_task_deduplicated(self, task_id: str, video_path: str, content_hash: str,
+                                 content_size: int, cache_key: str) -> Dict[str, Any]:
+        """
+        Create a task for an upload, reusing earlier work on the same content:
+          - 'hit':    a completed task has the same cache key; its result is copied.
+          - 'joined': a task with the same key is queued/running; this one waits for it.
+          - 'miss':   nothing to reuse; the task is queued normally.
+        Lookup and insert run in one write transaction, so concurrent identical
+        uploads cannot both miss. Returns {cache_status, duplicate_of, video_path}.
+        """
+        with self._transaction() as conn:
+            # Prefer a finished result, then the oldest in-flight primary
+            row = conn.execute(
+                '''
+                SELECT task_id, status, result_json, video_path,
+                       summary_action, summary_score, summary_metrics, summary_feedback, enrichment_status
+                FROM analysis_tasks
+                WHERE cache_key = ? AND duplicate_of IS NULL AND (
+                    (status = 'completed' AND json_extract(result_json, '$.error') IS NULL)
+                    OR status IN ('queued', 'processing')
+                )
+                ORDER BY status = 'completed' DESC, created_at
+                LIMIT 1
+                ''',
+                (cache_key,)
+            ).fetchone()
+
+            summary = (None, None, None, None)
+            enrichment_status = None
+            if row is None:
+                cache_status, duplicate_of, status, result_json = "miss", None, "queued", None
+            elif row[1] == "completed":
+                cache_status, duplicate_of, status, result_json = "hit", row[0], "completed", row[2]
+                video_path = row[3]
+                summary = row[4:8]
+                # Feedback still being added to the original is merged into this copy too
+                enrichment_status = row[8]
+            else:
+                cache_status, duplicate_of, status, result_json = "joined", row[0], "waiting", None
+                video_path = row[3]
+
+            conn.execute(
+                '''
+                INSERT INTO analysis_tasks
+                    (task_id, status, video_path, result_json, content_hash, content_size, cache_key, cache_status, duplicate_of,
+                     summary_action, summary_score, summary_metrics, summary_feedback, enrichment_status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (task_id, status, video_path, result_json, content_hash, content_size, cache_key, cache_status, duplicate_of,
+                 *summary, enrichment_status)
+            )
+        return {"cache_status": cache_status, "duplicate_of": duplicate_of, "video_path": video_path}
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit rate and analysis work avoided by the result cache."""
+        rows = self._get_conn().execute(
+            '''
+            SELECT cache_status, COUNT(*), COALESCE(SUM(content_size), 0)
+            FROM analysis_tasks WHERE cache_status IS NOT NULL GROUP BY cache_status
+            '''
+        ).fetchall()
+        rows = {status: (count, size) for status, count, size in rows}
+
+        hits, hit_bytes = rows.get("hit", (0, 0))
+        joins, join_bytes = rows.get("joined", (0, 0))
+        misses, _ = rows.get("miss", (0, 0))
+        lookups = hits + joins + misses
+        return {
+            "lookups": lookups,
+            "hits": hits,
+            "joined_in_flight": joins,
+            "misses": misses,
+            "hit_rate": round((hits + joins) / lookups, 4) if lookups else 0.0,
+            # Video bytes that did not have to be decoded and analyzed again
+            "bytes_saved": hit_bytes + join_bytes,
+        }
+
+    # --- Feedback cache ---
+
+    def get_cached_feedback(self, key: str, created_after: float,
+                            touch_before: float) -> Optional[Tuple[Dict[str, Any], float, int]]:
+        """
+        (feedback, latency_ms, tokens) stored under `key` since `created_after`, or None.
+        A hit marks the entry used only if it was last used before `touch_before`, so most
+        lookups are plain reads.
+        """
         conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO analysis_tasks (task_id, status, video_path) VALUES (?, ?, ?)",
-            (task_id, "processing", video_path)
-        )
-        conn.commit()
-        conn.close()
-
-    def update_task_result(self, task_id: str, result: Dict[str, Any]):
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE analysis_tasks SET status = ?, result_json = ? WHERE task_id = ?",
-            ("completed", json.dumps(result), task_id)
-        )
-        conn.commit()
-        conn.close()
-
-    def update_task_error(self, task_id: str, error: str):
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE analysis_tasks SET status = ?, error_message = ? WHERE task_id = ?",
-            ("failed", error, task_id)
-        )
-        conn.commit()
-        conn.close()
+        row = conn.execute(
+            "SELECT feedback_json, latency_ms, tokens, last_used_at FROM feedback_cache WHERE key = ? AND created_at >= ?",
+            (key, created_after)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[3] < touch_before:
+            with self._transaction() as conn:
+                conn.execute("UPDATE feedback_cache SET last_used_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), row[1], row[2]
+
+    def put_cached_feedback(self, key: str, action: str, feedback: Dict[str, Any], with_images: bool,
+                            latency_ms: float, tokens: int, created_after: float, max_entries: int):
+        """Store feedback under `key`, dropping entries older than `created_after` and all but the `max_entries` most recently used."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                '''
+                INSERT OR REPLACE INTO feedback_cache
+                    (key, action, feedback_json, with_images, latency_ms, tokens, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (key, action, json.dumps(feedback, ensure_ascii=False), int(with_images), latency_ms, tokens, now, now)
+            )
+            conn.execute("DELETE FROM feedback_cache WHERE created_at < ?", (created_after,))
+            conn.execute(
+                '''
+                DELETE FROM feedback_cache WHERE key IN (
+                    SELECT key FROM feedback_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+                ''',
+                (max_entries,)
+            )
+
+    def count_cached_feedback(self) -> int:
+        return self._get_conn().execute("SELECT COUNT(*) FROM feedback_cache").fetchone()[0]
+
+    # --- Re-analysis ---
+
+    def iter_completed_results(self, task_ids: Optional[List[str]] = None,
+                               batch_size: int = 500) -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Yield batches of (task_id, result) for completed, successful primary tasks
+        (cache duplicates share their primary's track and are updated with it).
+        Keyset pagination keeps each query cheap while results are rewritten.
+        """
+        base_query = '''
+            SELECT task_id, result_json FROM analysis_tasks
+            WHERE status = 'completed' AND duplicate_of IS NULL
+              AND result_json IS NOT NULL AND json_extract(result_json, '$.error') IS NULL
+        '''
+        if task_ids is not None:
+            for i in range(0, len(task_ids), batch_size):
+                chunk = task_ids[i:i + batch_size]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._get_conn().execute(f"{base_query} AND task_id IN ({placeholders})", chunk).fetchall()
+                if rows:
+                    yield [(task_id, json.loads(result_json)) for task_id, result_json in rows]
+            return
+
+        last_id = ""
+        while True:
+            rows = self._get_conn().execute(
+                f"{base_query} AND task_id > ? ORDER BY task_id LIMIT ?", (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [(task_id, json.loads(result_json)) for task_id, result_json in rows]
+
+    def update_task_results(self, results: List[Tuple[str, Dict[str, Any]]], analysis_version: str):
+        """
+        Rewrite the results of completed tasks (and their cache duplicates) in one transaction.
+        Cache keys move to `analysis_version` so new uploads of the same video hit the new result.
+        A task whose LLM feedback was just replaced by rule feedback is queued for enrichment
+        again, so 'done' never describes feedback that is no longer stored.
+        """
+        params = [(json.dumps(result), *_result_summary(result), analysis_version, task_id, task_id)
+                  for task_id, result in results]
+        rule_feedback = [(task_id,) for task_id, result in results
+                         if "error" not in result and result.get("generation_source") != "gemini"]
+        with self._transaction() as conn:
+            conn.executemany(
+                '''
+                UPDATE analysis_tasks
+                SET result_json = ?,
+                    summary_action = ?, summary_score = ?, summary_metrics = ?, summary_feedback = ?,
+                    cache_key = CASE WHEN content_hash IS NULL THEN cache_key ELSE content_hash || ':' || ? END
+                WHERE status = 'completed' AND (task_id = ? OR duplicate_of = ?)
+                ''',
+                params
+            )
+            # A running enrichment loses its lease too: its feedback was written for the old result
+            conn.executemany(
+                '''
+                UPDATE analysis_tasks
+                SET enrichment_status = 'pending', enrichment_attempts = 0, enrichment_owner = NULL, enrichment_until = NULL
+                WHERE task_id = ? AND status = 'completed' AND enrichment_status IN ('done', 'running')
+                ''',
+                rule_feedback
+            )
+            conn.executemany(_PROPAGATE_ENRICHMENT_SQL, rule_feedback)
+
+    def count_tasks(self, status: str) -> int:
+        return self._get_conn().execute("SELECT COUNT(*) FROM analysis_tasks WHERE status = ?", (status,)).fetchone()[0]
 
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
-        conn = self._get_conn()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        cursor = self._get_conn().cursor()
+        # Row factory on the cursor only: the connection is shared by every method of this thread
+        cursor.row_factory = sqlite3.Row
         cursor.execute("SELECT * FROM analysis_tasks WHERE task_id = ?", (task_id,))
         row = cursor.fetchone()
-        conn.close()
 
         if row:
             result = dict(row)
-            if result['result_json']:
-                result['result'] = json.loads(result['result_json'])
+            # Parsed into 'result'; don't ship the same JSON twice
+            result_json = result.pop('result_json')
+            if result_json:
+                result['result'] = json.loads(result_json)
             else:
                 result['result'] = None
             
@@ -81,24 +723,81 @@ class Database:
             return result
         return None
 
-    def get_recent_tasks(self, limit: int = 10) -> list:
-        conn = self._get_conn()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT * FROM analysis_tasks WHERE status = 'completed' ORDER BY created_at DESC LIMIT ?", 
-            (limit,)
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        
-        results = []
-        for row in rows:
-            task = dict(row)
-            if task['result_json']:
-                task['result'] = json.loads(task['result_json'])
-                results.append(task)
-        return results
-
-# Singleton instance
+    def get_history(self, limit: int = 20, cursor: Optional[Tuple[str, str]] = None, action: Optional[str] = None,
+                    since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Page of completed sessions, newest first, read from the summary columns only.
+        `cursor` is the (created_at, task_id) of the last item of the previous page;
+        `since` (inclusive) and `until` (exclusive) are 'YYYY-MM-DD HH:MM:SS' UTC.
+        Returns {items, next_cursor}.
+        """
+        limit = max(1, min(limit, MAX_HISTORY_PAGE))
+        clauses = ["status = 'completed'", "summary_action IS NOT NULL"]
+        params: List[Any] = []
+        if action:
+            clauses.append("summary_action = ?")
+            params.append(action)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("created_at < ?")
+            params.append(until)
+        if cursor:
+            clauses.append("(created_at, task_id) < (?, ?)")
+            params.extend(cursor)
+
+        rows = self._get_conn().execute(
+            f'''
+            SELECT task_id, created_at, summary_action, summary_score, summary_metrics, summary_feedback
+            FROM analysis_tasks WHERE {" AND ".join(clauses)}
+            ORDER BY created_at DESC, task_id DESC LIMIT ?
+            ''',
+            (*params, limit + 1)
+        ).fetchall()
+
+        items = [
+            {
+                "task_id": task_id,
+                "created_at": created_at,
+                "action": summary_action,
+                "score": summary_score,
+                "metrics": json.loads(metrics) if metrics else {},
+                "positive_feedback": json.loads(feedback) if feedback else None,
+            }
+            for task_id, created_at, summary_action, summary_score, metrics, feedback in rows[:limit]
+        ]
+        next_cursor = (items[-1]["created_at"], items[-1]["task_id"]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+class AsyncDatabase:
+    """
+    Awaitable facade over Database for the API's event loop.
+
+    `await adb.get_task(task_id)` runs db.get_task on a small dedicated thread
+    pool, so disk I/O never blocks the loop and the number of per-thread
+    connections stays bounded.
+    """
+
+    def __init__(self, database: Database, max_workers: int = 8):
+        self._db = database
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    def __getattr__(self, name: str):
+        method = getattr(self._db, name)
+        if not callable(method) or name.startswith("_"):
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            # Run in the caller's context so log lines keep its trace ID
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, partial(context.run, method, *args, **kwargs))
+        return call
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+# Singleton instances
 db = Database()
+adb = AsyncDatabase(db)
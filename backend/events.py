@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-subscriber buffer; progress events are throttled at the source, so this only
+# fills up for a stalled client, in which case the oldest events are dropped
+SUBSCRIBER_QUEUE_SIZE = 64
+
+
+class TaskEventBus:
+    """
+    In-process pub/sub for task status events.
+
+    Publishers may run on any thread (queue worker, pool result callbacks);
+    subscribers are asyncio queues owned by the event loop that created them,
+    e.g. one per open Server-Sent Events stream.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, task_id: str, queue: Optional[asyncio.Queue] = None) -> asyncio.Queue:
+        """
+        Must be called from a running event loop. Pass `queue` to receive the
+        events of several tasks on one queue.
+        """
+        if queue is None:
+            queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(task_id, []).append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = [s for s in self._subscribers.get(task_id, []) if s[1] is not queue]
+            if subscribers:
+                self._subscribers[task_id] = subscribers
+            else:
+                self._subscribers.pop(task_id, None)
+
+    def subscriber_count(self, task_id: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(task_id, []))
+
+    def publish(self, task_id: str, event: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers.get(task_id, []))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, {"task_id": task_id, **event})
+            except RuntimeError:
+                # Loop already closed (server shutting down)
+                self.unsubscribe(task_id, queue)
+
+
+def _offer(queue: asyncio.Queue, event: Dict[str, Any]):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+# Singleton instance
+task_events = TaskEventBus()
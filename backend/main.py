@@ -1,24 +1,34 @@
-import shutil
 import uuid
 import os
+import json
+import base64
 import time
 import asyncio
 import logging
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException
+import threading
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, List, Any
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from typing import Dict, List, Any, Optional
+from datetime import datetime, timezone
 from pydantic import BaseModel
 
 # Import the service from our package
 # Note: When running with uvicorn from root or backend, path resolution might vary.
 # We assume running `uvicorn main:app --reload` from `backend/` directory.
-from backend.ai_engine.service import analysis_service
-from backend.database import db
+from backend.database import adb
+from backend.events import task_events
+from backend.ai_engine.version import analysis_cache_key
+from backend.ai_engine.blob_store import blob_store, is_blob_id
+from backend.ai_engine.profiling import LOG_FORMAT, REGISTRY, enable_trace_logging, set_trace_id, trace
+from backend.worker import enrichment_worker_from_env, register_queue_gauges, worker_from_env
+from backend.uploads import ResumableUploads, SpooledUpload, UploadRejected, safe_filename, spool_multipart
 
-# Configure logging
+# Configure logging (each line carries the request's or task's trace ID)
+enable_trace_logging()
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
+    format=LOG_FORMAT,
     handlers=[
         logging.StreamHandler(),
         logging.FileHandler("app.log")
@@ -32,6 +42,42 @@ app = FastAPI(
     version="0.1.0"
 )
 
+HTTP_SECONDS = REGISTRY.histogram("shuttlecoach_http_request_seconds", "Duration of API requests (until the response is sent)",
+                                  ["method", "route", "status"])
+
+class TelemetryMiddleware:
+    """
+    Times every request into HTTP_SECONDS (labelled by route template, not raw path)
+    and runs it under a trace ID: the client's X-Request-ID or a new one, echoed back.
+    Endpoints that create a task switch the trace ID to the task ID.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        trace_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        status = 500
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", trace_id.encode("latin-1"))]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            with trace(trace_id):
+                await self.app(scope, receive, send_with_trace)
+        finally:
+            route = scope.get("route")
+            HTTP_SECONDS.observe(time.perf_counter() - started, scope["method"],
+                                 getattr(route, "path", "unmatched"), str(status))
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -39,10 +85,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(TelemetryMiddleware)
 
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+# In-progress chunked uploads (MAX_UPLOAD_MB caps every upload, default 500)
+resumable_uploads = ResumableUploads(os.path.join(UPLOAD_DIR, ".partial"))
+
+# Uploads are queued in the analysis_tasks table and drained by queue workers.
+# By default the API hosts one (EMBEDDED_WORKER=1); set EMBEDDED_WORKER=0 and run
+# `python -m backend.worker` on other processes/hosts to scale analysis separately.
+EMBEDDED_WORKER = os.getenv("EMBEDDED_WORKER", "1") == "1"
+# Queued (not yet started) tasks before uploads are rejected with HTTP 503
+MAX_QUEUED_TASKS = int(os.getenv("ANALYSIS_QUEUE_SIZE", "32"))
+DEFAULT_RETRY_AFTER = 30
+
+# LLM feedback is a separate stage after completion (only when Gemini is configured)
+enrichment_worker = enrichment_worker_from_env() if EMBEDDED_WORKER else None
+queue_worker = worker_from_env(enricher=enrichment_worker) if EMBEDDED_WORKER else None
+register_queue_gauges(queue_worker)
 
 async def cleanup_old_files():
     """Delete files older than 24 hours."""
@@ -62,82 +125,384 @@ async def cleanup_old_files():
                     logger.info(f"Deleted old file: {filename}")
                 except Exception as e:
                     logger.error(f"Error deleting file {filename}: {e}")
+    count += resumable_uploads.cleanup()
     logger.info(f"Cleanup finished. Deleted {count} files.")
 
 @app.on_event("startup")
 async def startup_event():
     # Run cleanup on startup
     await cleanup_old_files()
+    if queue_worker:
+        # Spawn and warm up the analysis workers off the event loop
+        await asyncio.to_thread(queue_worker.pool.start)
+        threading.Thread(target=queue_worker.run, name="queue-worker", daemon=True).start()
+    if enrichment_worker:
+        threading.Thread(target=enrichment_worker.run, name="enrichment-worker", daemon=True).start()
 
-def process_analysis_task(task_id: str, file_path: str):
-    """
-    Background task to run the AI analysis.
-    """
-    try:
-        logger.info(f"Starting analysis for task {task_id}")
-        # MVP: We now let the AI engine automatically detect the action type.
-        # So we pass action_type=None to let the detector work.
-        result = analysis_service.analyze_video(file_path, action_type=None)
-        
-        db.update_task_result(task_id, result)
-        logger.info(f"Analysis completed for task {task_id}")
-    except Exception as e:
-        logger.error(f"Analysis failed for task {task_id}: {e}")
-        db.update_task_error(task_id, str(e))
+@app.on_event("shutdown")
+async def shutdown_event():
+    if queue_worker:
+        # Unfinished tasks keep their lease and are reclaimed after it expires
+        queue_worker.stop()
+        queue_worker.pool.shutdown(wait=False)
+    if enrichment_worker:
+        # Running enrichments keep their lease and are retried after it expires
+        enrichment_worker.stop()
+    adb.shutdown()
+
+@app.exception_handler(UploadRejected)
+async def upload_rejected_handler(request: Request, exc: UploadRejected):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+def _service_unavailable(retry_after: int) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Analysis queue is full, please retry later.",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+async def _check_queue_capacity():
+    """Reject early when the analysis queue is full."""
+    queued = await adb.count_tasks("queued")
+    if queued >= MAX_QUEUED_TASKS:
+        retry_after = queue_worker.pool.estimate_wait(queued + 1) if queue_worker else DEFAULT_RETRY_AFTER
+        raise _service_unavailable(retry_after)
+
+async def _enqueue_analysis(task_id: str, file_path: str, upload: SpooledUpload) -> Dict[str, Any]:
+    # Enqueue in DB unless the same video was already analyzed (or is being analyzed)
+    # with the current analysis version; a queue worker claims new tasks.
+    cached = await adb.create_task_deduplicated(
+        task_id, file_path, upload.sha256, upload.size, analysis_cache_key(upload.sha256)
+    )
+    if cached["cache_status"] == "miss":
+        logger.info(f"Queued analysis for task {task_id}")
+        if queue_worker:
+            queue_worker.notify()
+    else:
+        # The stored copy is not needed: the result comes from the original task
+        logger.info(f"Task {task_id} is a cache {cached['cache_status']} of {cached['duplicate_of']}")
+        try:
+            await asyncio.to_thread(os.remove, file_path)
+        except OSError as e:
+            logger.warning(f"Could not remove duplicate upload {file_path}: {e}")
+    return cached
+
+def _upload_response(task_id: str, upload: SpooledUpload, cached: Dict[str, Any]) -> Dict[str, Any]:
+    message = "Upload successful, analysis started."
+    if cached["cache_status"] == "hit":
+        message = "Upload successful, this video was already analyzed."
+    return {
+        "task_id": task_id,
+        "content_sha256": upload.sha256,
+        "cache_status": cached["cache_status"],
+        "duplicate_of": cached["duplicate_of"],
+        "message": message,
+    }
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to ShuttleCoach AI API"}
 
 @app.post("/api/upload")
-async def upload_video(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def upload_video(request: Request):
+    """multipart/form-data with the video in the `file` field, parsed as it streams in."""
+    await _check_queue_capacity()
+
     # Generate unique ID
     task_id = str(uuid.uuid4())
+    set_trace_id(task_id)
     
-    # Save file
-    file_path = os.path.join(UPLOAD_DIR, f"{task_id}_{file.filename}")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Save file off the event loop (size cap, container sniffing, content hash) while the body arrives
+    upload = await spool_multipart(
+        request.stream(), request.headers.get("content-type"), request.headers.get("content-length"),
+        lambda filename: os.path.join(UPLOAD_DIR, f"{task_id}_{safe_filename(filename)}"))
         
-    # Initialize status in DB
-    db.create_task(task_id, file_path)
-    
-    # Trigger background task
-    background_tasks.add_task(process_analysis_task, task_id, file_path)
+    cached = await _enqueue_analysis(task_id, upload.path, upload)
     
-    return {"task_id": task_id, "message": "Upload successful, analysis started."}
+    return _upload_response(task_id, upload, cached)
+
+# --- Resumable chunked uploads ---
+# 1. POST /api/uploads                       -> upload_id
+# 2. PUT  /api/uploads/{upload_id}?offset=N  raw chunk bytes, repeated (409 + current offset on mismatch)
+# 3. GET  /api/uploads/{upload_id}           -> current offset, to resume after a dropped connection
+# 4. POST /api/uploads/{upload_id}/complete  -> task_id
+
+class UploadInitRequest(BaseModel):
+    filename: str
+    size: Optional[int] = None
+    content_type: Optional[str] = None
+
+@app.post("/api/uploads")
+async def create_resumable_upload(request: UploadInitRequest):
+    await _check_queue_capacity()
+    return await resumable_uploads.create(request.filename, request.size, request.content_type)
+
+@app.get("/api/uploads/{upload_id}")
+async def get_resumable_upload(upload_id: str):
+    return await resumable_uploads.status(upload_id)
+
+@app.put("/api/uploads/{upload_id}")
+async def append_resumable_upload(upload_id: str, offset: int, request: Request):
+    try:
+        new_offset = await resumable_uploads.append(upload_id, offset, request.stream())
+    except UploadRejected as e:
+        if e.status_code != 409:
+            raise
+        current = await resumable_uploads.status(upload_id)
+        return JSONResponse(status_code=409, content={"detail": e.detail, "offset": current["offset"]})
+    return {"upload_id": upload_id, "offset": new_offset}
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_resumable_upload(upload_id: str):
+    await _check_queue_capacity()
+    task_id = str(uuid.uuid4())
+    set_trace_id(task_id)
+    filename = await asyncio.to_thread(resumable_uploads.filename, upload_id)
+    file_path = os.path.join(UPLOAD_DIR, f"{task_id}_{filename}")
+    upload = await resumable_uploads.complete(upload_id, file_path)
+
+    cached = await _enqueue_analysis(task_id, file_path, upload)
+
+    return _upload_response(task_id, upload, cached)
 
 @app.get("/api/result/{task_id}")
 async def get_result(task_id: str):
-    task = db.get_task(task_id)
+    task = await adb.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
+class ReanalyzeRequest(BaseModel):
+    task_ids: List[str]
+    use_llm: bool = False
+    # Re-apply the rules to the stored metrics only (no tracks needed)
+    rules_only: bool = False
+
+# Larger backlogs go through `python -m backend.reanalyze`
+MAX_REANALYZE_TASKS = 1000
+
+@app.post("/api/reanalyze")
+async def reanalyze(request: ReanalyzeRequest):
+    """Re-score finished tasks from their stored landmark tracks with the current rules."""
+    if len(request.task_ids) > MAX_REANALYZE_TASKS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_REANALYZE_TASKS} tasks per request")
+    if request.rules_only and request.use_llm:
+        raise HTTPException(status_code=400, detail="rules_only re-scoring cannot regenerate LLM feedback")
+    from backend.reanalyze import reanalyze_tasks
+    return await asyncio.to_thread(reanalyze_tasks, request.task_ids, use_llm=request.use_llm,
+                                   rules_only=request.rules_only)
+
+@app.get("/api/stats/cache")
+async def get_cache_stats():
+    return await adb.get_cache_stats()
+
+@app.get("/api/stats/feedback-cache")
+async def get_feedback_cache_stats():
+    from backend.ai_engine.feedback_cache import feedback_cache
+    return await asyncio.to_thread(feedback_cache.stats)
+
+# Blobs are content-addressed, so a URL always maps to the same bytes
+BLOB_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text format: request, stage, database and LLM histograms, task counters, queue gauges."""
+    # Gauges query the database
+    body = await asyncio.to_thread(REGISTRY.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/blobs/{blob_id}")
+async def get_blob(blob_id: str, request: Request):
+    if not is_blob_id(blob_id):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    etag = f'"{blob_id}"'
+    headers = {"ETag": etag, "Cache-Control": BLOB_CACHE_CONTROL}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    path = blob_store.path(blob_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+# --- Task status stream (Server-Sent Events) ---
+# `progress` events carry {status, stage, progress, detail}; a `result` event carries
+# the same payload as /api/result. If LLM feedback is still being added, the stream
+# stays open for a final `enriched` event with the upgraded result.
+
+TERMINAL_STATUSES = ("completed", "failed")
+ENRICHING_STATUSES = ("pending", "running")
+# Without pushed events (task run by another process, or no news) the DB is checked this often
+STATUS_POLL_INTERVAL = 2.0
+KEEPALIVE_INTERVAL = 15.0
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/api/tasks/{task_id}/events")
+async def stream_task_events(task_id: str, request: Request):
+    status = await adb.get_task_status(task_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    async def events():
+        # Cache duplicates finish together with the task they joined
+        queue = task_events.subscribe(task_id)
+        if status["duplicate_of"]:
+            task_events.subscribe(status["duplicate_of"], queue)
+        try:
+            # Re-read after subscribing so no update between the two is lost
+            current = await adb.get_task_status(task_id)
+            last_sent = None
+            result_sent = False
+            quiet = 0.0
+            while True:
+                if current["status"] in TERMINAL_STATUSES:
+                    enriching = current["enrichment_status"] in ENRICHING_STATUSES
+                    if not result_sent:
+                        yield _sse("result", await adb.get_task(task_id))
+                        result_sent = True
+                    elif not enriching:
+                        yield _sse("enriched", await adb.get_task(task_id))
+                    if not enriching:
+                        return
+                elif current != last_sent:
+                    yield _sse("progress", current)
+                    last_sent, quiet = current, 0.0
+
+                try:
+                    event = await asyncio.wait_for(queue.get(), STATUS_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    event = None
+                if await request.is_disconnected():
+                    return
+
+                if event is None:
+                    quiet += STATUS_POLL_INTERVAL
+                    if quiet >= KEEPALIVE_INTERVAL:
+                        yield ": keepalive\n\n"
+                        quiet = 0.0
+                    current = await adb.get_task_status(task_id)
+                elif event["task_id"] == task_id and event["status"] not in TERMINAL_STATUSES:
+                    current = {**current, **{k: event[k] for k in ("status", "stage", "progress", "detail")}}
+                else:
+                    # Final states (and the joined task's events) are read back from the DB
+                    current = await adb.get_task_status(task_id)
+        finally:
+            task_events.unsubscribe(task_id, queue)
+            if status["duplicate_of"]:
+                task_events.unsubscribe(status["duplicate_of"], queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _parse_history_time(value: Optional[str], name: str) -> Optional[str]:
+    """ISO date/datetime -> the 'YYYY-MM-DD HH:MM:SS' (UTC) format of created_at."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+def _encode_cursor(cursor) -> Optional[str]:
+    if not cursor:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+def _decode_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), str(task_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/history")
-async def get_history():
-    return db.get_recent_tasks(limit=20)
+async def get_history(limit: int = 20, cursor: Optional[str] = None, action: Optional[str] = None,
+                      since: Optional[str] = None, until: Optional[str] = None):
+    """
+    Completed sessions (summary only: action, score, metrics, feedback), newest first.
+    Pass `next_cursor` back as `cursor` for the next page; `since`/`until` are ISO dates.
+    """
+    page = await adb.get_history(
+        limit=limit,
+        cursor=_decode_cursor(cursor),
+        action=action,
+        since=_parse_history_time(since, "since"),
+        until=_parse_history_time(until, "until"),
+    )
+    page["next_cursor"] = _encode_cursor(page["next_cursor"])
+    return page
 
 class ChatRequest(BaseModel):
     task_id: str
     message: str
-    history: List[Dict[str, str]]
+    # Only used to seed a session the server does not have (e.g. after a restart); may be omitted
+    history: List[Dict[str, str]] = []
     language: str = "zh"
 
-@app.post("/api/chat")
-async def chat_with_coach_endpoint(request: ChatRequest):
-    # 1. Get analysis result from DB
-    task = db.get_task(request.task_id)
+_chat_sessions = None
+
+def _get_chat_sessions():
+    global _chat_sessions
+    if _chat_sessions is None:
+        from backend.ai_engine.llm_client import gemini_coach
+        from backend.chat_sessions import chat_sessions_from_env
+        _chat_sessions = chat_sessions_from_env(gemini_coach)
+    return _chat_sessions
+
+async def _chat_session(request: ChatRequest):
+    """The server-side session for this task, built from the task row only on first use."""
+    sessions = _get_chat_sessions()
+    session = sessions.get(request.task_id, request.language)
+    if session is not None:
+        return session
+    task = await adb.get_task(request.task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    analysis_result = task.get("result")
-    if not analysis_result:
-         # If no result yet, we can't chat about it.
-         return {"reply": "分析尚未完成，请稍后再试。"}
-    
-    # 2. Call Gemini
-    from backend.ai_engine.llm_client import gemini_coach
-    response = gemini_coach.chat_with_coach(analysis_result, request.message, request.history, request.language)
-    
-    return {"reply": response}
+    if not task.get("result"):
+        # If no result yet, we can't chat about it.
+        return None
+    return sessions.create(request.task_id, request.language, task["result"], request.history)
+
+@app.post("/api/chat")
+async def chat_with_coach_endpoint(request: ChatRequest):
+    session = await _chat_session(request)
+    if session is None:
+        return {"reply": "分析尚未完成，请稍后再试。"}
+    # Awaited on the client's own loop; bounded by LLM_CHAT_TIMEOUT
+    reply = "".join([chunk async for chunk in _get_chat_sessions().send(session, request.message)])
+    return {"reply": reply}
+
+@app.post("/api/chat/stream")
+async def stream_chat_with_coach(request: ChatRequest):
+    """Same as /api/chat as Server-Sent Events: `token` events with {text}, then `done` with {reply}."""
+    session = await _chat_session(request)
+
+    async def events():
+        if session is None:
+            yield _sse("done", {"reply": "分析尚未完成，请稍后再试。"})
+            return
+        reply = []
+        async for chunk in _get_chat_sessions().send(session, request.message):
+            reply.append(chunk)
+            yield _sse("token", {"text": chunk})
+        yield _sse("done", {"reply": "".join(reply)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.delete("/api/chat/{task_id}")
+async def reset_chat(task_id: str):
+    _get_chat_sessions().reset(task_id)
+    return {"status": "reset"}
@@ -0,0 +1,128 @@
+"""
+Re-score stored analyses from their landmark tracks, without decoding any video.
+
+Use after changing issue_rules.json, level_thresholds.json or
+action_scoring_config.json (or the metric code):
+    python -m backend.reanalyze                  # every completed task with a stored track
+    python -m backend.reanalyze TASK_ID [...]    # selected tasks
+
+Options:
+    --rules-only    re-apply rules/thresholds/scoring to the stored metrics, batched
+                    per action, without loading tracks (enough after a config-only change)
+    --workers N     re-score in N processes (default: 1)
+    --batch-size N  tasks per database read/write batch (default: 500)
+    --llm           regenerate feedback with Gemini (slow; rules-only by default)
+    --dry-run       report what would change without writing results
+"""
+import os
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.database import db
+from backend.ai_engine.version import analysis_version
+
+logger = logging.getLogger(__name__)
+
+
+def _rescore_batch(batch: List[Tuple[str, Dict[str, Any]]], use_llm: bool, rules_only: bool = False) -> Dict[str, Any]:
+    """Re-score one batch of (task_id, previous result); runs in the caller or a worker process."""
+    from backend.ai_engine.service import analysis_service
+    from backend.ai_engine.track_store import track_store
+
+    if rules_only:
+        rescored = analysis_service.rescore_results([previous for _, previous in batch])
+        changed = sum(new.get("score") != previous.get("score") for (_, previous), new in zip(batch, rescored))
+        results = [(task_id, new) for (task_id, _), new in zip(batch, rescored)]
+        return {"results": results, "missing_track": 0, "failed": 0, "changed": changed}
+
+    results = []
+    missing = failed = changed = 0
+    for task_id, previous in batch:
+        try:
+            stored = track_store.load(task_id)
+            if stored is None:
+                missing += 1
+                continue
+            track, fps = stored
+            result = analysis_service.reanalyze_track(track, fps, previous, use_llm=use_llm)
+        except Exception as e:
+            logger.error(f"Re-analysis failed for task {task_id}: {e}")
+            failed += 1
+            continue
+        if result.get("score") != previous.get("score") or result.get("action") != previous.get("action"):
+            changed += 1
+        results.append((task_id, result))
+    return {"results": results, "missing_track": missing, "failed": failed, "changed": changed}
+
+
+def reanalyze_tasks(task_ids: Optional[List[str]] = None, workers: int = 1, batch_size: int = 500,
+                    use_llm: bool = False, dry_run: bool = False, rules_only: bool = False) -> Dict[str, Any]:
+    """
+    Re-score completed tasks (all of them, or `task_ids`) from their stored tracks
+    (or only their stored metrics with `rules_only`) and write the new results back.
+    Returns a summary of what was done.
+    """
+    if rules_only and use_llm:
+        raise ValueError("rules_only re-scoring cannot regenerate LLM feedback")
+    started = time.perf_counter()
+    summary = {"scanned": 0, "rescored": 0, "changed": 0, "missing_track": 0, "failed": 0}
+    batches = db.iter_completed_results(task_ids, batch_size=batch_size)
+
+    def _collect(outcome: Dict[str, Any], size: int):
+        summary["scanned"] += size
+        summary["rescored"] += len(outcome["results"])
+        for key in ("changed", "missing_track", "failed"):
+            summary[key] += outcome[key]
+        if outcome["results"] and not dry_run:
+            db.update_task_results(outcome["results"], analysis_version())
+        logger.info(f"Re-analysis progress: {summary['scanned']} scanned, {summary['rescored']} re-scored")
+
+    if workers <= 1:
+        for batch in batches:
+            _collect(_rescore_batch(batch, use_llm, rules_only), len(batch))
+    else:
+        # Keep a bounded number of batches in flight so memory stays flat on large backlogs
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            pending = []
+            for batch in batches:
+                pending.append((executor.submit(_rescore_batch, batch, use_llm, rules_only), len(batch)))
+                if len(pending) >= workers * 2:
+                    future, size = pending.pop(0)
+                    _collect(future.result(), size)
+            for future, size in pending:
+                _collect(future.result(), size)
+
+    summary["elapsed_sec"] = round(time.perf_counter() - started, 3)
+    summary["dry_run"] = dry_run
+    summary["rules_only"] = rules_only
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored analyses from their landmark tracks.")
+    parser.add_argument("task_ids", nargs="*", help="Tasks to re-score (default: all completed tasks)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--llm", action="store_true", help="Regenerate feedback with Gemini")
+    parser.add_argument("--rules-only", action="store_true", help="Re-score the stored metrics without the tracks")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    summary = reanalyze_tasks(
+        args.task_ids or None,
+        workers=args.workers or os.cpu_count() or 1,
+        batch_size=args.batch_size,
+        use_llm=args.llm,
+        dry_run=args.dry_run,
+        rules_only=args.rules_only,
+    )
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
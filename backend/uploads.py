@@ -0,0 +1,364 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, Callable, Dict, Optional, Any
+
+from python_multipart.multipart import MultipartParser, MultipartParseError, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "500")) * 1024 * 1024
+# Incomplete resumable uploads older than this are discarded by cleanup
+PARTIAL_UPLOAD_TTL = 24 * 3600
+
+ALLOWED_CONTENT_TYPES = ("video/", "application/octet-stream")
+# Leading bytes that identify every supported container (MPEG-TS: sync bytes of the first two packets)
+SNIFF_BYTES = 189
+# Multipart boundaries and part headers allowed on top of MAX_UPLOAD_BYTES
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """An upload was refused; carries the HTTP status to report."""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_container(head: bytes) -> Optional[str]:
+    """Identify the video container from the first bytes of the file."""
+    if len(head) >= 12 and head[4:8] == b"ftyp":
+        return "mp4"  # MP4 / MOV / 3GP (ISO base media)
+    if len(head) >= 8 and head[4:8] in (b"moov", b"mdat", b"wide", b"free"):
+        return "mov"  # Older QuickTime files without ftyp
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"  # Matroska / WebM (EBML)
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "avi"
+    if len(head) >= 189 and head[0] == 0x47 and head[188] == 0x47:
+        return "mpegts"
+    return None
+
+
+def check_container(head: bytes, complete: bool = False) -> Optional[str]:
+    """
+    Container of a file starting with `head`, or None while too few bytes arrived
+    to tell (`complete`: the file has no more bytes). Rejects anything else.
+    """
+    container = sniff_container(head)
+    if container is None and (complete or len(head) >= SNIFF_BYTES):
+        raise UploadRejected(415, "File does not look like a supported video container")
+    return container
+
+
+def check_content_type(content_type: Optional[str]):
+    if content_type and not content_type.startswith(ALLOWED_CONTENT_TYPES):
+        raise UploadRejected(415, f"Unsupported content type: {content_type}")
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    name = os.path.basename(filename or "video")
+    return "".join(c for c in name if c.isalnum() or c in "._-") or "video"
+
+
+class SpooledUpload:
+    """A finished upload on disk."""
+    def __init__(self, path: str, size: int, sha256: str, container: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.container = container
+
+
+class _UploadWriter:
+    """Writes one uploaded file, hashing it, capping its size and sniffing its container on the fly."""
+
+    def __init__(self, dest_path: str, max_bytes: int):
+        self.dest_path = dest_path
+        self.max_bytes = max_bytes
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self.container: Optional[str] = None
+        self.out = open(dest_path, "wb")
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadRejected(413, f"Upload exceeds {self.max_bytes // (1024 * 1024)} MB limit")
+        if self.container is None:
+            # The first network chunks can be shorter than a container signature
+            self.head = (self.head + data[:SNIFF_BYTES])[:SNIFF_BYTES]
+            self.container = check_container(self.head)
+        self.hasher.update(data)
+        self.out.write(data)
+
+    def finish(self) -> SpooledUpload:
+        self.out.close()
+        if self.size == 0:
+            raise UploadRejected(400, "Empty upload")
+        if self.container is None:
+            self.container = check_container(self.head, complete=True)
+        return SpooledUpload(self.dest_path, self.size, self.hasher.hexdigest(), self.container)
+
+    def abort(self):
+        self.out.close()
+        if os.path.exists(self.dest_path):
+            os.remove(self.dest_path)
+
+
+class _MultipartSpool:
+    """
+    Push parser of a multipart/form-data body that writes the file part named
+    `field` straight to disk; other parts are skipped. The destination path is
+    chosen from the part's filename once its headers have arrived.
+    """
+
+    def __init__(self, boundary: bytes, field: str, dest_path_for: Callable[[str], str], max_bytes: int):
+        self.field = field
+        self.dest_path_for = dest_path_for
+        self.max_bytes = max_bytes
+        self.writer: Optional[_UploadWriter] = None
+        self.upload: Optional[SpooledUpload] = None
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        # Whether the current part is the file being spooled
+        self._in_file = False
+        self.parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk: bytes):
+        try:
+            self.parser.write(chunk)
+        except MultipartParseError as e:
+            raise UploadRejected(400, f"Malformed multipart body: {e}")
+
+    def finish(self) -> SpooledUpload:
+        self.parser.finalize()
+        if self.upload is None:
+            raise UploadRejected(400, f"Missing or incomplete file field '{self.field}'")
+        return self.upload
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.abort()
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Only the first part with the expected name is taken
+        self._in_file = options.get(b"name") == self.field.encode() and self.writer is None
+        if not self._in_file:
+            return
+        check_content_type(self._headers.get(b"content-type", b"").decode("latin-1") or None)
+        filename = options.get(b"filename", b"").decode("utf-8", "replace")
+        self.writer = _UploadWriter(self.dest_path_for(filename), self.max_bytes)
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self.writer.write(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_file:
+            self.upload = self.writer.finish()
+            self._in_file = False
+
+
+async def spool_multipart(chunks: AsyncIterator[bytes], content_type: Optional[str], content_length: Optional[str],
+                          dest_path_for: Callable[[str], str], field: str = "file",
+                          max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """
+    Persist the `field` file of a streamed multipart/form-data request body
+    without buffering it first. Oversized requests are refused from their
+    Content-Length before any byte is read; the body is then parsed chunk by
+    chunk as it arrives, so the size cap and container sniffing stop a bad
+    upload early and the file is written to disk once. Parsing, hashing and
+    writing run in worker threads (they release the GIL), off the event loop.
+    """
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD:
+        raise UploadRejected(413, f"Upload exceeds {max_bytes // (1024 * 1024)} MB limit")
+    mime, options = parse_options_header(content_type or "")
+    if mime != b"multipart/form-data" or not options.get(b"boundary"):
+        raise UploadRejected(400, "Expected a multipart/form-data body")
+
+    spool = _MultipartSpool(options[b"boundary"], field, dest_path_for, max_bytes)
+    try:
+        async for chunk in chunks:
+            if chunk:
+                await asyncio.to_thread(spool.feed, chunk)
+        return await asyncio.to_thread(spool.finish)
+    except BaseException:
+        await asyncio.to_thread(spool.abort)
+        raise
+
+
+def _hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ResumableUploads:
+    """
+    Chunked, resumable uploads for flaky connections.
+
+    Each upload is a `.part` file plus a small `.json` sidecar under `partial_dir`,
+    so an interrupted client can ask for the current offset and continue, even
+    across server restarts. Chunks must be appended in order.
+    """
+
+    def __init__(self, partial_dir: str, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.partial_dir = partial_dir
+        self.max_bytes = max_bytes
+        os.makedirs(partial_dir, exist_ok=True)
+        # Serializes appends and completion per upload within this process, and when each lock was last used
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_used: Dict[str, float] = {}
+
+    def _paths(self, upload_id: str):
+        if not upload_id or any(c not in "0123456789abcdef" for c in upload_id):
+            raise UploadRejected(404, "Upload not found")
+        base = os.path.join(self.partial_dir, upload_id)
+        return base + ".part", base + ".json"
+
+    def _load_meta(self, upload_id: str) -> Dict[str, Any]:
+        part_path, meta_path = self._paths(upload_id)
+        if not os.path.exists(meta_path):
+            raise UploadRejected(404, "Upload not found")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["offset"] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        return meta
+
+    async def create(self, filename: str, total_size: Optional[int], content_type: Optional[str]) -> Dict[str, Any]:
+        check_content_type(content_type)
+        if total_size is not None and total_size > self.max_bytes:
+            raise UploadRejected(413, f"Upload exceeds {self.max_bytes // (1024 * 1024)} MB limit")
+
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._paths(upload_id)
+        meta = {"filename": safe_filename(filename), "total_size": total_size, "created_at": time.time()}
+
+        def _create():
+            open(part_path, "wb").close()
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        await asyncio.to_thread(_create)
+        return {"upload_id": upload_id, "offset": 0, "chunk_size": UPLOAD_CHUNK_SIZE, "max_bytes": self.max_bytes}
+
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        now = time.time()
+        if upload_id not in self._locks:
+            # Uploads idle for longer than PARTIAL_UPLOAD_TTL are abandoned: drop their locks
+            for stale in [other for other, used in self._lock_used.items()
+                          if now - used > PARTIAL_UPLOAD_TTL and not self._locks[other].locked()]:
+                del self._locks[stale], self._lock_used[stale]
+            self._locks[upload_id] = asyncio.Lock()
+        self._lock_used[upload_id] = now
+        return self._locks[upload_id]
+
+    async def status(self, upload_id: str) -> Dict[str, Any]:
+        meta = await asyncio.to_thread(self._load_meta, upload_id)
+        return {"upload_id": upload_id, "offset": meta["offset"], "total_size": meta["total_size"]}
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """Append a streamed request body at `offset`; returns the new offset."""
+        async with self._lock(upload_id):
+            meta = await asyncio.to_thread(self._load_meta, upload_id)
+            if offset != meta["offset"]:
+                raise UploadRejected(409, f"Offset mismatch, expected {meta['offset']}")
+
+            part_path, _ = self._paths(upload_id)
+            limit = min(self.max_bytes, meta["total_size"] or self.max_bytes)
+            size = offset
+            # Sniff once enough leading bytes arrived, possibly over several chunks or appends
+            head = await asyncio.to_thread(self._head, part_path) if offset < SNIFF_BYTES else b""
+            sniffed = sniff_container(head) is not None
+            out = await asyncio.to_thread(open, part_path, "ab")
+            try:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    if not sniffed and size < SNIFF_BYTES:
+                        head = (head + chunk[:SNIFF_BYTES])[:SNIFF_BYTES]
+                        sniffed = check_container(head) is not None
+                    size += len(chunk)
+                    if size > limit:
+                        raise UploadRejected(413, f"Upload exceeds {limit} bytes")
+                    await asyncio.to_thread(out.write, chunk)
+            except BaseException:
+                # Drop the partial chunk so the client can resume from the last good offset
+                await asyncio.to_thread(out.truncate, offset)
+                raise
+            finally:
+                await asyncio.to_thread(out.close)
+            return size
+
+    async def complete(self, upload_id: str, dest_path: str) -> SpooledUpload:
+        """Verify and move a finished upload to `dest_path`."""
+        async with self._lock(upload_id):
+            meta = await asyncio.to_thread(self._load_meta, upload_id)
+            if meta["offset"] == 0:
+                raise UploadRejected(400, "Empty upload")
+            if meta["total_size"] is not None and meta["offset"] != meta["total_size"]:
+                raise UploadRejected(409, f"Upload incomplete: {meta['offset']} of {meta['total_size']} bytes")
+
+            part_path, meta_path = self._paths(upload_id)
+
+            def _finish() -> SpooledUpload:
+                container = check_container(self._head(part_path), complete=True)
+                sha256 = _hash_file(part_path)
+                os.replace(part_path, dest_path)
+                os.remove(meta_path)
+                return SpooledUpload(dest_path, meta["offset"], sha256, container)
+            result = await asyncio.to_thread(_finish)
+        self._locks.pop(upload_id, None)
+        self._lock_used.pop(upload_id, None)
+        return result
+
+    @staticmethod
+    def _head(part_path: str) -> bytes:
+        with open(part_path, "rb") as f:
+            return f.read(SNIFF_BYTES)
+
+    def filename(self, upload_id: str) -> str:
+        return self._load_meta(upload_id)["filename"]
+
+    def cleanup(self, max_age: float = PARTIAL_UPLOAD_TTL) -> int:
+        """Delete abandoned partial uploads."""
+        cutoff = time.time() - max_age
+        count = 0
+        for name in os.listdir(self.partial_dir):
+            path = os.path.join(self.partial_dir, name)
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                count += 1
+        return count
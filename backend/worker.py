@@ -0,0 +1,343 @@
+"""
+Standalone analysis worker: drains the analysis_tasks queue in the SQLite database.
+
+Run one or more of these next to (or instead of) the API's embedded worker:
+    python -m backend.worker
+
+Configuration (environment):
+    ANALYSIS_WORKERS       worker processes in this host's pool (default: CPU count)
+    ANALYSIS_LEASE_SECONDS visibility timeout of a claimed task (default: 120)
+    ANALYSIS_MAX_ATTEMPTS  attempts before a task is marked failed (default: 3)
+    ENRICHMENT_WORKERS     concurrent LLM feedback requests (default: LLM_MAX_CONCURRENCY)
+    METRICS_PORT           serve this worker's Prometheus metrics on :PORT/metrics (default: off)
+
+Tasks complete with rule-based feedback; when Gemini is configured an
+EnrichmentWorker then upgrades the stored feedback in place.
+"""
+import os
+import uuid
+import socket
+import signal
+import logging
+import threading
+import contextvars
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Set
+
+from backend.ai_engine.profiling import LOG_FORMAT, REGISTRY, enable_trace_logging, trace
+from backend.ai_engine.worker_pool import AnalysisWorkerPool, PoolSaturated
+from backend.database import db
+from backend.events import task_events
+
+logger = logging.getLogger(__name__)
+
+# outcome: completed | retried (released for another attempt) | failed | abandoned (lease lost)
+TASKS = REGISTRY.counter("shuttlecoach_tasks_total", "Finished analysis attempts by outcome", ["outcome"])
+# outcome: completed | retried | failed (kept the rule-based feedback)
+ENRICHMENTS = REGISTRY.counter("shuttlecoach_enrichments_total", "Finished LLM feedback attempts by outcome", ["outcome"])
+# Task statuses that make up the queue (completed/failed are history)
+QUEUE_STATUSES = ("queued", "waiting", "processing")
+
+
+class QueueWorker:
+    """
+    Claims queued tasks from the database and runs them on an AnalysisWorkerPool.
+
+    Claimed tasks hold a lease that a heartbeat thread keeps extending while the
+    analysis runs; if this process dies the lease expires and any worker
+    (including this one after a restart) reclaims the task.
+    """
+
+    def __init__(self, pool: AnalysisWorkerPool, worker_id: Optional[str] = None,
+                 lease_seconds: float = 120.0, poll_interval: float = 1.0, max_attempts: int = 3,
+                 enricher: Optional["EnrichmentWorker"] = None):
+        self.pool = pool
+        # With an enricher, completed results are queued for LLM feedback
+        self.enricher = enricher
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._active: Dict[str, Future] = {}
+        # Running tasks whose lease was lost: their results are dropped
+        self._abandoned: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        # Stage progress is stored for other processes and pushed to local subscribers
+        pool.set_progress_handler(self._on_progress)
+
+    def notify(self):
+        """Wake the dispatcher immediately (e.g. right after an upload was enqueued)."""
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def run(self):
+        reclaimed = db.reclaim_stale_leases(self.max_attempts)
+        if reclaimed:
+            logger.info(f"Reclaimed {reclaimed} stale analysis tasks")
+
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="queue-heartbeat", daemon=True)
+        heartbeat.start()
+        logger.info(f"Queue worker {self.worker_id} started")
+
+        while not self._stop.is_set():
+            if not self.pool.has_capacity() or not self._dispatch_one():
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+        logger.info(f"Queue worker {self.worker_id} stopping")
+
+    def _dispatch_one(self) -> bool:
+        task = db.claim_task(self.worker_id, self.lease_seconds, self.max_attempts)
+        if not task:
+            return False
+
+        task_id = task["task_id"]
+        with trace(task_id):
+            logger.info(f"Claimed task {task_id} (attempt {task['attempts']})")
+            try:
+                # MVP: We let the AI engine automatically detect the action type (action_type=None).
+                future = self.pool.submit(task["video_path"], action_type=None, task_id=task_id)
+            except PoolSaturated:
+                # Only this dispatcher submits and it checks capacity first, so this is a safety net;
+                # the task never ran, so it keeps its attempt
+                db.return_task(task_id, self.worker_id)
+                return False
+
+        with self._lock:
+            self._active[task_id] = future
+        task_events.publish(task_id, {"status": "processing", "stage": "started", "progress": None, "detail": {}})
+        future.add_done_callback(partial(self._on_done, task_id))
+        return True
+
+    def _on_progress(self, task_id: str, stage: str, fraction: Optional[float], detail: Dict[str, Any]):
+        db.update_task_progress(task_id, stage, fraction, detail)
+        task_events.publish(task_id, {"status": "processing", "stage": stage, "progress": fraction, "detail": detail})
+
+    def _on_done(self, task_id: str, future: Future):
+        with self._lock:
+            self._active.pop(task_id, None)
+            abandoned = task_id in self._abandoned
+            self._abandoned.discard(task_id)
+        with trace(task_id):
+            outcome = "completed"
+            try:
+                result = future.result()
+                stored = not abandoned and db.update_task_result(task_id, result, enrich=self.enricher is not None,
+                                                                 worker_id=self.worker_id)
+                if stored:
+                    logger.info(f"Analysis completed for task {task_id}")
+                    if self.enricher:
+                        self.enricher.notify()
+            except Exception as e:
+                logger.error(f"Analysis failed for task {task_id}: {e}")
+                stored = not abandoned and db.release_task(task_id, self.worker_id, str(e), self.max_attempts)
+                outcome = None
+            if not stored:
+                # Another worker reclaimed the task; its outcome is the one that counts
+                logger.warning(f"Dropped the outcome of task {task_id}: lease lost")
+                TASKS.inc("abandoned")
+                self._wakeup.set()
+                return
+            status = db.get_task_status(task_id)
+            if status:
+                task_events.publish(task_id, status)
+            if outcome is None:
+                outcome = "failed" if status and status["status"] == "failed" else "retried"
+            TASKS.inc(outcome)
+        self._wakeup.set()
+
+    def _heartbeat_loop(self):
+        interval = self.lease_seconds / 3
+        while not self._stop.wait(interval):
+            with self._lock:
+                task_ids = [task_id for task_id in self._active if task_id not in self._abandoned]
+            for task_id in task_ids:
+                if not db.heartbeat(task_id, self.worker_id, self.lease_seconds):
+                    # The analysis process cannot be interrupted; let it finish and drop its outcome
+                    logger.warning(f"Lost lease on task {task_id}, abandoning it")
+                    with self._lock:
+                        if task_id in self._active:
+                            self._abandoned.add(task_id)
+
+
+class EnrichmentWorker:
+    """
+    Second pipeline stage: replaces the rule-based feedback of completed tasks
+    with Gemini feedback, off the analysis critical path.
+
+    Same lease protocol as QueueWorker, on the enrichment_* columns. A failed
+    call is retried with exponential backoff (so an open circuit breaker does not
+    burn the attempts); after `max_attempts` the rule-based feedback stays.
+    """
+
+    def __init__(self, coach, worker_id: Optional[str] = None, concurrency: int = 4,
+                 lease_seconds: float = 120.0, poll_interval: float = 2.0, max_attempts: int = 3,
+                 retry_seconds: float = 30.0):
+        self.coach = coach
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}:llm"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="enrichment")
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self):
+        logger.info(f"Enrichment worker {self.worker_id} started")
+        while not self._stop.is_set():
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            task = db.claim_enrichment(self.worker_id, self.lease_seconds)
+            if not task:
+                self._slots.release()
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            with trace(task["task_id"]):
+                future = self._executor.submit(contextvars.copy_context().run, self._enrich, task["result"])
+            future.add_done_callback(partial(self._on_done, task["task_id"], task["attempts"]))
+        logger.info(f"Enrichment worker {self.worker_id} stopping")
+
+    def _enrich(self, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        from backend.ai_engine.blob_store import blob_store
+        from backend.ai_engine.models import Issue
+
+        # The LLM needs the pixels, not the blob references
+        keyframe = result.get("keyframe_base64")
+        if not keyframe and result.get("keyframe_image"):
+            keyframe = blob_store.data_uri(result["keyframe_image"])
+        sequence = result.get("action_sequence") or [
+            uri for uri in map(blob_store.data_uri, result.get("action_sequence_images") or []) if uri
+        ]
+        issues = [Issue(**issue) for issue in result.get("issues", [])]
+        feedback = self.coach.generate_feedback(result["action"], result["score"], result["metrics"],
+                                                issues, keyframe, sequence)
+        if feedback and feedback.get("positive_feedback") and feedback.get("next_training_focus"):
+            return feedback
+        return None
+
+    def _on_done(self, task_id: str, attempts: int, future: Future):
+        self._slots.release()
+        with trace(task_id):
+            try:
+                feedback = future.result()
+            except Exception as e:
+                logger.error(f"Enrichment failed for task {task_id}: {e}")
+                feedback = None
+            if feedback is None:
+                db.release_enrichment(task_id, self.worker_id, self.max_attempts,
+                                      self.retry_seconds * 2 ** (attempts - 1))
+                ENRICHMENTS.inc("failed" if attempts >= self.max_attempts else "retried")
+            elif db.complete_enrichment(task_id, self.worker_id, feedback):
+                logger.info(f"LLM feedback added to task {task_id}")
+                ENRICHMENTS.inc("completed")
+            status = db.get_task_status(task_id)
+            if status:
+                task_events.publish(task_id, status)
+
+
+def register_queue_gauges(worker: Optional[QueueWorker] = None):
+    """Queue depth (from the database, shared by every worker) and this process's pool occupancy."""
+    REGISTRY.gauge("shuttlecoach_queue_tasks", "Tasks in the analysis queue by status",
+                   lambda: {(status,): db.count_tasks(status) for status in QUEUE_STATUSES}, ["status"])
+    REGISTRY.gauge("shuttlecoach_enrichment_backlog", "Completed tasks waiting for LLM feedback",
+                   db.count_enrichment_backlog)
+    if worker is not None:
+        REGISTRY.gauge("shuttlecoach_pool_in_flight", "Analyses running or queued in this process's worker pool",
+                       lambda: worker.pool.in_flight)
+        REGISTRY.gauge("shuttlecoach_pool_workers", "Worker processes in this process's pool",
+                       lambda: worker.pool.workers)
+
+
+def serve_metrics(port: int) -> ThreadingHTTPServer:
+    """Serve REGISTRY at http://0.0.0.0:PORT/metrics from a daemon thread (standalone workers have no API)."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving metrics on :{port}/metrics")
+    return server
+
+
+def worker_from_env(pool: Optional[AnalysisWorkerPool] = None,
+                    enricher: Optional[EnrichmentWorker] = None) -> QueueWorker:
+    pool = pool or AnalysisWorkerPool(workers=int(os.getenv("ANALYSIS_WORKERS", "0")) or None, max_pending=0)
+    return QueueWorker(
+        pool,
+        lease_seconds=float(os.getenv("ANALYSIS_LEASE_SECONDS", "120")),
+        max_attempts=int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "3")),
+        enricher=enricher,
+    )
+
+
+def enrichment_worker_from_env() -> Optional[EnrichmentWorker]:
+    """None when no LLM is configured (results keep their rule-based feedback)."""
+    from backend.ai_engine.llm_client import LLM_MAX_CONCURRENCY, gemini_coach
+    if not gemini_coach.enabled:
+        return None
+    return EnrichmentWorker(
+        gemini_coach,
+        concurrency=int(os.getenv("ENRICHMENT_WORKERS", "0")) or LLM_MAX_CONCURRENCY,
+        max_attempts=int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "3")),
+    )
+
+
+def main():
+    enable_trace_logging()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    enricher = enrichment_worker_from_env()
+    worker = worker_from_env(enricher=enricher)
+    register_queue_gauges(worker)
+    if os.getenv("METRICS_PORT"):
+        serve_metrics(int(os.getenv("METRICS_PORT")))
+    worker.pool.start()
+    if enricher:
+        threading.Thread(target=enricher.run, name="enrichment-worker", daemon=True).start()
+
+    def _graceful(signum, frame):
+        worker.stop()
+        if enricher:
+            enricher.stop()
+    signal.signal(signal.SIGINT, _graceful)
+    signal.signal(signal.SIGTERM, _graceful)
+
+    try:
+        worker.run()
+    finally:
+        # Let running analyses finish; their leases are released on completion
+        worker.pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ function AppContent() {
   const [analysisDuration, setAnalysisDuration] = useState(null);
   const [elapsedTime, setElapsedTime] = useState(0);
   const [showProfile, setShowProfile] = useState(false);
+  const [progress, setProgress] = useState(null); // Latest streamed {stage, progress, detail}
 
   // URL Persistence Logic
   useEffect(() => {
@@ -92,41 +93,108 @@ function AppContent() {
     return () => clearInterval(timer);
   }, [status, analysisStartTime]);
 
-  // Poll for results when we have a task ID
+  const handleTaskUpdate = (data) => {
+    if (data.status === 'completed') {
+      setAnalysisResult(data);
+      setStatus('completed');
+      
+      if (analysisStartTime) {
+        const duration = ((Date.now() - analysisStartTime) / 1000).toFixed(1);
+        setAnalysisDuration(duration);
+      }
+      return true;
+    } else if (data.status === 'failed') {
+      setStatus('failed');
+      alert(`Analysis failed: ${data.error}`);
+      return true;
+    }
+    setStatus('processing');
+    return false;
+  };
+
+  // Follow the task: status pushed over Server-Sent Events, polling as fallback
   useEffect(() => {
-    if (!currentTaskId || status === 'completed') return;
+    if (!currentTaskId || status === 'completed' || status === 'failed') return;
 
-    const pollInterval = setInterval(async () => {
-      try {
-        const res = await fetch(`/api/result/${currentTaskId}`);
-        if (res.status === 404) return; // Not ready yet potentially? Or invalid ID.
-        
-        const data = await res.json();
-        
-        if (data.status === 'completed') {
-          setAnalysisResult(data);
-          setStatus('completed');
+    let pollInterval = null;
+    const startPolling = () => {
+      pollInterval = setInterval(async () => {
+        try {
+          const res = await fetch(`/api/result/${currentTaskId}`);
+          if (res.status === 404) return; // Not ready yet potentially? Or invalid ID.
           
-          if (analysisStartTime) {
-            const duration = ((Date.now() - analysisStartTime) / 1000).toFixed(1);
-            setAnalysisDuration(duration);
+          if (handleTaskUpdate(await res.json())) {
+            clearInterval(pollInterval);
           }
-          
-          clearInterval(pollInterval);
-        } else if (data.status === 'failed') {
-          setStatus('failed');
-          alert(`Analysis failed: ${data.error}`);
-          clearInterval(pollInterval);
-        } else {
-          setStatus('processing');
+        } catch (err) {
+          console.error("Polling error", err);
         }
-      } catch (err) {
-        console.error("Polling error", err);
-      }
-    }, 2000); // Poll every 2 seconds
+      }, 2000); // Poll every 2 seconds
+    };
+
+    if (!window.EventSource) {
+      startPolling();
+      return () => clearInterval(pollInterval);
+    }
+
+    const source = new EventSource(`/api/tasks/${currentTaskId}/events`);
+    source.addEventListener('progress', (e) => {
+      setProgress(JSON.parse(e.data));
+    });
+    source.addEventListener('result', (e) => {
+      source.close();
+      handleTaskUpdate(JSON.parse(e.data));
+    });
+    source.onerror = () => {
+      // Stream dropped (proxy, server restart...): fall back to polling
+      source.close();
+      if (!pollInterval) startPolling();
+    };
 
-    return () => clearInterval(pollInterval);
-  }, [currentTaskId, status]);
+    return () => {
+      source.close();
+      clearInterval(pollInterval);
+    };
+  }, [currentTaskId, status === 'completed' || status === 'failed']);
+
+  // Rule-based feedback is shown first; the AI coach's feedback replaces it when ready
+  const enriching = ['pending', 'running'].includes(analysisResult?.enrichment_status);
+  useEffect(() => {
+    if (!currentTaskId || !enriching) return;
+
+    let pollInterval = null;
+    const startPolling = () => {
+      pollInterval = setInterval(async () => {
+        try {
+          const res = await fetch(`/api/result/${currentTaskId}`);
+          if (res.ok) setAnalysisResult(await res.json());
+        } catch (err) {
+          console.error("Polling error", err);
+        }
+      }, 3000);
+    };
+
+    if (!window.EventSource) {
+      startPolling();
+      return () => clearInterval(pollInterval);
+    }
+
+    // The stream repeats the result, then sends `enriched` once the feedback is upgraded
+    const source = new EventSource(`/api/tasks/${currentTaskId}/events`);
+    source.addEventListener('enriched', (e) => {
+      source.close();
+      setAnalysisResult(JSON.parse(e.data));
+    });
+    source.onerror = () => {
+      source.close();
+      if (!pollInterval) startPolling();
+    };
+
+    return () => {
+      source.close();
+      clearInterval(pollInterval);
+    };
+  }, [currentTaskId, enriching]);
 
   const handleUploadSuccess = (taskId) => {
     setCurrentTaskId(taskId);
@@ -135,6 +203,7 @@ function AppContent() {
     setAnalysisStartTime(Date.now());
     setAnalysisDuration(null);
     setElapsedTime(0);
+    setProgress(null);
     updateUrl(taskId);
   };
 
@@ -179,6 +248,12 @@ function AppContent() {
                 <>
                     <h3>{t('analyzing_title')}</h3>
                     <p>{t('elapsed_time')}: {elapsedTime} {t('seconds')}</p>
+                    {progress && (progress.stage || progress.status === 'queued') && (
+                        <p>
+                            {t(`stage_${progress.stage || 'queued'}`)}
+                            {progress.progress != null && ` ${Math.round(progress.progress * 100)}%`}
+                        </p>
+                    )}
                     <p>{t('analyzing_wait')}</p>
                     
                     {/* Trivia Carousel only during processing */}
@@ -19,6 +19,28 @@ const AICoachChat = ({ taskId, result }) => {
     scrollToBottom();
   }, [messages, isOpen]);
 
+  // The server keeps the conversation; start a fresh one for this view
+  useEffect(() => {
+    if (!taskId) return;
+    fetch(`/api/chat/${taskId}`, { method: 'DELETE' }).catch(() => {});
+  }, [taskId]);
+
+  // The coach reply being streamed is the message marked `streaming`
+  const updateReply = (update) => {
+    setMessages(prev => prev.map(msg => (msg.streaming ? update(msg) : msg)));
+  };
+
+  const appendToReply = (text) => {
+    updateReply(msg => ({ ...msg, content: msg.content + text }));
+  };
+
+  // Replace the streamed reply (or add one if streaming never started)
+  const finishReply = (content) => {
+    setMessages(prev => (prev.some(msg => msg.streaming)
+      ? prev.map(msg => (msg.streaming ? { role: 'model', content } : msg))
+      : [...prev, { role: 'model', content }]));
+  };
+
   const handleSend = async () => {
     if (!input.trim() || loading) return;
 
@@ -28,11 +50,8 @@ const AICoachChat = ({ taskId, result }) => {
     setLoading(true);
 
     try {
-      // Prepare history for API (exclude current message which is sent separately or included)
-      // Our backend API expects history + message
-      const history = messages.map(m => ({ role: m.role, content: m.content }));
-
-      const response = await fetch('/api/chat', {
+      // Only the new message is sent: the server keeps the history and the analysis context
+      const response = await fetch('/api/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -40,21 +59,47 @@ const AICoachChat = ({ taskId, result }) => {
         body: JSON.stringify({
           task_id: taskId,
           message: userMessage.content,
-          history: history,
           language: language // Pass current language (zh/en)
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Network response was not ok');
       }
 
-      const data = await response.json();
-      const botMessage = { role: 'model', content: data.reply };
-      setMessages(prev => [...prev, botMessage]);
+      // Server-Sent Events over the POST response: `token` {text} ... then `done` {reply}.
+      // `loading` stays set until the stream ends, so no second message can interleave with this reply.
+      setMessages(prev => [...prev, { role: 'model', content: '', streaming: true }]);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let done = false;
+      while (!done) {
+        const chunk = await reader.read();
+        if (chunk.done) break;
+        buffer += decoder.decode(chunk.value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = raw.match(/^data: (.*)$/m)?.[1];
+          if (!data) continue;
+          if (event === 'token') {
+            appendToReply(JSON.parse(data).text);
+          } else if (event === 'done') {
+            const { reply } = JSON.parse(data);
+            finishReply(reply);
+            done = true;
+          }
+        }
+      }
+      if (!done) {
+        // The stream ended without `done`: keep what arrived
+        updateReply(msg => ({ role: 'model', content: msg.content || t('chat_error') }));
+      }
     } catch (error) {
       console.error('Chat error:', error);
-      setMessages(prev => [...prev, { role: 'model', content: t('chat_error') }]);
+      finishReply(t('chat_error'));
     } finally {
       setLoading(false);
     }
@@ -113,7 +158,9 @@ const AICoachChat = ({ taskId, result }) => {
                 )}
               </div>
             ))}
-            {loading && <div style={styles.loading}>{t('chat_waiting')}</div>}
+            {loading && !messages.some(msg => msg.streaming && msg.content) && (
+              <div style={styles.loading}>{t('chat_waiting')}</div>
+            )}
             <div ref={messagesEndRef} />
           </div>
 
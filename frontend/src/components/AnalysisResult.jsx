@@ -33,6 +33,15 @@ const AnalysisResult = ({ result, duration }) => {
   const data = result.result; // The Pydantic model dump
   const taskId = result.task_id;
 
+  // Images are served from the blob store; older results still carry inline base64
+  const toImage = (ref) => ({ full: ref.url, thumbnail: ref.thumbnail_url || ref.url });
+  const sequenceImages = (data.action_sequence_images && data.action_sequence_images.length > 0)
+    ? data.action_sequence_images.map(toImage)
+    : (data.action_sequence || []).map(img => ({ full: img, thumbnail: img }));
+  const keyframeImage = data.keyframe_image
+    ? toImage(data.keyframe_image)
+    : (data.keyframe_base64 ? { full: data.keyframe_base64, thumbnail: data.keyframe_base64 } : null);
+
   const handleShare = async () => {
     if (!cardRef.current) return;
     
@@ -131,6 +140,12 @@ const AnalysisResult = ({ result, duration }) => {
             </span>
         )}
         
+        {['pending', 'running'].includes(result.enrichment_status) && (
+            <span style={{...styles.badge, backgroundColor: '#9e9e9e', marginLeft: '8px'}}>
+                ⏳ {t('ai_feedback_pending')}
+            </span>
+        )}
+        
         {duration && <p style={styles.duration}>{t('analysis_time')}: {duration} {t('seconds')}</p>}
       </div>
 
@@ -140,17 +155,18 @@ const AnalysisResult = ({ result, duration }) => {
       </div>
 
       {/* 2.5 Keyframe Snapshot or Sequence */}
-      {(data.action_sequence && data.action_sequence.length > 0) ? (
+      {sequenceImages.length > 0 ? (
         <div style={styles.section}>
             <h3 style={{textAlign: 'center'}}>🎞️ {t('key_moment')}</h3>
             <div style={styles.sequenceContainer}>
-                {data.action_sequence.map((img, idx) => (
+                {sequenceImages.map((img, idx) => (
                     <div key={idx} style={styles.sequenceItem}>
                         <img 
-                            src={img} 
+                            src={img.thumbnail} 
                             alt={`Sequence ${idx+1}`} 
+                            loading="lazy"
                             style={{...styles.keyframeImage, cursor: 'zoom-in'}} 
-                            onClick={() => setZoomedImage(img)}
+                            onClick={() => setZoomedImage(img.full)}
                         />
                         <p style={{textAlign: 'center', fontSize: '12px', color: '#666', marginTop: '4px'}}>
                             {idx === 0 ? t('prep') : (idx === 1 ? t('hit') : t('finish'))}
@@ -159,15 +175,15 @@ const AnalysisResult = ({ result, duration }) => {
                 ))}
             </div>
         </div>
-      ) : (data.keyframe_base64 && (
+      ) : (keyframeImage && (
         <div style={styles.section}>
             <h3 style={{textAlign: 'center'}}>📸 {t('key_moment')}</h3>
             <div style={styles.imageContainer}>
                 <img 
-                    src={data.keyframe_base64} 
+                    src={keyframeImage.full} 
                     alt="Key Moment" 
                     style={{...styles.keyframeImage, cursor: 'zoom-in'}} 
-                    onClick={() => setZoomedImage(data.keyframe_base64)}
+                    onClick={() => setZoomedImage(keyframeImage.full)}
                 />
             </div>
         </div>
@@ -25,19 +25,28 @@ ChartJS.register(
 const GrowthProfile = ({ onClose }) => {
   const { t, language } = useLanguage();
   const [history, setHistory] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
 
-  useEffect(() => {
-    fetch('/api/history')
+  // History is paged newest first; each page is a summary (no full results)
+  const loadHistory = (cursor) => {
+    const params = new URLSearchParams({ limit: '100' });
+    if (cursor) params.set('cursor', cursor);
+    return fetch(`/api/history?${params}`)
       .then(res => res.json())
       .then(data => {
-        setHistory(data);
+        setHistory(prev => cursor ? [...prev, ...data.items] : data.items);
+        setNextCursor(data.next_cursor);
         setLoading(false);
       })
       .catch(err => {
         console.error('Failed to fetch history', err);
         setLoading(false);
       });
+  };
+
+  useEffect(() => {
+    loadHistory(null);
   }, []);
 
   // Prepare Chart Data
@@ -48,7 +57,7 @@ const GrowthProfile = ({ onClose }) => {
       return `${date.getMonth()+1}/${date.getDate()}`;
   });
   
-  const scores = chartHistory.map(item => item.result ? item.result.score : 0);
+  const scores = chartHistory.map(item => item.score || 0);
 
   const chartData = {
     labels,
@@ -108,23 +117,26 @@ const GrowthProfile = ({ onClose }) => {
                     <p style={{color: '#666'}}>{t('no_history')}</p>
                 ) : (
                     history.map(item => {
-                        const res = item.result;
-                        if (!res) return null;
                         const date = new Date(item.created_at).toLocaleDateString();
                         return (
                             <div key={item.task_id} style={styles.historyItem}>
                                 <div style={styles.itemHeader}>
-                                    <span style={styles.itemAction}>{t(res.action)}</span>
-                                    <span style={styles.itemScore}>{res.score} {t('score_suffix')}</span>
+                                    <span style={styles.itemAction}>{t(item.action)}</span>
+                                    <span style={styles.itemScore}>{item.score} {t('score_suffix')}</span>
                                 </div>
                                 <div style={styles.itemDate}>{date}</div>
                                 <div style={styles.itemFeedback}>
-                                    {res.positive_feedback && (res.positive_feedback[language] || res.positive_feedback['zh'])}
+                                    {item.positive_feedback && (item.positive_feedback[language] || item.positive_feedback['zh'])}
                                 </div>
                             </div>
                         );
                     })
                 )}
+                {nextCursor && (
+                    <button onClick={() => loadHistory(nextCursor)} style={styles.loadMoreButton}>
+                        {t('load_more')}
+                    </button>
+                )}
             </div>
           </div>
         )}
@@ -188,6 +200,14 @@ const styles = {
     borderRadius: '8px',
     border: '1px solid #eee'
   },
+  loadMoreButton: {
+    padding: '10px',
+    backgroundColor: 'transparent',
+    border: '1px solid #ddd',
+    borderRadius: '8px',
+    cursor: 'pointer',
+    color: '#666'
+  },
   itemHeader: {
     display: 'flex',
     justifyContent: 'space-between',
@@ -1,6 +1,54 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { useLanguage } from '../LanguageContext';
 
+// Files larger than one chunk use the resumable chunked upload API,
+// so a dropped mobile connection resumes instead of starting over.
+const CHUNK_SIZE = 4 * 1024 * 1024;
+const MAX_RETRIES = 5;
+
+class FatalUploadError extends Error {}
+
+const uploadResumable = async (file, onProgress) => {
+  const init = await fetch('/api/uploads', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename: file.name, size: file.size, content_type: file.type || 'application/octet-stream' })
+  });
+  if (!init.ok) throw new FatalUploadError(`HTTP ${init.status}`);
+  const { upload_id } = await init.json();
+
+  let offset = 0;
+  let retries = 0;
+  while (offset < file.size) {
+    try {
+      const res = await fetch(`/api/uploads/${upload_id}?offset=${offset}`, {
+        method: 'PUT',
+        body: file.slice(offset, offset + CHUNK_SIZE)
+      });
+      if (res.status === 409) {
+        // Server has a different offset (e.g. a chunk landed before the connection dropped)
+        offset = (await res.json()).offset;
+        continue;
+      }
+      if (res.status >= 400 && res.status < 500) throw new FatalUploadError(`HTTP ${res.status}`);
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      offset = (await res.json()).offset;
+      retries = 0;
+      onProgress(Math.round((offset / file.size) * 100));
+    } catch (err) {
+      if (err instanceof FatalUploadError || ++retries > MAX_RETRIES) throw err;
+      await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** retries));
+      // Ask the server where to resume from
+      const status = await fetch(`/api/uploads/${upload_id}`).then((r) => r.json()).catch(() => null);
+      if (status) offset = status.offset;
+    }
+  }
+
+  const done = await fetch(`/api/uploads/${upload_id}/complete`, { method: 'POST' });
+  if (!done.ok) throw new FatalUploadError(`HTTP ${done.status}`);
+  return (await done.json()).task_id;
+};
+
 const VideoUpload = ({ onUploadSuccess }) => {
   const { t } = useLanguage();
   const [file, setFile] = useState(null);
@@ -37,6 +85,15 @@ const VideoUpload = ({ onUploadSuccess }) => {
 
     setUploading(true);
     setProgress(0);
+
+    if (file.size > CHUNK_SIZE) {
+      uploadResumable(file, setProgress)
+        .then((taskId) => onUploadSuccess(taskId))
+        .catch(() => setError('上传失败，请重试'))
+        .finally(() => setUploading(false));
+      return;
+    }
+
     const formData = new FormData();
     formData.append('file', file);
 
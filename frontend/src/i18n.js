@@ -12,6 +12,13 @@ export const translations = {
     analyzing_wait: "请耐心等待，AI 正在逐帧检测（大约需要 10-30 秒）",
     analyzing_restore: "正在恢复分析结果...",
     elapsed_time: "已耗时",
+    stage_queued: "排队中",
+    stage_started: "准备中",
+    stage_pose: "姿态识别",
+    stage_refine: "精细分析挥拍",
+    stage_scoring: "计算指标与评分",
+    stage_feedback: "生成教练反馈",
+    ai_feedback_pending: "AI 教练点评生成中",
     seconds: "秒",
     analysis_time: "分析耗时",
     back_button: "← 分析新视频",
@@ -63,6 +70,7 @@ export const translations = {
     "growth_profile": "成长档案",
     "loading_history": "加载历史记录中...",
     "no_history": "暂无历史记录",
+    "load_more": "加载更多",
     "score_history": "得分趋势",
     "growth_trend": "成长趋势图",
     "history_records": "历史记录",
@@ -98,6 +106,13 @@ export const translations = {
     analyzing_wait: "Please wait, AI is detecting frame by frame (approx 10-30s)",
     analyzing_restore: "Restoring analysis results...",
     elapsed_time: "Elapsed",
+    stage_queued: "Queued",
+    stage_started: "Starting",
+    stage_pose: "Detecting poses",
+    stage_refine: "Refining the swing",
+    stage_scoring: "Computing metrics and score",
+    stage_feedback: "Writing coach feedback",
+    ai_feedback_pending: "AI coach feedback on the way",
     seconds: "s",
     analysis_time: "Analysis Time",
     back_button: "← Analyze New Video",
@@ -149,6 +164,7 @@ export const translations = {
     "growth_profile": "Growth Profile",
     "loading_history": "Loading history...",
     "no_history": "No history records found",
+    "load_more": "Load more",
     "score_history": "Score History",
     "growth_trend": "Growth Trend",
     "history_records": "History Records",